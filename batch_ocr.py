@@ -0,0 +1,204 @@
+"""
+批量识别模块 - 识别一个目录中的发票照片，生成待确认账单，多进程并行
+"""
+import argparse
+import math
+import os
+import time
+from concurrent.futures import as_completed
+
+from database import Database
+from invoice_parser import parse_invoice_text
+from jobs import JobCancelled, create_process_pool
+from ocr_cache import OCRCache
+from ocr_preprocess import DEFAULT_OPTIONS
+from ocr_service import OCRService, create_engine
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+# 解析出的字段（用于计算可信度）
+PARSED_FIELDS = ("date", "quantity", "unit_price")
+# 每识别多少张照片保存一次待确认账单（取消时已保存的保留）
+SAVE_BATCH_SIZE = 20
+
+# 子进程中的识别服务，由 init_worker 在进程启动时创建（引擎只创建一次）
+_worker_service = None
+
+
+def find_photos(directory):
+    """目录（不含子目录）中的照片的绝对路径（解析符号链接），按文件名排序
+    
+    用规范化的路径判断照片是否处理过，同一目录以相对路径或经由链接再次扫描时不会重复入队。
+    """
+    return sorted(
+        os.path.realpath(entry.path) for entry in os.scandir(directory)
+        if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def to_number(value):
+    """解析出的数字字符串转换为有限的 float，无法转换时返回 None"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def plausible_fields(fields):
+    """解析结果中取值合理的字段：有效日期、数量大于 0、单价不小于 0"""
+    plausible = set()
+    if fields.get("date"):
+        plausible.add("date")
+    quantity = to_number(fields.get("quantity"))
+    if quantity is not None and quantity > 0:
+        plausible.add("quantity")
+    unit_price = to_number(fields.get("unit_price"))
+    if unit_price is not None and unit_price >= 0:
+        plausible.add("unit_price")
+    return plausible
+
+
+def build_draft(photo_path, result):
+    """由识别结果生成待确认账单
+    
+    可信度 = 识别引擎的平均置信度 × 取值合理的字段比例，没有合理的字段时为 0。
+    """
+    fields = parse_invoice_text(result["text"])
+    found = len(plausible_fields(fields))
+    ocr_confidence = result.get("confidence", 0.0)
+    return {
+        "photo_path": photo_path,
+        "date": fields.get("date"),
+        "quantity": fields.get("quantity"),
+        "unit_price": fields.get("unit_price"),
+        "ocr_text": result["text"],
+        "ocr_confidence": ocr_confidence,
+        "confidence": ocr_confidence / 100 * found / len(PARSED_FIELDS),
+    }
+
+
+def failed_draft(photo_path, error):
+    """识别失败的照片也进入队列，由人工补录"""
+    return {"photo_path": photo_path, "confidence": 0.0, "error": str(error)}
+
+
+def init_worker(engine_factory, cache_dir):
+    """子进程初始化：创建本进程的识别引擎和缓存"""
+    global _worker_service
+    cache = OCRCache(cache_dir) if cache_dir else None
+    _worker_service = OCRService(engine_factory, use_process=False, cache=cache)
+
+
+def recognize_photo(photo_path, options=DEFAULT_OPTIONS, service=None):
+    """识别并解析单张照片，返回待确认账单"""
+    try:
+        result = (service or _worker_service).recognize(photo_path, options)
+    except Exception as e:
+        return failed_draft(photo_path, e)
+    return build_draft(photo_path, result)
+
+
+def ingest_photos(database, directory, workers=None, options=DEFAULT_OPTIONS,
+                  engine_factory=create_engine, cache_dir="ocr_cache",
+                  progress=None, cancel_event=None):
+    """识别目录中尚未处理的照片（不在队列中、未丢弃、未入账），结果写入待确认账单队列
+    
+    每个子进程创建一次识别引擎并反复使用，识别结果按图片内容缓存在 cache_dir
+    （为 None 时不缓存，多进程识别结束后按容量淘汰一次）。workers 为 1 或无法创建进程池时在当前进程中依次识别。
+    progress(done, total) 以照片数报告进度；cancel_event 被设置时不再开始新的照片
+    并抛出 JobCancelled（已识别的照片已经入队）。
+    返回 {"photos", "drafts", "failed", "skipped", "workers", "elapsed", "photos_per_second"}。
+    """
+    started = time.perf_counter()
+    processed = database.get_processed_photo_paths()
+    photos = find_photos(directory)
+    pending = [path for path in photos if path not in processed]
+    
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(pending)))
+    pool = create_process_pool(workers, init_worker, (engine_factory, cache_dir)) if workers > 1 else None
+    if pool is None:
+        workers = 1
+    
+    drafts = []
+    done = 0
+    saved = 0
+    failed = 0
+    total = len(pending)
+    
+    def record(draft):
+        nonlocal done, saved, failed
+        done += 1
+        failed += draft.get("error") is not None
+        drafts.append(draft)
+        if len(drafts) >= SAVE_BATCH_SIZE:
+            saved += database.add_bill_drafts(drafts)
+            drafts.clear()
+        if progress:
+            progress(done, total)
+    
+    try:
+        if pool is None:
+            service = OCRService(engine_factory, use_process=False,
+                                 cache=OCRCache(cache_dir) if cache_dir else None)
+            try:
+                for path in pending:
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise JobCancelled()
+                    record(recognize_photo(path, options, service=service))
+            finally:
+                service.close()
+        else:
+            with pool:
+                futures = [pool.submit(recognize_photo, path, options) for path in pending]
+                try:
+                    for future in as_completed(futures):
+                        if cancel_event is not None and cancel_event.is_set():
+                            raise JobCancelled()
+                        record(future.result())
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+    finally:
+        if drafts:
+            saved += database.add_bill_drafts(drafts)
+        if pool is not None and cache_dir:
+            # 子进程的缓存各自统计大小，结束后按目录的实际大小统一淘汰
+            OCRCache(cache_dir).trim()
+    
+    elapsed = time.perf_counter() - started
+    return {
+        "photos": done,
+        "drafts": saved,
+        "failed": failed,
+        "skipped": len(photos) - len(pending),
+        "workers": workers,
+        "elapsed": elapsed,
+        "photos_per_second": done / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量识别发票照片，生成待确认账单")
+    parser.add_argument("db_path", help="数据库文件")
+    parser.add_argument("directory", help="照片目录")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认等于CPU核数")
+    parser.add_argument("--cache-dir", default="ocr_cache", help="识别结果缓存目录")
+    args = parser.parse_args(argv)
+    
+    database = Database(args.db_path)
+    try:
+        result = ingest_photos(database, args.directory, workers=args.workers,
+                               cache_dir=args.cache_dir)
+    finally:
+        database.close()
+    print(f"{result['photos']} 张照片（跳过已处理 {result['skipped']} 张）, "
+          f"新增 {result['drafts']} 条待确认账单, 识别失败 {result['failed']} 张, "
+          f"{result['workers']} 个进程, 用时 {result['elapsed']:.2f} 秒, "
+          f"{result['photos_per_second']:.1f} 张/秒")
+
+
+if __name__ == "__main__":
+    main()
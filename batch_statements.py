@@ -0,0 +1,148 @@
+"""
+批量对账单模块 - 月底为每个客户各生成一个对账单文件，多进程并行
+"""
+import argparse
+import os
+import re
+import time
+from concurrent.futures import as_completed
+
+from database import Database
+from exporter import export_monthly_statement
+from jobs import JobCancelled, create_process_pool
+
+# 文件名中不能出现的字符（按 Windows 规则，兼顾拷贝到电脑上打开）
+FILENAME_INVALID = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+# 子进程中的只读数据库，由 init_worker 在进程启动时创建
+_worker_database = None
+
+
+def statement_filename(customer_name, period, used):
+    """生成合法且不重复的对账单文件名"""
+    safe_name = FILENAME_INVALID.sub("_", customer_name).strip(" .") or "客户"
+    base = f"对账单_{period}_{safe_name}" if period else f"对账单_{safe_name}"
+    filename = base + ".xlsx"
+    suffix = 2
+    while filename.lower() in used:
+        filename = f"{base}({suffix}).xlsx"
+        suffix += 1
+    used.add(filename.lower())
+    return filename
+
+
+def init_worker(db_path):
+    """子进程初始化：打开自己的只读连接"""
+    global _worker_database
+    _worker_database = Database(db_path, read_only=True)
+
+
+def write_customer_statement(customer_name, filepath, start_date=None, end_date=None,
+                             database=None):
+    """生成单个客户的对账单，返回 (客户名称, 文件路径, 账单数)"""
+    count = export_monthly_statement(
+        database or _worker_database, filepath, start_date, end_date,
+        customer_name=customer_name
+    )
+    return customer_name, filepath, count
+
+
+def generate_statements(db_path, output_dir, start_date=None, end_date=None,
+                        workers=None, progress=None, cancel_event=None):
+    """为日期范围内有账单的每个客户生成一个对账单文件
+    
+    客户按账单数从多到少提交给进程池（大客户先开始，减少最后的等待），
+    每个子进程使用自己的只读连接。workers 为 1 或无法创建进程池时
+    在当前进程中依次生成。progress(done, total) 以客户数报告进度，
+    cancel_event 被设置时不再开始新的客户并抛出 JobCancelled（已生成的文件保留）。
+    返回 {"customers", "bills", "files", "workers", "elapsed", "bills_per_second"}。
+    """
+    started = time.perf_counter()
+    database = Database(db_path, read_only=True)
+    try:
+        customers = database.get_customer_bill_counts(start_date, end_date)
+    finally:
+        database.close()
+    
+    os.makedirs(output_dir, exist_ok=True)
+    period = (start_date or end_date or "")[:7]
+    used = set()
+    tasks = [
+        (name, os.path.join(output_dir, statement_filename(name, period, used)))
+        for name, _ in customers
+    ]
+    
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(tasks)))
+    pool = create_process_pool(workers, init_worker, (db_path,)) if workers > 1 else None
+    if pool is None:
+        workers = 1
+    
+    files = []
+    bill_count = 0
+    total = len(tasks)
+    
+    def record(result):
+        nonlocal bill_count
+        _, filepath, count = result
+        files.append(filepath)
+        bill_count += count
+        if progress:
+            progress(len(files), total)
+    
+    if pool is None:
+        database = Database(db_path, read_only=True)
+        try:
+            for name, filepath in tasks:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise JobCancelled()
+                record(write_customer_statement(name, filepath, start_date, end_date,
+                                                database=database))
+        finally:
+            database.close()
+    else:
+        with pool:
+            futures = [
+                pool.submit(write_customer_statement, name, filepath, start_date, end_date)
+                for name, filepath in tasks
+            ]
+            try:
+                for future in as_completed(futures):
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise JobCancelled()
+                    record(future.result())
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+    
+    elapsed = time.perf_counter() - started
+    return {
+        "customers": len(files),
+        "bills": bill_count,
+        "files": files,
+        "workers": workers,
+        "elapsed": elapsed,
+        "bills_per_second": bill_count / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="为每个客户生成对账单文件")
+    parser.add_argument("db_path", help="数据库文件")
+    parser.add_argument("output_dir", help="输出目录")
+    parser.add_argument("--start", dest="start_date", help="开始日期 YYYY-MM-DD")
+    parser.add_argument("--end", dest="end_date", help="结束日期 YYYY-MM-DD")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认等于CPU核数")
+    args = parser.parse_args(argv)
+    
+    result = generate_statements(args.db_path, args.output_dir, args.start_date,
+                                 args.end_date, workers=args.workers)
+    print(f"{result['customers']} 个客户, {result['bills']} 条账单, "
+          f"{result['workers']} 个进程, 用时 {result['elapsed']:.2f} 秒, "
+          f"{result['bills_per_second']:.0f} 条/秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+批量写入基准 - 10 万条账单用 add_bills 一次写入与逐条 add_bill 的耗时对比
+
+用法：python benchmarks/bench_add_bills.py [--bills 100000]
+"""
+import argparse
+import time
+
+from common import make_bills, temp_database
+
+
+def looped_add_bill(database, bills):
+    """逐条调用 add_bill（每条一个事务）"""
+    customer_ids = {}
+    for bill in bills:
+        name = bill["customer_name"]
+        if name not in customer_ids:
+            database.add_customer(name)
+            customer_ids[name] = next(c["id"] for c in database.get_all_customers()
+                                      if c["name"] == name)
+        database.add_bill(customer_ids[name], name, bill["date"], bill["specification"],
+                          bill["quantity"], bill["unit_price"])
+
+
+def bulk_add_bills(database, bills):
+    """一次调用 add_bills（单个事务）"""
+    database.add_bills(bills, create_customers=True)
+
+
+def run_benchmark(bills):
+    """返回 [(方式, 耗时秒数)]，每种方式使用独立的新数据库"""
+    results = []
+    for name, insert in (("looped add_bill", looped_add_bill), ("add_bills", bulk_add_bills)):
+        with temp_database() as database:
+            started = time.perf_counter()
+            insert(database, make_bills(bills))
+            results.append((name, time.perf_counter() - started))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量写入与逐条写入的耗时对比")
+    parser.add_argument("--bills", type=int, default=100_000, help="账单条数")
+    args = parser.parse_args(argv)
+    
+    print(f"{args.bills} 条账单")
+    for name, seconds in run_benchmark(args.bills):
+        print(f"  {name:<18}{seconds:8.2f} s  {args.bills / seconds:10.0f} 条/秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+账单记录内存基准 - 50 万条账单查询结果为字典与 Bill 元组时的每条内存
+
+用法：python benchmarks/bench_bill_memory.py [--bills 500000]
+"""
+import argparse
+import gc
+import tracemalloc
+
+from common import seed_bills, temp_database
+from database import BILL_COLUMNS, BILL_ORDER, Bill
+
+
+def dict_rows(database):
+    """旧的返回格式：每条账单一个字典"""
+    cursor = database.get_connection().execute(
+        f"SELECT {BILL_COLUMNS} FROM bills ORDER BY {BILL_ORDER}"
+    )
+    return [dict(zip(Bill._fields, row)) for row in cursor.fetchall()]
+
+
+def measure(load):
+    """返回 (结果保留的字节数, 加载过程中的峰值字节数)"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        rows = load()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del rows
+    return retained - before, peak - before
+
+
+def run_benchmark(bills):
+    """返回 [(返回格式, 每条保留字节数, 每条峰值字节数)]"""
+    with temp_database() as database:
+        seed_bills(database, bills)
+        results = []
+        for name, load in (("dict rows", lambda: dict_rows(database)),
+                           ("Bill rows", database.filter_bills)):
+            retained, peak = measure(load)
+            results.append((name, retained / bills, peak / bills))
+        return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="账单查询结果的每条内存")
+    parser.add_argument("--bills", type=int, default=500_000, help="账单条数")
+    args = parser.parse_args(argv)
+    
+    print(f"{args.bills} 条账单（每条保留 / 峰值字节数）")
+    for name, retained, peak in run_benchmark(args.bills):
+        print(f"  {name:<12}{retained:10.0f} B {peak:10.0f} B")
+
+
+if __name__ == "__main__":
+    main()
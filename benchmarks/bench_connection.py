@@ -0,0 +1,82 @@
+"""
+连接复用基准 - 10 万条账单时常用查询和单条写入的平均每次耗时，
+对比每次调用新建连接（改为长连接之前的做法）与复用 Database 的线程连接
+
+两种方式执行相同的 SQL，不经过客户和产品缓存，只比较连接的开销。
+
+用法：python benchmarks/bench_connection.py [--bills 100000] [--repeat 1000]
+"""
+import argparse
+import sqlite3
+
+from common import per_call, seed_bills, temp_database
+from database import BILL_COLUMNS, BILL_ORDER, INSERT_BILL_SQL
+
+
+def operations(customer_id, customer_name):
+    """[(操作, SQL, 参数, 是否写操作, 重复次数的比例)]"""
+    return [
+        ("get_all_customers", "SELECT id, name FROM customers ORDER BY name", (), False, 1),
+        ("get_products_by_customer",
+         "SELECT id, specification, unit_price FROM products WHERE customer_id = ? "
+         "ORDER BY specification", (customer_id,), False, 1),
+        ("filter_bills (1 month)",
+         f"SELECT {BILL_COLUMNS} FROM bills WHERE date >= ? AND date <= ? ORDER BY {BILL_ORDER}",
+         ("2024-03-01", "2024-03-31"), False, 100),
+        # 写入的耗时包含提交事务，次数少一些，避免改变数据规模
+        ("add_bill", INSERT_BILL_SQL,
+         (customer_id, customer_name, "2024-03-01", "A4", 10, 2.5, 25.0, "manual", None, None),
+         True, 10),
+    ]
+
+
+def fresh_connection_call(db_path, sql, params, write):
+    """每次调用新建连接，执行后关闭"""
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute(sql, params).fetchall()
+        if write:
+            conn.commit()
+    finally:
+        conn.close()
+
+
+def reused_connection_call(database, sql, params, write):
+    """复用当前线程的长连接"""
+    conn = database.get_connection()
+    if write:
+        with conn:
+            conn.execute(sql, params)
+    else:
+        conn.execute(sql, params).fetchall()
+
+
+def run_benchmark(bills, repeat):
+    """返回 [(操作, 新建连接的平均耗时秒数, 复用连接的平均耗时秒数)]"""
+    with temp_database() as database:
+        seed_bills(database, bills)
+        customer = database.get_all_customers()[0]
+        results = []
+        for name, sql, params, write, divisor in operations(customer["id"], customer["name"]):
+            times = max(1, repeat // divisor)
+            fresh = per_call(fresh_connection_call, database.db_path, sql, params, write,
+                             repeat=times)
+            reused = per_call(reused_connection_call, database, sql, params, write,
+                              repeat=times)
+            results.append((name, fresh, reused))
+        return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="新建连接与复用连接的平均每次耗时")
+    parser.add_argument("--bills", type=int, default=100_000, help="账单条数")
+    parser.add_argument("--repeat", type=int, default=1000, help="读操作重复次数")
+    args = parser.parse_args(argv)
+    
+    print(f"{args.bills} 条账单                 新建连接    复用连接")
+    for name, fresh, reused in run_benchmark(args.bills, args.repeat):
+        print(f"  {name:<28}{fresh * 1000:8.3f} ms {reused * 1000:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+CSV/TSV导出导入基准 - 10 万条账单导出为 Excel、CSV、TSV 以及导入 CSV 的速度
+
+用法：python benchmarks/bench_export_csv.py [--bills 100000]
+"""
+import argparse
+import os
+import tempfile
+
+from common import seed_bills, temp_database, timed
+from exporter import export_bills_csv, export_bills_xlsx
+from importer import import_bills_csv
+
+
+def run_benchmark(bills):
+    """返回 [(操作, 条数, 耗时秒数)]；导入的 CSV 写入另一个新数据库"""
+    results = []
+    with tempfile.TemporaryDirectory(prefix="accounting_bench_") as directory:
+        csv_path = os.path.join(directory, "bills.csv")
+        with temp_database() as database:
+            seed_bills(database, bills)
+            for name, export, filepath, kwargs in (
+                ("导出 xlsx", export_bills_xlsx, "bills.xlsx", {}),
+                ("导出 csv", export_bills_csv, "bills.csv", {}),
+                ("导出 tsv", export_bills_csv, "bills.tsv", {"delimiter": "\t"}),
+            ):
+                count, seconds = timed(export, database, os.path.join(directory, filepath), **kwargs)
+                results.append((name, count, seconds))
+            expected_total = database.get_bill_statistics()["total_amount"]
+        
+        with temp_database() as database:
+            summary, seconds = timed(import_bills_csv, database, csv_path)
+            results.append(("导入 csv", summary["imported"], seconds))
+            # 导出再导入后金额合计应当不变
+            assert summary["rejected"] == 0, summary["errors"][:5]
+            assert abs(database.get_bill_statistics()["total_amount"] - expected_total) < 0.01
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Excel、CSV、TSV 导出和 CSV 导入的速度")
+    parser.add_argument("--bills", type=int, default=100_000, help="账单条数")
+    args = parser.parse_args(argv)
+    
+    print(f"{args.bills} 条账单")
+    for name, count, seconds in run_benchmark(args.bills):
+        print(f"  {name}  {seconds:8.2f} s  {count / seconds:10.0f} 条/秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Excel导出基准 - 1 万 / 10 万 / 100 万条账单流式导出的耗时和内存峰值
+
+每种规模先在临时数据库中生成账单，再在独立的子进程中导出，
+子进程的内存峰值不受生成账单的影响（包含解释器和导入的模块）。
+子进程关闭 mmap（mmap_size=0）：否则映射的数据库文件页（最多 64 MB）也计入
+RSS，峰值会随数据库大小增长，掩盖导出本身的内存占用。
+
+用法：python benchmarks/bench_export_xlsx.py [--bills 10000 100000 1000000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from common import peak_rss_mb, seed_bills, temp_database
+from database import Database
+from exporter import export_bills_xlsx
+
+
+def export_once(db_path):
+    """在当前进程中导出一次，返回 {"rows", "seconds", "peak_rss_mb"}"""
+    database = Database(db_path, read_only=True, mmap_size=0)
+    try:
+        filepath = os.path.join(os.path.dirname(db_path), "export.xlsx")
+        started = time.perf_counter()
+        rows = export_bills_xlsx(database, filepath)
+        seconds = time.perf_counter() - started
+    finally:
+        database.close()
+    return {"rows": rows, "seconds": seconds, "peak_rss_mb": peak_rss_mb()}
+
+
+def run_benchmark(sizes):
+    """返回 [(账单条数, 子进程的导出结果)]"""
+    results = []
+    for bills in sizes:
+        with temp_database() as database:
+            seed_bills(database, bills)
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--export", database.db_path],
+                check=True, capture_output=True, text=True
+            ).stdout
+        results.append((bills, json.loads(output)))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Excel流式导出的耗时和内存峰值")
+    parser.add_argument("--bills", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="账单条数（可以给出多个）")
+    parser.add_argument("--export", metavar="DB_PATH", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    
+    if args.export:
+        print(json.dumps(export_once(args.export)))
+        return
+    
+    for bills, result in run_benchmark(args.bills):
+        rss = result["peak_rss_mb"]
+        print(f"{bills:>9} 条  {result['seconds']:8.1f} s  "
+              f"峰值内存 {'未知' if rss is None else f'{rss:.0f} MB'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Excel导入基准 - 1 万到 50 万行的工作簿导入时的耗时和内存峰值
+
+每种规模先生成一个与导出格式相同的工作簿（每 100 行有一行数量无效，
+用于检查失败行报告），再在独立的子进程中导入到新数据库，
+子进程的内存峰值不受生成工作簿的影响。内存占用应当与行数无关。
+
+用法：python benchmarks/bench_import_xlsx.py [--rows 10000 100000 500000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import make_bills, peak_rss_mb, temp_database
+from database import Bill
+from exporter import write_bills_xlsx
+from importer import import_bills_xlsx
+
+# 每多少行生成一行无效数据
+REJECT_EVERY = 100
+
+
+def write_workbook(filepath, rows):
+    """生成 rows 行账单的工作簿"""
+    def bills():
+        for i, bill in enumerate(make_bills(rows)):
+            quantity = "abc" if i % REJECT_EVERY == 0 else bill["quantity"]
+            yield Bill(i, None, bill["customer_name"], bill["date"], bill["specification"],
+                       quantity, bill["unit_price"], 0, "manual", None, None)
+    write_bills_xlsx(bills(), filepath)
+
+
+def import_once(filepath):
+    """在当前进程中导入一次，返回 {"imported", "rejected", "seconds", "peak_rss_mb"}"""
+    with temp_database(mmap_size=0) as database:
+        started = time.perf_counter()
+        result = import_bills_xlsx(database, filepath)
+        seconds = time.perf_counter() - started
+    return {"imported": result["imported"], "rejected": result["rejected"],
+            "seconds": seconds, "peak_rss_mb": peak_rss_mb()}
+
+
+def run_benchmark(sizes):
+    """返回 [(行数, 子进程的导入结果)]"""
+    results = []
+    for rows in sizes:
+        with tempfile.TemporaryDirectory(prefix="accounting_bench_") as directory:
+            filepath = os.path.join(directory, "bills.xlsx")
+            write_workbook(filepath, rows)
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--import", filepath],
+                check=True, capture_output=True, text=True
+            ).stdout
+        results.append((rows, json.loads(output)))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Excel导入的耗时和内存峰值")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 500_000],
+                        help="工作簿行数（可以给出多个）")
+    parser.add_argument("--import", dest="import_path", metavar="XLSX_PATH",
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    
+    if args.import_path:
+        print(json.dumps(import_once(args.import_path)))
+        return
+    
+    for rows, result in run_benchmark(args.rows):
+        rss = result["peak_rss_mb"]
+        print(f"{rows:>8} 行  导入 {result['imported']}  失败 {result['rejected']}  "
+              f"{result['seconds']:8.1f} s  峰值内存 {'未知' if rss is None else f'{rss:.0f} MB'}")
+
+
+if __name__ == "__main__":
+    main()
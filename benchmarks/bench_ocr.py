@@ -0,0 +1,99 @@
+"""
+OCR基准测试 - 对比预处理前后的识别耗时和字段准确率（电脑上运行）
+
+用法：python benchmarks/bench_ocr.py 图片目录 [--expected expected.json]
+
+expected.json 格式：{"文件名.jpg": {"date": "2024-03-01", "quantity": "10", "unit_price": "2.5"}}，
+缺省时读取图片目录下的 expected.json，没有则只统计耗时。
+"""
+import argparse
+import json
+import os
+
+from common import peak_rss_mb, timed
+from invoice_parser import parse_invoice_text
+from ocr_preprocess import DEFAULT_OPTIONS
+from ocr_service import DEFAULT_LANG, create_engine, default_engine_name, recognize_file
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+FIELDS = ("date", "quantity", "unit_price")
+
+# 对比的两种方式：None 表示直接识别原图
+MODES = [("原图", None), ("预处理", DEFAULT_OPTIONS)]
+
+
+def recognize(engine, path, options):
+    """识别一张图片，返回 (解析出的字段, {步骤: 耗时秒数}, 总耗时秒数)"""
+    result, seconds = timed(recognize_file, engine, path, options)
+    return parse_invoice_text(result["text"]), result["timings"], seconds
+
+
+def run_benchmark(image_dir, expected=None, lang=DEFAULT_LANG):
+    """对目录中每张图片分别按两种方式识别，返回每种方式的统计
+    
+    返回 {方式名称: {"images", "total", "stages", "correct", "checked"}}，
+    total 和 stages 为平均每张的耗时（秒），correct / checked 为字段正确数 / 核对数。
+    """
+    expected = expected or {}
+    paths = sorted(
+        os.path.join(image_dir, name) for name in os.listdir(image_dir)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    # 引擎只创建一次（tesserocr 只加载一次语言数据），与识别进程中的用法相同
+    engine = create_engine(lang=lang)
+    results = {}
+    try:
+        for mode, options in MODES:
+            stages = {}
+            total = 0.0
+            correct = checked = 0
+            for path in paths:
+                fields, timings, elapsed = recognize(engine, path, options)
+                total += elapsed
+                for stage, seconds in timings.items():
+                    stages[stage] = stages.get(stage, 0.0) + seconds
+                for field, value in expected.get(os.path.basename(path), {}).items():
+                    checked += 1
+                    correct += fields.get(field) == str(value)
+            count = len(paths) or 1
+            results[mode] = {
+                "images": len(paths),
+                "total": total / count,
+                "stages": {stage: seconds / count for stage, seconds in stages.items()},
+                "correct": correct,
+                "checked": checked,
+            }
+    finally:
+        engine.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="对比OCR预处理前后的耗时和准确率")
+    parser.add_argument("image_dir", help="发票照片目录")
+    parser.add_argument("--expected", help="各图片的正确字段（JSON），默认为目录下的 expected.json")
+    parser.add_argument("--lang", default=DEFAULT_LANG, help="tesseract 语言")
+    args = parser.parse_args(argv)
+    
+    expected_path = args.expected or os.path.join(args.image_dir, "expected.json")
+    expected = {}
+    if os.path.exists(expected_path):
+        with open(expected_path, encoding="utf-8") as f:
+            expected = json.load(f)
+    
+    print(f"引擎: {default_engine_name()}")
+    results = run_benchmark(args.image_dir, expected, args.lang)
+    for mode, result in results.items():
+        print(f"{mode}: {result['images']} 张, 平均 {result['total'] * 1000:.0f} ms/张")
+        for stage, seconds in result["stages"].items():
+            print(f"  {stage:<15} {seconds * 1000:8.1f} ms")
+        if result["checked"]:
+            print(f"  字段准确率 {result['correct']}/{result['checked']} "
+                  f"({result['correct'] / result['checked']:.0%})")
+    rss = peak_rss_mb()
+    if rss is not None:
+        print(f"峰值内存 {rss:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
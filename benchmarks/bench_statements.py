@@ -0,0 +1,50 @@
+"""
+批量对账单基准 - 一个月的账单按客户生成对账单文件，对比不同进程数的耗时
+
+进程数超过 CPU 核数时不会更快；输出第一行显示本机的核数。
+
+用法：python benchmarks/bench_statements.py [--bills 200000] [--customers 300] [--workers 1 2 4]
+"""
+import argparse
+import os
+import tempfile
+
+from common import seed_bills, temp_database
+from batch_statements import generate_statements
+
+
+def run_benchmark(bills, customers, worker_counts, start_date, end_date):
+    """返回 [(进程数, 客户数, 账单数, 耗时秒数)]；每次生成到新的输出目录"""
+    results = []
+    with temp_database() as database:
+        seed_bills(database, bills, customers)
+        for workers in worker_counts:
+            with tempfile.TemporaryDirectory(prefix="accounting_bench_") as output_dir:
+                result = generate_statements(database.db_path, output_dir, start_date, end_date,
+                                             workers=workers)
+            results.append((result["workers"], result["customers"], result["bills"],
+                            result["elapsed"]))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="不同进程数批量生成对账单的耗时")
+    parser.add_argument("--bills", type=int, default=200_000, help="账单总条数（分布在两年内）")
+    parser.add_argument("--customers", type=int, default=300, help="客户数")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="进程数")
+    parser.add_argument("--start", default="2023-03-01", help="开始日期")
+    parser.add_argument("--end", default="2023-03-31", help="结束日期")
+    args = parser.parse_args(argv)
+    
+    print(f"{os.cpu_count()} 个 CPU 核, {args.bills} 条账单, {args.customers} 个客户, "
+          f"{args.start} ~ {args.end}")
+    baseline = None
+    for workers, customers, bills, seconds in run_benchmark(
+            args.bills, args.customers, args.workers, args.start, args.end):
+        baseline = baseline or seconds
+        print(f"  {workers} 个进程  {customers} 个文件  {bills} 条  {seconds:7.2f} s  "
+              f"{bills / seconds:8.0f} 条/秒  加速 {baseline / seconds:4.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+基准测试公共工具 - 临时数据库、生成测试账单、计时
+
+基准脚本在仓库根目录下运行：python benchmarks/脚本名.py
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database  # noqa: E402
+
+SPECIFICATIONS = ["A4", "A3", "B5", "16K", "32K", "铜版纸", "牛皮纸", "不干胶"]
+FIRST_DATE = date(2023, 1, 1)
+# 生成的账单日期分布在两年内
+DATE_SPAN_DAYS = 730
+
+
+@contextmanager
+def temp_database(**kwargs):
+    """临时目录中的新数据库，结束时关闭并删除"""
+    directory = tempfile.mkdtemp(prefix="accounting_bench_")
+    database = Database(os.path.join(directory, "accounting.db"), **kwargs)
+    try:
+        yield database
+    finally:
+        database.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def make_bills(count, customers=50, seed=1):
+    """生成 count 条测试账单（add_bills 的字典格式），同一 seed 结果相同"""
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield {
+            "customer_id": None,
+            "customer_name": f"客户{rng.randrange(customers):03d}",
+            "date": (FIRST_DATE + timedelta(days=rng.randrange(DATE_SPAN_DAYS))).isoformat(),
+            "specification": rng.choice(SPECIFICATIONS),
+            "quantity": rng.randint(1, 500),
+            "unit_price": round(rng.uniform(0.1, 50), 2),
+        }
+
+
+def seed_bills(database, count, customers=50):
+    """向数据库批量写入 count 条测试账单（同时创建客户和产品）"""
+    outcomes = database.add_bills(make_bills(count, customers),
+                                  create_customers=True, create_products=True)
+    assert all(ok for ok, _ in outcomes), "生成测试账单失败"
+
+
+def timed(fn, *args, **kwargs):
+    """返回 (fn 的返回值, 耗时秒数)"""
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def per_call(fn, *args, repeat=1000):
+    """fn(*args) 的平均每次耗时（秒）"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(*args)
+    return (time.perf_counter() - started) / repeat
+
+
+def peak_rss_mb():
+    """当前进程的内存峰值（MB），平台不支持时返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以字节为单位，Linux 以 KB 为单位
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
@@ -7,23 +7,92 @@ from kivymd.uix.toolbar import MDTopAppBar
 from kivymd.uix.textfield import MDTextField
 from kivymd.uix.button import MDRaisedButton, MDFlatButton, MDIconButton
 from kivymd.uix.dialog import MDDialog
-from kivymd.uix.list import MDList, ThreeLineListItem, OneLineListItem
-from kivymd.uix.scrollview import MDScrollView
+from kivymd.uix.list import ThreeLineListItem, OneLineListItem
 from kivymd.uix.pickers import MDDatePicker
 from kivymd.uix.label import MDLabel
-from kivymd.uix.menu import MDDropdownMenu
 from kivy.metrics import dp
+from kivy.clock import Clock
+from kivy.properties import NumericProperty, ObjectProperty
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
 from datetime import datetime
+from heapq import merge
+from operator import itemgetter
 import os
 
+from customer_picker import CustomerPicker
+from database import bill_changes
+from loading_bar import JobPanel, LoadingBar
+from batch_statements import generate_statements
+from exporter import (EXCEL_AVAILABLE, CSV_FORMATS, export_bills_xlsx, export_bills_csv,
+                      export_monthly_statement)
+from importer import import_bills_csv, import_bills_xlsx
+from jobs import BackgroundJob, BackgroundTaskMixin
+
 try:
-    from openpyxl import Workbook
-    EXCEL_AVAILABLE = True
+    from plyer import filechooser
+    FILECHOOSER_AVAILABLE = True
 except ImportError:
-    EXCEL_AVAILABLE = False
+    FILECHOOSER_AVAILABLE = False
+
+# 每页加载的账单数量
+BILL_PAGE_SIZE = 50
+# 滚动到距离底部多少比例时加载下一页
+LOAD_MORE_THRESHOLD = 0.1
+# 账单列表每行的高度（与 ThreeLineListItem 一致）
+BILL_ROW_HEIGHT = dp(88)
+# 搜索框停止输入多久后才执行搜索（秒），以及最多显示的搜索结果数
+SEARCH_DELAY = 0.3
+SEARCH_LIMIT = 200
+# 新增账单超过此数量（如批量导入）时直接重新加载列表，不做增量合并
+BILL_DELTA_LIMIT = 500
+
+
+def bill_row_data(bill):
+    """把账单转换为列表的一行数据（RecycleView 只保存这些数据，行控件循环复用）"""
+    source_text = "📝手动" if bill.source == 'manual' else "📷拍照"
+    return {
+        "bill_id": bill.id,
+        "sort_key": (bill.date, bill.created_at, bill.id),
+        "text": f"{bill.customer_name} - {bill.date}",
+        "secondary_text": f"{bill.specification} | 数量: {bill.quantity} | 单价: ¥{bill.unit_price:.2f}",
+        "tertiary_text": f"{source_text} | 总价: ¥{bill.total_price:.2f}",
+    }
+
+
+class BillListItem(ThreeLineListItem):
+    """账单列表的一行，被 RecycleView 复用来显示不同的账单"""
+    
+    bill_id = NumericProperty(0)
+    sort_key = ObjectProperty(None)
+    
+    def on_release(self):
+        recycle_view = self.parent.recycleview if self.parent else None
+        if recycle_view is not None:
+            recycle_view.dispatch("on_bill_release", self.bill_id)
+
+
+class BillRecycleView(RecycleView):
+    """账单列表：只为可见的行创建控件，点击某行时触发 on_bill_release(bill_id)"""
+    
+    __events__ = ("on_bill_release",)
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.viewclass = BillListItem
+        self.add_widget(RecycleBoxLayout(
+            orientation='vertical',
+            default_size=(None, BILL_ROW_HEIGHT),
+            default_size_hint=(1, None),
+            size_hint_y=None
+        ))
+        self.layout_manager.bind(minimum_height=self.layout_manager.setter('height'))
+    
+    def on_bill_release(self, bill_id):
+        pass
 
 
-class BillingScreen(MDScreen):
+class BillingScreen(BackgroundTaskMixin, MDScreen):
     """账单管理界面"""
     
     def __init__(self, database, **kwargs):
@@ -33,8 +102,19 @@ class BillingScreen(MDScreen):
         self.filter_start_date = None
         self.filter_end_date = None
         self.dialog = None
-        self.customer_menu = None
         self.customer_field_ref = None
+        self.next_page_after = None
+        self.page_loading = False
+        # 每次刷新列表递增，用于丢弃过期的后台查询结果
+        self.list_version = 0
+        # 列表已同步到的数据版本号，None 表示尚未加载
+        self.data_version = None
+        # 当前搜索关键词（为空时显示按筛选条件分页的账单）
+        self.search_query = ""
+        self.search_trigger = Clock.create_trigger(self.run_search, SEARCH_DELAY)
+        # 当前的导出/导入后台任务（同一时间只运行一个）
+        self.job = None
+        self.export_dialog = None
         self.build_ui()
     
     def build_ui(self):
@@ -48,12 +128,27 @@ class BillingScreen(MDScreen):
             left_action_items=[["arrow-left", lambda x: self.go_back()]],
             right_action_items=[
                 ["filter", lambda x: self.show_filter_dialog()],
-                ["export", lambda x: self.export_bills()]
+                ["file-import", lambda x: self.import_bills()],
+                ["export", lambda x: self.show_export_dialog()]
             ],
             md_bg_color=(0.9, 0.5, 0.2, 1)
         )
         layout.add_widget(toolbar)
         
+        # 后台查询进行中时显示
+        self.loading_bar = LoadingBar()
+        layout.add_widget(self.loading_bar)
+        
+        # 搜索框（停止输入后才查询）
+        search_box = MDBoxLayout(size_hint_y=None, height=dp(56), padding=[dp(10), 0])
+        self.search_field = MDTextField(
+            hint_text="搜索客户、规格或识别文字",
+            icon_right="magnify"
+        )
+        self.search_field.bind(text=self.on_search_text)
+        search_box.add_widget(self.search_field)
+        layout.add_widget(search_box)
+        
         # 统计信息
         self.stats_label = MDLabel(
             text="",
@@ -64,17 +159,23 @@ class BillingScreen(MDScreen):
         )
         layout.add_widget(self.stats_label)
         
-        # 账单列表
-        scroll = MDScrollView()
-        self.bill_list = MDList()
-        scroll.add_widget(self.bill_list)
-        layout.add_widget(scroll)
+        # 导出/导入进度（后台任务进行中时显示）
+        self.job_panel = JobPanel(on_cancel=self.cancel_job)
+        layout.add_widget(self.job_panel)
+        
+        # 账单列表（滚动到底部附近时加载下一页）
+        self.bill_list = BillRecycleView()
+        self.bill_list.bind(
+            scroll_y=self.on_bill_list_scroll,
+            on_bill_release=lambda view, bill_id: self.show_bill_detail(bill_id)
+        )
+        layout.add_widget(self.bill_list)
         
         self.add_widget(layout)
     
     def on_enter(self):
-        """进入界面时刷新账单列表"""
-        self.refresh_bill_list()
+        """进入界面时只同步上次离开后的变更"""
+        self.sync_bill_list()
     
     def go_back(self):
         """返回主界面"""
@@ -82,36 +183,175 @@ class BillingScreen(MDScreen):
     
     def refresh_bill_list(self):
         """刷新账单列表"""
-        self.bill_list.clear_widgets()
+        self.list_version += 1
+        self.data_version = self.database.data_version
+        self.bill_list.data = []
+        self.next_page_after = None
+        self.page_loading = False
+        self.bill_list.scroll_y = 1
+        
+        if self.search_query:
+            self.load_search_results()
+            return
+        
+        self.load_statistics()
         
-        # 根据筛选条件获取账单
-        bills = self.database.filter_bills(
+        # 只加载第一页，其余在滚动时加载
+        self.load_bill_page()
+    
+    def on_search_text(self, instance, text):
+        """输入搜索词：重新计时，停止输入 SEARCH_DELAY 秒后才搜索"""
+        self.search_trigger.cancel()
+        self.search_trigger()
+    
+    def run_search(self, dt):
+        """执行搜索（关键词未变化时不重复查询）"""
+        query = self.search_field.text.strip()
+        if query == self.search_query:
+            return
+        self.search_query = query
+        self.refresh_bill_list()
+    
+    def load_search_results(self):
+        """在后台执行全文搜索"""
+        version = self.list_version
+        query = self.search_query
+        self.run_in_background(
+            self.database.search_bills,
+            query,
+            limit=SEARCH_LIMIT,
+            callback=lambda bills: self.on_search_results(version, query, bills)
+        )
+    
+    def on_search_results(self, version, query, bills):
+        """显示搜索结果"""
+        if version != self.list_version:
+            return
+        self.bill_list.data = [bill_row_data(bill) for bill in bills]
+        if len(bills) >= SEARCH_LIMIT:
+            self.stats_label.text = f"搜索“{query}”: 显示最新的 {len(bills)} 条"
+        else:
+            self.stats_label.text = f"搜索“{query}”: 共 {len(bills)} 条"
+    
+    def sync_bill_list(self):
+        """按数据变更事件增量更新列表；没有账单变化时不刷新
+        
+        删除的账单直接从列表移除；新增的账单只查询这些 id，落在已加载范围内的
+        按排序合并进列表，更靠后的会在继续滚动时随分页加载。
+        """
+        if self.data_version is None or self.page_loading:
+            self.refresh_bill_list()
+            return
+        
+        changes = self.database.changes_since(self.data_version)
+        if changes is None:
+            self.refresh_bill_list()
+            return
+        if changes:
+            self.data_version = changes[-1].version
+        
+        deleted, added = bill_changes(changes)
+        if not deleted and not added:
+            return
+        if self.search_query:
+            # 搜索结果只有一屏，直接重新搜索
+            self.refresh_bill_list()
+            return
+        if sum(last_id - first_id + 1 for first_id, last_id in added) > BILL_DELTA_LIMIT:
+            self.refresh_bill_list()
+            return
+        
+        if deleted:
+            self.bill_list.data = [row for row in self.bill_list.data
+                                   if row["bill_id"] not in deleted]
+        if added:
+            version = self.list_version
+            self.run_in_background(
+                self.load_added_bills,
+                added,
+                callback=lambda bills: self.on_added_bills_loaded(version, bills),
+                write=False
+            )
+        self.load_statistics()
+    
+    def load_added_bills(self, id_ranges):
+        """查询新增账单中符合当前筛选条件的部分（在后台线程执行）"""
+        bills = []
+        for first_id, last_id in id_ranges:
+            bills.extend(self.database.get_bills_in_id_range(
+                first_id, last_id,
+                customer_name=self.filter_customer,
+                start_date=self.filter_start_date,
+                end_date=self.filter_end_date
+            ))
+        return bills
+    
+    def on_added_bills_loaded(self, version, bills):
+        """把新增账单按排序合并进已加载的列表"""
+        if version != self.list_version:
+            return
+        loaded_ids = {row["bill_id"] for row in self.bill_list.data}
+        rows = sorted(
+            (bill_row_data(bill) for bill in bills
+             if bill.id not in loaded_ids
+             and (self.next_page_after is None
+                  or (bill.date, bill.created_at, bill.id) > self.next_page_after)),
+            key=itemgetter("sort_key"), reverse=True
+        )
+        if rows:
+            self.bill_list.data = list(merge(self.bill_list.data, rows,
+                                             key=itemgetter("sort_key"), reverse=True))
+    
+    def load_statistics(self):
+        """在后台更新统计信息"""
+        version = self.list_version
+        self.run_in_background(
+            self.database.get_bill_statistics,
             customer_name=self.filter_customer,
             start_date=self.filter_start_date,
-            end_date=self.filter_end_date
+            end_date=self.filter_end_date,
+            callback=lambda stats: self.on_statistics_loaded(version, stats)
         )
-        
-        # 更新统计信息
-        total_count = len(bills)
-        total_amount = sum(bill['total_price'] for bill in bills)
+    
+    def on_statistics_loaded(self, version, stats):
+        """统计信息加载完成"""
+        if version != self.list_version:
+            return
         
         filter_text = ""
         if self.filter_customer or self.filter_start_date or self.filter_end_date:
             filter_text = " (已筛选)"
         
-        self.stats_label.text = f"共 {total_count} 条账单{filter_text} | 总金额: ¥{total_amount:.2f}"
-        
-        # 显示账单列表
-        for bill in bills:
-            source_text = "📝手动" if bill['source'] == 'manual' else "📷拍照"
-            
-            item = ThreeLineListItem(
-                text=f"{bill['customer_name']} - {bill['date']}",
-                secondary_text=f"{bill['specification']} | 数量: {bill['quantity']} | 单价: ¥{bill['unit_price']:.2f}",
-                tertiary_text=f"{source_text} | 总价: ¥{bill['total_price']:.2f}",
-                on_release=lambda x, bid=bill['id']: self.show_bill_detail(bid)
-            )
-            self.bill_list.add_widget(item)
+        self.stats_label.text = f"共 {stats['total_count']} 条账单{filter_text} | 总金额: ¥{stats['total_amount']:.2f}"
+    
+    def load_bill_page(self, after=None):
+        """在后台加载一页账单"""
+        self.page_loading = True
+        version = self.list_version
+        self.run_in_background(
+            self.database.filter_bills_page,
+            customer_name=self.filter_customer,
+            start_date=self.filter_start_date,
+            end_date=self.filter_end_date,
+            after=after,
+            limit=BILL_PAGE_SIZE,
+            callback=lambda page: self.on_bill_page_loaded(version, page)
+        )
+    
+    def on_bill_page_loaded(self, version, page):
+        """把加载完成的一页账单追加到列表"""
+        if version != self.list_version:
+            return
+        bills, self.next_page_after = page
+        self.page_loading = False
+        
+        self.bill_list.data.extend([bill_row_data(bill) for bill in bills])
+    
+    def on_bill_list_scroll(self, instance, scroll_y):
+        """滚动到底部附近时加载下一页"""
+        if (scroll_y <= LOAD_MORE_THRESHOLD and self.next_page_after is not None
+                and not self.page_loading):
+            self.load_bill_page(after=self.next_page_after)
     
     def show_filter_dialog(self):
         """显示筛选对话框"""
@@ -235,40 +475,17 @@ class BillingScreen(MDScreen):
         field.text = value.strftime("%Y-%m-%d")
     
     def show_customer_dropdown_for_filter(self, instance):
-        """显示客户下拉菜单（用于筛选）"""
-        customers = self.database.get_all_customers()
-        
-        # 添加"全部客户"选项
-        menu_items = [{
-            "text": "全部客户",
-            "viewclass": "OneLineListItem",
-            "on_release": lambda: self.select_filter_customer("")
-        }]
-        
-        # 添加所有客户
-        for customer in customers:
-            menu_items.append({
-                "text": customer['name'],
-                "viewclass": "OneLineListItem",
-                "on_release": lambda cname=customer['name']: self.select_filter_customer(cname)
-            })
-        
-        # 创建下拉菜单
-        self.customer_menu = MDDropdownMenu(
-            caller=instance,
-            items=menu_items,
-            width_mult=4,
-        )
-        self.customer_menu.open()
+        """打开可搜索的客户选择器（用于筛选，可选全部客户）"""
+        CustomerPicker(
+            self.database,
+            on_select=lambda customer_id, customer_name: self.select_filter_customer(customer_name),
+            allow_all=True
+        ).open()
     
     def select_filter_customer(self, customer_name):
         """选择筛选客户"""
         if self.customer_field_ref:
             self.customer_field_ref.text = customer_name
-        
-        # 关闭下拉菜单
-        if self.customer_menu:
-            self.customer_menu.dismiss()
     
     def apply_filter(self, customer_name, start_date, end_date):
         """应用筛选"""
@@ -292,20 +509,21 @@ class BillingScreen(MDScreen):
     
     def show_bill_detail(self, bill_id):
         """显示账单详情"""
-        bills = self.database.filter_bills()
-        bill = next((b for b in bills if b['id'] == bill_id), None)
-        
+        self.run_in_background(self.database.get_bill, bill_id, callback=self.open_bill_detail)
+    
+    def open_bill_detail(self, bill):
+        """账单加载完成后打开详情对话框"""
         if not bill:
             return
         
         detail_text = f"""
-客户: {bill['customer_name']}
-日期: {bill['date']}
-规格: {bill['specification']}
-数量: {bill['quantity']}
-单价: ¥{bill['unit_price']:.2f}
-总价: ¥{bill['total_price']:.2f}
-来源: {'手动录入' if bill['source'] == 'manual' else '拍照识别'}
+客户: {bill.customer_name}
+日期: {bill.date}
+规格: {bill.specification}
+数量: {bill.quantity}
+单价: ¥{bill.unit_price:.2f}
+总价: ¥{bill.total_price:.2f}
+来源: {'手动录入' if bill.source == 'manual' else '拍照识别'}
         """
         
         detail_dialog = MDDialog(
@@ -314,7 +532,7 @@ class BillingScreen(MDScreen):
             buttons=[
                 MDFlatButton(
                     text="删除",
-                    on_release=lambda x: self.confirm_delete_bill(bill_id, detail_dialog)
+                    on_release=lambda x: self.confirm_delete_bill(bill.id, detail_dialog)
                 ),
                 MDFlatButton(
                     text="关闭",
@@ -346,65 +564,211 @@ class BillingScreen(MDScreen):
     
     def delete_bill(self, bill_id, confirm_dialog):
         """删除账单"""
-        success, message = self.database.delete_bill(bill_id)
         confirm_dialog.dismiss()
-        
+        self.run_in_background(self.database.delete_bill, bill_id, callback=self.on_bill_deleted)
+    
+    def on_bill_deleted(self, result):
+        """删除账单完成"""
+        success, message = result
         if success:
-            self.refresh_bill_list()
+            self.sync_bill_list()
             self.show_message("成功", message)
         else:
             self.show_message("错误", message)
     
-    def export_bills(self):
-        """导出账单到Excel"""
-        if not EXCEL_AVAILABLE:
+    def show_export_dialog(self):
+        """选择导出格式"""
+        self.export_dialog = MDDialog(
+            title="导出账单",
+            type="simple",
+            items=[
+                OneLineListItem(text="Excel (.xlsx)", on_release=lambda x: self.export_bills("xlsx")),
+                OneLineListItem(text="CSV (.csv)", on_release=lambda x: self.export_bills("csv")),
+                OneLineListItem(text="TSV (.tsv)", on_release=lambda x: self.export_bills("tsv")),
+                OneLineListItem(text="月度对账单 (.xlsx)", on_release=lambda x: self.export_statement()),
+                OneLineListItem(text="每个客户单独对账单", on_release=lambda x: self.export_statement(per_customer=True)),
+            ],
+        )
+        self.export_dialog.open()
+    
+    def export_bills(self, export_format="xlsx"):
+        """导出当前筛选的账单（后台任务，可查看进度和取消）"""
+        if self.export_dialog:
+            self.export_dialog.dismiss()
+        
+        if export_format == "xlsx" and not EXCEL_AVAILABLE:
             self.show_message("错误", "需要安装openpyxl库才能导出Excel")
             return
         
-        # 获取当前筛选的账单
-        bills = self.database.filter_bills(
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if export_format == "xlsx":
+            extension, export_fn, options = ".xlsx", export_bills_xlsx, {}
+        else:
+            extension, delimiter = CSV_FORMATS[export_format]
+            export_fn, options = export_bills_csv, {"delimiter": delimiter}
+        filename = f"账单明细_{timestamp}{extension}"
+        filepath = os.path.join(os.path.expanduser("~"), "Documents", filename)
+        
+        self.start_job(
+            "准备导出...",
+            export_fn,
+            self.database,
+            filepath,
             customer_name=self.filter_customer,
             start_date=self.filter_start_date,
-            end_date=self.filter_end_date
+            end_date=self.filter_end_date,
+            on_done=lambda count: self.on_export_done(filepath, count),
+            **options
         )
+    
+    def export_statement(self, per_customer=False):
+        """导出对账单：按筛选的日期范围，未设置时默认本月
+        
+        per_customer 为 False 时生成一个工作簿（每个客户一张工作表），
+        为 True 时在对账单目录下为每个客户各生成一个文件。
+        """
+        if self.export_dialog:
+            self.export_dialog.dismiss()
+        
+        if not EXCEL_AVAILABLE:
+            self.show_message("错误", "需要安装openpyxl库才能导出Excel")
+            return
         
-        if not bills:
+        today = datetime.now()
+        start_date = self.filter_start_date
+        end_date = self.filter_end_date
+        if not start_date and not end_date:
+            start_date = today.strftime("%Y-%m-01")
+            end_date = today.strftime("%Y-%m-%d")
+        period = (start_date or end_date)[:7]
+        if per_customer:
+            output_dir = os.path.join(os.path.expanduser("~"), "Documents", f"对账单_{period}")
+            self.start_job(
+                "准备生成对账单...",
+                generate_statements,
+                self.database.db_path,
+                output_dir,
+                start_date=start_date,
+                end_date=end_date,
+                on_done=lambda result: self.on_statements_done(output_dir, result),
+            )
+            return
+        filename = f"对账单_{period}_{today.strftime('%H%M%S')}.xlsx"
+        filepath = os.path.join(os.path.expanduser("~"), "Documents", filename)
+        
+        self.start_job(
+            "准备生成对账单...",
+            export_monthly_statement,
+            self.database,
+            filepath,
+            start_date=start_date,
+            end_date=end_date,
+            on_done=lambda count: self.on_export_done(filepath, count),
+        )
+    
+    def on_statements_done(self, output_dir, result):
+        """批量对账单生成完成"""
+        self.job_panel.show(False)
+        if not result["customers"]:
             self.show_message("提示", "没有账单可导出")
+        else:
+            self.show_message(
+                "成功",
+                f"已为 {result['customers']} 个客户生成对账单"
+                f"（{result['bills']} 条账单，用时 {result['elapsed']:.1f} 秒）到:\n{output_dir}"
+            )
+    
+    def on_export_done(self, filepath, count):
+        """导出完成"""
+        self.job_panel.show(False)
+        if not count:
+            self.show_message("提示", "没有账单可导出")
+        else:
+            self.show_message("成功", f"共导出 {count} 条账单到:\n{filepath}")
+    
+    def import_bills(self):
+        """选择Excel或CSV/TSV文件导入账单"""
+        if not FILECHOOSER_AVAILABLE:
+            self.show_message("错误", "当前环境不支持选择文件")
+            return
+        
+        filechooser.open_file(
+            on_selection=lambda selection: Clock.schedule_once(
+                lambda dt: self.on_import_file_selected(selection)
+            ),
+            filters=[["Excel/CSV/TSV", "*.xlsx", "*.csv", "*.tsv"]]
+        )
+    
+    def on_import_file_selected(self, selection):
+        """文件选择完成后开始导入"""
+        if not selection:
+            return
+        
+        filepath = selection[0]
+        if filepath.lower().endswith(".xlsx"):
+            if not EXCEL_AVAILABLE:
+                self.show_message("错误", "需要安装openpyxl库才能导入Excel")
+                return
+            import_fn = import_bills_xlsx
+        else:
+            import_fn = import_bills_csv
+        
+        self.start_job(
+            "准备导入...",
+            import_fn,
+            self.database,
+            filepath,
+            on_done=self.on_import_done
+        )
+    
+    def on_import_done(self, result):
+        """导入完成"""
+        self.job_panel.show(False)
+        text = f"成功导入 {result['imported']} 条，失败 {result['rejected']} 条"
+        if result['errors']:
+            details = "\n".join(f"第 {line} 行: {reason}" for line, reason in result['errors'][:5])
+            text += f"\n{details}"
+        if result.get('report_path'):
+            text += f"\n失败明细已保存到:\n{result['report_path']}"
+        self.show_message("导入完成", text)
+        self.sync_bill_list()
+    
+    def start_job(self, text, target, *args, on_done=None, **kwargs):
+        """启动导出/导入后台任务并显示进度"""
+        if self.job and self.job.running:
+            self.show_message("提示", "有任务正在进行，请稍候")
             return
         
-        try:
-            # 创建工作簿
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "账单明细"
-            
-            # 写入表头
-            headers = ["客户名称", "日期", "规格", "数量", "单价", "总价", "来源"]
-            ws.append(headers)
-            
-            # 写入数据
-            for bill in bills:
-                source_text = "手动录入" if bill['source'] == 'manual' else "拍照识别"
-                ws.append([
-                    bill['customer_name'],
-                    bill['date'],
-                    bill['specification'],
-                    bill['quantity'],
-                    bill['unit_price'],
-                    bill['total_price'],
-                    source_text
-                ])
-            
-            # 保存文件
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"账单明细_{timestamp}.xlsx"
-            filepath = os.path.join(os.path.expanduser("~"), "Documents", filename)
-            
-            wb.save(filepath)
-            self.show_message("成功", f"账单已导出到:\n{filepath}")
-            
-        except Exception as e:
-            self.show_message("错误", f"导出失败: {str(e)}")
+        self.job = BackgroundJob(
+            target,
+            *args,
+            database=self.database,
+            on_progress=self.job_panel.update,
+            on_done=on_done,
+            on_error=self.on_job_error,
+            on_cancelled=self.on_job_cancelled,
+            **kwargs
+        )
+        self.job_panel.show(True, text)
+        self.job.start()
+    
+    def cancel_job(self):
+        """取消正在进行的后台任务"""
+        if self.job:
+            self.job.cancel()
+            self.job_panel.cancelling()
+    
+    def on_job_error(self, error):
+        """后台任务失败"""
+        self.job_panel.show(False)
+        self.show_message("错误", f"操作失败: {str(error)}")
+    
+    def on_job_cancelled(self):
+        """后台任务已取消（未完成的导出文件已删除）"""
+        self.job_panel.show(False)
+        self.show_message("提示", "操作已取消")
+        # Excel 导入按块提交，取消前已提交的账单需要显示出来
+        self.sync_bill_list()
     
     def show_message(self, title, text):
         """显示消息对话框"""
@@ -20,7 +20,8 @@ version = 1.0.0
 
 # (list) Application requirements
 # comma separated e.g. requirements = sqlite3,kivy
-requirements = python3,kivy==2.2.1,kivymd==1.1.1,pillow,openpyxl,python-dateutil,plyer,android,pyjnius
+# tesserocr 需要自定义 python-for-android recipe（编译 libtesseract），尚未加入
+requirements = python3,kivy==2.2.1,kivymd==1.1.1,pillow,openpyxl,python-dateutil,plyer,pypinyin,android,pyjnius
 
 # (str) Supported orientation (one of landscape, sensorLandscape, portrait or all)
 orientation = portrait
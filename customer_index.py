@@ -0,0 +1,114 @@
+"""
+客户索引模块 - 按客户名称前缀或拼音首字母快速查找客户
+"""
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List
+
+try:
+    from pypinyin import lazy_pinyin, Style
+    PINYIN_AVAILABLE = True
+except ImportError:
+    PINYIN_AVAILABLE = False
+
+# 没有 pypinyin 时按 GB2312 一级汉字（按拼音排序）的编码区间推算首字母，
+# 二级汉字按部首排序，无法推算，保留原字
+GB2312_INITIALS = [
+    (0xB0A1, "a"), (0xB0C5, "b"), (0xB2C1, "c"), (0xB4EE, "d"), (0xB6EA, "e"),
+    (0xB7A2, "f"), (0xB8C1, "g"), (0xB9FE, "h"), (0xBBF7, "j"), (0xBFA6, "k"),
+    (0xC0AC, "l"), (0xC2E8, "m"), (0xC4C3, "n"), (0xC5B6, "o"), (0xC5BE, "p"),
+    (0xC6DA, "q"), (0xC8BB, "r"), (0xC8F6, "s"), (0xCBFA, "t"), (0xCDDA, "w"),
+    (0xCEF4, "x"), (0xD1B9, "y"), (0xD4D1, "z"),
+]
+GB2312_LEVEL1_END = 0xD7F9
+GB2312_CODES = [code for code, _ in GB2312_INITIALS]
+
+
+def _gb2312_initial(char: str) -> str:
+    """按 GB2312 编码推算单个汉字的拼音首字母"""
+    try:
+        encoded = char.encode("gb2312")
+    except UnicodeEncodeError:
+        return char
+    if len(encoded) != 2:
+        return char
+    code = (encoded[0] << 8) | encoded[1]
+    if code < GB2312_CODES[0] or code > GB2312_LEVEL1_END:
+        return char
+    return GB2312_INITIALS[bisect_left(GB2312_CODES, code + 1) - 1][1]
+
+
+def pinyin_initials(name: str) -> str:
+    """客户名称的拼音首字母（如 "张三五金" -> "zswj"），非汉字按小写保留"""
+    if PINYIN_AVAILABLE:
+        # 非汉字片段（如 "ABC"）按单个字符返回，取首字母时才不会被截短
+        return "".join(
+            syllable[:1] for syllable in lazy_pinyin(name, style=Style.FIRST_LETTER,
+                                                     errors=list)
+        ).lower()
+    return "".join(_gb2312_initial(char) for char in name.lower())
+
+
+class CustomerIndex:
+    """客户名称前缀 + 拼音首字母前缀的内存索引
+    
+    两个有序的 (键, 客户id) 列表，查找时二分定位前缀区间，只取前 limit 个。
+    由 Database 在客户增删时增量维护，可以跨线程使用。
+    """
+    
+    def __init__(self, customers: Iterable[Dict] = ()):
+        self._lock = threading.Lock()
+        self._names = {customer['id']: customer['name'] for customer in customers}
+        self._by_name = sorted(
+            (name.lower(), customer_id) for customer_id, name in self._names.items()
+        )
+        self._by_initials = sorted(
+            (pinyin_initials(name), customer_id) for customer_id, name in self._names.items()
+        )
+    
+    def __len__(self):
+        return len(self._names)
+    
+    def add(self, customer_id: int, name: str):
+        """加入一个客户（已存在时忽略）"""
+        with self._lock:
+            if customer_id in self._names:
+                return
+            self._names[customer_id] = name
+            insort(self._by_name, (name.lower(), customer_id))
+            insort(self._by_initials, (pinyin_initials(name), customer_id))
+    
+    def remove(self, customer_id: int):
+        """移除一个客户（不存在时忽略）"""
+        with self._lock:
+            name = self._names.pop(customer_id, None)
+            if name is None:
+                return
+            for entries, key in ((self._by_name, name.lower()),
+                                 (self._by_initials, pinyin_initials(name))):
+                position = bisect_left(entries, (key, customer_id))
+                if position < len(entries) and entries[position] == (key, customer_id):
+                    del entries[position]
+    
+    def search(self, text: str, limit: int = 20) -> List[Dict]:
+        """返回名称或拼音首字母以 text 开头的客户，名称匹配在前，最多 limit 个
+        
+        text 为空时按名称顺序返回前 limit 个客户。
+        """
+        prefix = text.strip().lower()
+        results = []
+        seen = set()
+        with self._lock:
+            for entries in (self._by_name, self._by_initials):
+                position = bisect_left(entries, (prefix,))
+                while position < len(entries) and len(results) < limit:
+                    key, customer_id = entries[position]
+                    if not key.startswith(prefix):
+                        break
+                    if customer_id not in seen:
+                        seen.add(customer_id)
+                        results.append({'id': customer_id, 'name': self._names[customer_id]})
+                    position += 1
+                if len(results) >= limit:
+                    break
+        return results
@@ -0,0 +1,108 @@
+"""
+客户选择器 - 输入名称或拼音首字母即时筛选客户
+"""
+from kivymd.uix.boxlayout import MDBoxLayout
+from kivymd.uix.button import MDFlatButton
+from kivymd.uix.dialog import MDDialog
+from kivymd.uix.list import MDList, OneLineListItem
+from kivymd.uix.scrollview import MDScrollView
+from kivymd.uix.textfield import MDTextField
+from kivy.clock import Clock
+from kivy.metrics import dp
+
+# 最多显示的候选客户数
+PICKER_LIMIT = 20
+# 停止输入多久后才查询（秒）
+PICKER_DELAY = 0.15
+
+
+class CustomerPicker:
+    """可搜索的客户选择对话框
+    
+    候选来自 Database.search_customers（名称前缀 + 拼音首字母索引），
+    只显示前 PICKER_LIMIT 个，客户再多也不会一次创建大量列表项。
+    选中后调用 on_select(customer_id, customer_name)；
+    allow_all 为 True 时顶部多一个“全部客户”，选中时传入 (None, "")。
+    """
+    
+    def __init__(self, database, on_select, title="选择客户", allow_all=False):
+        self.database = database
+        self.on_select = on_select
+        self.allow_all = allow_all
+        # 每次查询递增，用于丢弃过期的结果
+        self.query_version = 0
+        self.search_trigger = Clock.create_trigger(self.run_search, PICKER_DELAY)
+        
+        content = MDBoxLayout(orientation='vertical', size_hint_y=None, height=dp(360))
+        self.search_field = MDTextField(
+            hint_text="输入客户名称或拼音首字母",
+            icon_right="magnify"
+        )
+        self.search_field.bind(text=self.on_search_text)
+        content.add_widget(self.search_field)
+        
+        scroll = MDScrollView()
+        self.result_list = MDList()
+        scroll.add_widget(self.result_list)
+        content.add_widget(scroll)
+        
+        self.dialog = MDDialog(
+            title=title,
+            type="custom",
+            content_cls=content,
+            buttons=[MDFlatButton(text="取消", on_release=lambda x: self.dismiss())]
+        )
+    
+    def open(self):
+        """打开对话框并显示前几个客户"""
+        self.dialog.open()
+        self.run_search()
+    
+    def dismiss(self):
+        """关闭对话框"""
+        self.search_trigger.cancel()
+        self.dialog.dismiss()
+    
+    def on_search_text(self, instance, text):
+        """输入变化：重新计时，停止输入后才查询"""
+        self.search_trigger.cancel()
+        self.search_trigger()
+    
+    def run_search(self, *args):
+        """在后台查询候选客户"""
+        self.query_version += 1
+        version = self.query_version
+        self.database.submit(
+            self.database.search_customers,
+            self.search_field.text,
+            PICKER_LIMIT,
+            callback=lambda customers: self.show_results(version, customers)
+        )
+    
+    def show_results(self, version, customers):
+        """显示候选客户"""
+        if version != self.query_version:
+            return
+        self.result_list.clear_widgets()
+        
+        if self.allow_all:
+            self.result_list.add_widget(OneLineListItem(
+                text="全部客户",
+                on_release=lambda x: self.select(None, "")
+            ))
+        if not customers:
+            self.result_list.add_widget(OneLineListItem(
+                text="没有匹配的客户" if self.search_field.text.strip() else "暂无客户，请先在'客户信息'中添加客户",
+                disabled=True
+            ))
+        for customer in customers:
+            self.result_list.add_widget(OneLineListItem(
+                text=customer['name'],
+                on_release=lambda x, cid=customer['id'], cname=customer['name']:
+                    self.select(cid, cname)
+            ))
+    
+    def select(self, customer_id, customer_name):
+        """选中客户"""
+        self.dismiss()
+        self.on_select(customer_id, customer_name)
@@ -1,125 +1,617 @@
 """
 数据库模块 - 管理客户、产品和账单数据
 """
+import math
 import sqlite3
 import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, Iterable, Iterator, List, Dict, NamedTuple, Optional, Set, Tuple
+from urllib.parse import quote
+
+from customer_index import CustomerIndex
+
+try:
+    from kivy.clock import Clock
+    CLOCK_AVAILABLE = True
+except ImportError:
+    CLOCK_AVAILABLE = False
+
+
+# ==================== 数据库迁移 ====================
+# MIGRATIONS[i] 把数据库从版本 i 升级到版本 i + 1，只能追加，不能修改已发布的迁移
+
+MIGRATIONS = [
+    # 版本 1：基础表结构
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS customers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_id INTEGER NOT NULL,
+            specification TEXT NOT NULL,
+            unit_price REAL NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (customer_id) REFERENCES customers(id) ON DELETE CASCADE
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS bills (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_id INTEGER NOT NULL,
+            customer_name TEXT NOT NULL,
+            date TEXT NOT NULL,
+            specification TEXT NOT NULL,
+            quantity REAL NOT NULL,
+            unit_price REAL NOT NULL,
+            total_price REAL NOT NULL,
+            source TEXT DEFAULT 'manual',
+            photo_path TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (customer_id) REFERENCES customers(id)
+        )
+        ''',
+    ],
+    # 版本 2：账单筛选、排序和产品查询使用的索引
+    [
+        "CREATE INDEX IF NOT EXISTS idx_bills_customer_date ON bills (customer_name, date, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_bills_date ON bills (date, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_products_customer_spec ON products (customer_id, specification)",
+    ],
+    # 版本 3：保存拍照账单的OCR原文，供全文搜索
+    [
+        "ALTER TABLE bills ADD COLUMN ocr_text TEXT",
+    ],
+    # 版本 4：批量识别照片生成的待确认账单
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS bill_drafts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            photo_path TEXT NOT NULL UNIQUE,
+            customer_name TEXT,
+            date TEXT,
+            specification TEXT,
+            quantity REAL,
+            unit_price REAL,
+            ocr_text TEXT,
+            ocr_confidence REAL,
+            confidence REAL NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_bill_drafts_confidence ON bill_drafts (confidence, id)",
+    ],
+    # 版本 5：丢弃的待确认账单保留为 discarded（重新扫描目录时不再入队），
+    # 批量识别时按照片路径排除已入账的照片
+    [
+        "ALTER TABLE bill_drafts ADD COLUMN status TEXT NOT NULL DEFAULT 'pending'",
+        "DROP INDEX IF EXISTS idx_bill_drafts_confidence",
+        "CREATE INDEX IF NOT EXISTS idx_bill_drafts_status ON bill_drafts (status, confidence, id)",
+        "CREATE INDEX IF NOT EXISTS idx_bills_photo_path ON bills (photo_path) WHERE photo_path IS NOT NULL",
+    ],
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+# 账单全文索引（FTS5 外部内容表 + 同步触发器）。
+# 不属于迁移：不是所有平台的 SQLite 都带 FTS5，由 init_database 按需建立或移除。
+# trigram 分词可以匹配中文的任意子串，但查询词至少需要 3 个字符
+SEARCH_INDEX_SQL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS bills_fts USING fts5(
+           customer_name, specification, ocr_text,
+           content='bills', content_rowid='id', tokenize='trigram'
+       )""",
+    """CREATE TRIGGER IF NOT EXISTS bills_fts_insert AFTER INSERT ON bills BEGIN
+           INSERT INTO bills_fts (rowid, customer_name, specification, ocr_text)
+           VALUES (new.id, new.customer_name, new.specification, new.ocr_text);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS bills_fts_delete AFTER DELETE ON bills BEGIN
+           INSERT INTO bills_fts (bills_fts, rowid, customer_name, specification, ocr_text)
+           VALUES ('delete', old.id, old.customer_name, old.specification, old.ocr_text);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS bills_fts_update
+       AFTER UPDATE OF customer_name, specification, ocr_text ON bills BEGIN
+           INSERT INTO bills_fts (bills_fts, rowid, customer_name, specification, ocr_text)
+           VALUES ('delete', old.id, old.customer_name, old.specification, old.ocr_text);
+           INSERT INTO bills_fts (rowid, customer_name, specification, ocr_text)
+           VALUES (new.id, new.customer_name, new.specification, new.ocr_text);
+       END""",
+]
+SEARCH_TRIGGERS = frozenset({"bills_fts_insert", "bills_fts_delete", "bills_fts_update"})
+SEARCH_MIN_TERM_LENGTH = 3
+
+
+
+class Bill(NamedTuple):
+    """账单记录（基于元组，字段顺序与 BILL_COLUMNS 一致，比逐行字典更省内存）"""
+    id: int
+    customer_id: int
+    customer_name: str
+    date: str
+    specification: str
+    quantity: float
+    unit_price: float
+    total_price: float
+    source: str
+    photo_path: Optional[str]
+    created_at: str
+
+
+# 账单查询的列顺序和默认排序（id 作为同一时刻账单的稳定次序）
+BILL_COLUMNS = ", ".join(Bill._fields)
+BILL_ORDER = "date DESC, created_at DESC, id DESC"
+# 对账单按客户分组、组内按时间先后排列
+STATEMENT_ORDER = "customer_name, date, created_at, id"
+
+# 搜索时与全文索引表联接，列名需要带表别名
+SEARCH_COLUMNS = ", ".join("b." + field for field in Bill._fields)
+
+INSERT_BILL_SQL = """INSERT INTO bills (customer_id, customer_name, date, specification,
+                     quantity, unit_price, total_price, source, photo_path, ocr_text)
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+# 有全文索引时，批量添加先写入临时表，再用一条 INSERT ... SELECT 转入 bills：
+# FTS5 在每个语句的保存点都会把缓冲的索引数据写盘，逐行 executemany 会让
+# 触发器为每一行生成一个索引段，整块转入则每块只写一次
+BILL_STAGING_COLUMNS = ("customer_id, customer_name, date, specification, quantity, "
+                        "unit_price, total_price, source, photo_path, ocr_text")
+CREATE_BILL_STAGING_SQL = (f"CREATE TEMP TABLE IF NOT EXISTS bill_staging "
+                           f"AS SELECT {BILL_STAGING_COLUMNS} FROM main.bills WHERE 0")
+STAGE_BILL_SQL = "INSERT INTO temp.bill_staging VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+COPY_STAGED_BILLS_SQL = (f"INSERT INTO main.bills ({BILL_STAGING_COLUMNS}) "
+                         f"SELECT {BILL_STAGING_COLUMNS} FROM temp.bill_staging ORDER BY rowid")
+
+# 待确认账单的列顺序；confidence 为 0~1 的整体可信度，ocr_confidence 为识别引擎给出的 0~100
+DRAFT_FIELDS = ("id", "photo_path", "customer_name", "date", "specification", "quantity",
+                "unit_price", "ocr_text", "ocr_confidence", "confidence", "error", "created_at")
+DRAFT_COLUMNS = ", ".join(DRAFT_FIELDS)
+# 待确认账单的状态：等待审核 / 已丢弃（确认入账的直接移入 bills）
+DRAFT_PENDING = "pending"
+DRAFT_DISCARDED = "discarded"
+# 审核时可以修改的字段
+DRAFT_EDITABLE_FIELDS = ("customer_name", "date", "specification", "quantity", "unit_price")
+
+# add_bills 中成功行共享同一个结果对象，避免大批量导入时逐行分配
+BILL_ADDED = (True, "账单添加成功")
+
+# 变更事件类型
+BILLS_ADDED = "bills_added"              # first_id..last_id 为新账单的 id 范围
+BILL_DELETED = "bill_deleted"            # first_id 为被删除的账单 id
+CUSTOMERS_CHANGED = "customers_changed"  # 客户增删
+PRODUCTS_CHANGED = "products_changed"    # first_id 为客户 id（None 表示不确定哪个客户）
+
+# 内存中保留的最近变更事件数，更早的变更只能通过完整刷新获得
+CHANGE_LOG_SIZE = 256
+
+
+class ChangeEvent(NamedTuple):
+    """一次数据变更，version 为变更后的数据版本号"""
+    version: int
+    kind: str
+    first_id: Optional[int] = None
+    last_id: Optional[int] = None
+
+
+def bill_changes(changes: Iterable[ChangeEvent]) -> Tuple[Set[int], List[Tuple[int, int]]]:
+    """从变更事件中取出被删除的账单 id 和新增账单的 (first_id, last_id) 范围"""
+    deleted = set()
+    added = []
+    for event in changes:
+        if event.kind == BILL_DELETED:
+            deleted.add(event.first_id)
+        elif event.kind == BILLS_ADDED:
+            added.append((event.first_id, event.last_id))
+    return deleted, added
+
+
+def write_operation(method: Callable) -> Callable:
+    """标记 Database 的写方法：通过 submit 提交时在唯一的写线程上串行执行"""
+    method.write_operation = True
+    return method
 
 
 class Database:
-    def __init__(self, db_path: str = "accounting.db"):
-        """初始化数据库连接"""
+    def __init__(self, db_path: str = "accounting.db", cache_size: int = -8000,
+                 mmap_size: int = 64 * 1024 * 1024, synchronous: str = "NORMAL",
+                 products_cache_size: int = 64, reader_threads: int = 2,
+                 read_only: bool = False):
+        """初始化数据库连接
+        
+        cache_size 为负数时表示 KiB（SQLite 约定），mmap_size 为字节数，
+        synchronous 可选 OFF / NORMAL / FULL。
+        products_cache_size 为内存中缓存产品列表的客户数上限（LRU）。
+        reader_threads 为 submit 使用的后台读线程数量。
+        read_only 为 True 时以只读方式打开已有数据库且不执行迁移（供批量导出的子进程使用）。
+        """
         self.db_path = db_path
-        self.init_database()
+        self.read_only = read_only
+        self.cache_size = cache_size
+        self.mmap_size = mmap_size
+        self.synchronous = synchronous
+        # 每个线程持有一个长连接，避免每次调用都重新打开数据库
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        # 客户列表和各客户产品列表的内存缓存，由增删改方法精确失效
+        self.products_cache_size = products_cache_size
+        self._customers_cache = None
+        self._products_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_generation = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # 客户选择器使用的名称/拼音首字母索引，首次搜索时建立，之后随客户增删更新
+        self._customer_index = None
+        self._customer_index_lock = threading.Lock()
+        # 数据版本号：每次增删改递增，界面据此判断是否需要刷新
+        self.data_version = 0
+        self._change_log = deque(maxlen=CHANGE_LOG_SIZE)
+        self._change_lock = threading.Lock()
+        # submit 使用的后台线程：写操作串行，读操作并发
+        self.reader_threads = reader_threads
+        self._writer = None
+        self._readers = None
+        self._executor_lock = threading.Lock()
+        # 全文索引是否可用（不可用时 search_bills 退回 LIKE 扫描）
+        self.search_index_enabled = False
+        if read_only:
+            self.search_index_enabled = self._search_index_usable(self.get_connection())
+        else:
+            self.init_database()
     
     def get_connection(self):
-        """获取数据库连接"""
-        return sqlite3.connect(self.db_path)
+        """获取当前线程的长连接（首次调用时创建）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.read_only:
+                uri = "file:" + quote(os.path.abspath(self.db_path)) + "?mode=ro"
+                conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            else:
+                conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            conn.execute(f"PRAGMA cache_size={int(self.cache_size)}")
+            conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+    
+    def close_thread_connection(self):
+        """关闭当前线程的连接（供临时工作线程退出前调用）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._connections_lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+        conn.close()
+    
+    def close(self):
+        """停止后台线程并关闭所有线程的连接（应用退出时调用）"""
+        with self._executor_lock:
+            executors = (self._writer, self._readers)
+            self._writer = self._readers = None
+        for executor in executors:
+            if executor is not None:
+                executor.shutdown(wait=True)
+        
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+    
+    # ==================== 后台执行 ====================
+    
+    def submit(self, fn: Callable, *args, callback: Optional[Callable] = None,
+               error_callback: Optional[Callable] = None, write: Optional[bool] = None, **kwargs):
+        """在后台线程执行 fn(*args, **kwargs)，结果通过 Clock 回到主线程
+        
+        写操作（用 write_operation 标记的方法，或 write=True）在唯一的写线程上串行执行，
+        其余在读线程池中执行。fn 不是本数据库的方法（如 lambda、界面的方法）时
+        必须显式传入 write，避免写操作被误放到读线程池中。
+        callback(result) 和 error_callback(exception) 在主线程调用。
+        """
+        if write is None:
+            if getattr(fn, "__self__", None) is not self:
+                raise ValueError(f"提交 {getattr(fn, '__qualname__', fn)!r} 时需要指定 write")
+            write = getattr(fn, "write_operation", False)
+        
+        future = self._get_executor(write).submit(fn, *args, **kwargs)
+        
+        def deliver(done):
+            error = done.exception()
+            if error is not None:
+                target, value = error_callback, error
+            else:
+                target, value = callback, done.result()
+            if target is None:
+                return
+            if CLOCK_AVAILABLE:
+                Clock.schedule_once(lambda dt: target(value))
+            else:
+                target(value)
+        
+        future.add_done_callback(deliver)
+        return future
+    
+    def _get_executor(self, write: bool) -> ThreadPoolExecutor:
+        """按需创建写线程或读线程池"""
+        with self._executor_lock:
+            if write:
+                if self._writer is None:
+                    self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+                return self._writer
+            if self._readers is None:
+                self._readers = ThreadPoolExecutor(max_workers=self.reader_threads,
+                                                   thread_name_prefix="db-reader")
+            return self._readers
+    
+    # ==================== 缓存 ====================
+    
+    def cache_stats(self) -> Dict:
+        """返回缓存命中统计"""
+        with self._cache_lock:
+            return {
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+                "products_cached": len(self._products_cache),
+                "customers_cached": self._customers_cache is not None
+            }
+    
+    def _invalidate_customers(self):
+        """客户增删后使客户列表缓存失效，并记录变更事件"""
+        with self._cache_lock:
+            self._customers_cache = None
+            self._cache_generation += 1
+        self._record_change(CUSTOMERS_CHANGED)
+    
+    def _invalidate_products(self, customer_id: Optional[int]):
+        """产品变化后使该客户的产品缓存失效（customer_id 未知时清空全部），并记录变更事件"""
+        with self._cache_lock:
+            if customer_id is None:
+                self._products_cache.clear()
+            else:
+                self._products_cache.pop(customer_id, None)
+            self._cache_generation += 1
+        self._record_change(PRODUCTS_CHANGED, customer_id)
+    
+    # ==================== 变更通知 ====================
+    
+    def _record_change(self, kind: str, first_id: Optional[int] = None,
+                       last_id: Optional[int] = None):
+        """递增数据版本号并记录一条变更事件（在提交成功后调用）"""
+        with self._change_lock:
+            self.data_version += 1
+            self._change_log.append(ChangeEvent(
+                self.data_version, kind, first_id,
+                first_id if last_id is None else last_id
+            ))
+    
+    def changes_since(self, version: int) -> Optional[List[ChangeEvent]]:
+        """返回 version 之后的变更事件（按先后顺序）
+        
+        没有变更时返回空列表；变更太多、事件日志已不完整时返回 None，调用方应完整刷新。
+        """
+        with self._change_lock:
+            if version >= self.data_version:
+                return []
+            if not self._change_log or self._change_log[0].version > version + 1:
+                return None
+            return [event for event in self._change_log if event.version > version]
     
     def init_database(self):
-        """初始化数据库表结构"""
+        """初始化数据库表结构（按 PRAGMA user_version 执行未完成的迁移）"""
         conn = self.get_connection()
-        cursor = conn.cursor()
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
         
-        # 创建客户表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS customers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL UNIQUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # 创建产品规格表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                customer_id INTEGER NOT NULL,
-                specification TEXT NOT NULL,
-                unit_price REAL NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (customer_id) REFERENCES customers(id) ON DELETE CASCADE
-            )
-        ''')
-        
-        # 创建账单表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS bills (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                customer_id INTEGER NOT NULL,
-                customer_name TEXT NOT NULL,
-                date TEXT NOT NULL,
-                specification TEXT NOT NULL,
-                quantity REAL NOT NULL,
-                unit_price REAL NOT NULL,
-                total_price REAL NOT NULL,
-                source TEXT DEFAULT 'manual',
-                photo_path TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (customer_id) REFERENCES customers(id)
-            )
-        ''')
+        for target_version in range(version + 1, SCHEMA_VERSION + 1):
+            with conn:
+                conn.execute("BEGIN")
+                for statement in MIGRATIONS[target_version - 1]:
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {target_version}")
         
-        conn.commit()
-        conn.close()
+        self.search_index_enabled = self._init_search_index(conn)
+    
+    @staticmethod
+    def _fts_supported(conn) -> bool:
+        """当前 SQLite 是否支持 FTS5 trigram 分词"""
+        try:
+            conn.execute("CREATE VIRTUAL TABLE temp.fts_probe USING fts5(x, tokenize='trigram')")
+            conn.execute("DROP TABLE temp.fts_probe")
+            return True
+        except sqlite3.OperationalError:
+            return False
+    
+    @staticmethod
+    def _search_index_usable(conn) -> bool:
+        """全文索引表和同步触发器都已存在且当前 SQLite 支持 FTS5
+        
+        索引已建立时只读取 sqlite_master 并编译一条读取索引表的语句
+        （不支持 FTS5 时编译失败），不执行任何 DDL。
+        """
+        names = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE name = 'bills_fts' OR "
+            "(type = 'trigger' AND tbl_name = 'bills')")}
+        if "bills_fts" not in names or not SEARCH_TRIGGERS <= names:
+            return False
+        try:
+            conn.execute("SELECT rowid FROM bills_fts LIMIT 0")
+        except sqlite3.Error:
+            return False
+        return True
+    
+    def _init_search_index(self, conn) -> bool:
+        """建立账单全文索引，返回是否可用
+        
+        首次建立时用 'rebuild' 为已有账单生成索引。SQLite 不支持 FTS5 时
+        （例如把数据库拷到了另一台设备上）删除同步触发器，否则插入账单会失败。
+        """
+        if self._search_index_usable(conn):
+            return True
+        
+        if not self._fts_supported(conn):
+            with conn:
+                for trigger in SEARCH_TRIGGERS:
+                    conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            return False
+        
+        with conn:
+            conn.execute("BEGIN")
+            for statement in SEARCH_INDEX_SQL:
+                conn.execute(statement)
+            conn.execute("INSERT INTO bills_fts (bills_fts) VALUES ('rebuild')")
+        return True
     
     # ==================== 客户管理 ====================
     
+    @write_operation
     def add_customer(self, name: str) -> Tuple[bool, str]:
         """添加客户"""
         try:
             conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO customers (name) VALUES (?)", (name,))
-            conn.commit()
-            conn.close()
+            with conn:
+                cursor = conn.cursor()
+                cursor.execute("INSERT INTO customers (name) VALUES (?)", (name,))
+            self._invalidate_customers()
+            self._update_customer_index(added=[(cursor.lastrowid, name)])
             return True, "客户添加成功"
         except sqlite3.IntegrityError:
             return False, "客户已存在"
         except Exception as e:
             return False, f"添加失败: {str(e)}"
     
+    @write_operation
+    def get_or_create_customer(self, name: str) -> Optional[int]:
+        """按名称获取客户 id，不存在时创建（单个事务内完成），失败返回 None"""
+        try:
+            conn = self.get_connection()
+            with conn:
+                customer_id, created = self._resolve_customer_id(conn.cursor(), name)
+            if created:
+                self._invalidate_customers()
+                self._update_customer_index(added=[(customer_id, name)])
+            return customer_id
+        except sqlite3.Error:
+            return None
+    
+    @staticmethod
+    def _resolve_customer_id(cursor, name: str) -> Tuple[int, bool]:
+        """在调用方的事务中按名称查找或插入客户，返回 (客户 id, 是否新建)"""
+        cursor.execute("SELECT id FROM customers WHERE name = ?", (name,))
+        row = cursor.fetchone()
+        if row is not None:
+            return row[0], False
+        
+        cursor.execute(
+            "INSERT INTO customers (name) VALUES (?) ON CONFLICT(name) DO NOTHING",
+            (name,)
+        )
+        created = cursor.rowcount > 0
+        cursor.execute("SELECT id FROM customers WHERE name = ?", (name,))
+        return cursor.fetchone()[0], created
+    
     def get_all_customers(self) -> List[Dict]:
-        """获取所有客户"""
+        """获取所有客户（优先读取缓存）"""
+        with self._cache_lock:
+            if self._customers_cache is not None:
+                self.cache_hits += 1
+                return list(self._customers_cache)
+            self.cache_misses += 1
+            generation = self._cache_generation
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute("SELECT id, name FROM customers ORDER BY name")
         customers = [{"id": row[0], "name": row[1]} for row in cursor.fetchall()]
-        conn.close()
-        return customers
+        
+        with self._cache_lock:
+            # 查询期间缓存被失效过，结果可能已过期，不写回
+            if generation == self._cache_generation:
+                self._customers_cache = customers
+        return list(customers)
     
+    @write_operation
     def delete_customer(self, customer_id: int) -> Tuple[bool, str]:
         """删除客户"""
         try:
             conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM customers WHERE id = ?", (customer_id,))
-            conn.commit()
-            conn.close()
+            with conn:
+                cursor = conn.cursor()
+                cursor.execute("DELETE FROM customers WHERE id = ?", (customer_id,))
+            self._invalidate_customers()
+            self._invalidate_products(customer_id)
+            self._update_customer_index(removed=[customer_id])
             return True, "客户删除成功"
         except Exception as e:
             return False, f"删除失败: {str(e)}"
     
+    def search_customers(self, text: str, limit: int = 20) -> List[Dict]:
+        """按名称前缀或拼音首字母查找客户，最多返回 limit 个（首次调用时建立索引）"""
+        with self._customer_index_lock:
+            if self._customer_index is None:
+                self._customer_index = CustomerIndex(self.get_all_customers())
+            index = self._customer_index
+        return index.search(text, limit)
+    
+    def _update_customer_index(self, added: Iterable[Tuple[int, str]] = (),
+                               removed: Iterable[int] = ()):
+        """客户增删提交后更新客户索引（索引尚未建立时跳过）
+        
+        与建立索引共用一把锁：建立时读到的是提交前还是提交后的数据，更新后结果都一致。
+        """
+        with self._customer_index_lock:
+            if self._customer_index is None:
+                return
+            for customer_id, name in added:
+                self._customer_index.add(customer_id, name)
+            for customer_id in removed:
+                self._customer_index.remove(customer_id)
+    
     # ==================== 产品管理 ====================
     
+    @write_operation
     def add_product(self, customer_id: int, specification: str, unit_price: float) -> Tuple[bool, str]:
         """添加产品规格"""
         try:
             conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO products (customer_id, specification, unit_price) VALUES (?, ?, ?)",
-                (customer_id, specification, unit_price)
-            )
-            conn.commit()
-            conn.close()
+            with conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "INSERT INTO products (customer_id, specification, unit_price) VALUES (?, ?, ?)",
+                    (customer_id, specification, unit_price)
+                )
+            self._invalidate_products(customer_id)
             return True, "产品添加成功"
         except Exception as e:
             return False, f"添加失败: {str(e)}"
     
     def get_products_by_customer(self, customer_id: int) -> List[Dict]:
-        """获取指定客户的所有产品"""
+        """获取指定客户的所有产品（优先读取 LRU 缓存）"""
+        with self._cache_lock:
+            products = self._products_cache.get(customer_id)
+            if products is not None:
+                self._products_cache.move_to_end(customer_id)
+                self.cache_hits += 1
+                return list(products)
+            self.cache_misses += 1
+            generation = self._cache_generation
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute(
@@ -130,156 +622,559 @@ class Database:
             {"id": row[0], "specification": row[1], "unit_price": row[2]}
             for row in cursor.fetchall()
         ]
-        conn.close()
-        return products
+        
+        with self._cache_lock:
+            if generation == self._cache_generation:
+                self._products_cache[customer_id] = products
+                while len(self._products_cache) > self.products_cache_size:
+                    self._products_cache.popitem(last=False)
+        return list(products)
     
+    @write_operation
     def update_product(self, product_id: int, specification: str, unit_price: float) -> Tuple[bool, str]:
         """更新产品信息"""
         try:
             conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute(
-                "UPDATE products SET specification = ?, unit_price = ? WHERE id = ?",
-                (specification, unit_price, product_id)
-            )
-            conn.commit()
-            conn.close()
+            with conn:
+                cursor = conn.cursor()
+                customer_id = self._product_customer_id(cursor, product_id)
+                cursor.execute(
+                    "UPDATE products SET specification = ?, unit_price = ? WHERE id = ?",
+                    (specification, unit_price, product_id)
+                )
+            self._invalidate_products(customer_id)
             return True, "产品更新成功"
         except Exception as e:
             return False, f"更新失败: {str(e)}"
     
+    @write_operation
     def delete_product(self, product_id: int) -> Tuple[bool, str]:
         """删除产品"""
         try:
             conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM products WHERE id = ?", (product_id,))
-            conn.commit()
-            conn.close()
+            with conn:
+                cursor = conn.cursor()
+                customer_id = self._product_customer_id(cursor, product_id)
+                cursor.execute("DELETE FROM products WHERE id = ?", (product_id,))
+            self._invalidate_products(customer_id)
             return True, "产品删除成功"
         except Exception as e:
             return False, f"删除失败: {str(e)}"
     
+    @staticmethod
+    def _product_customer_id(cursor, product_id: int) -> Optional[int]:
+        """查询产品所属客户 id（用于精确失效产品缓存）"""
+        cursor.execute("SELECT customer_id FROM products WHERE id = ?", (product_id,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+    
     # ==================== 账单管理 ====================
     
+    @write_operation
     def add_bill(self, customer_id: int, customer_name: str, date: str, 
                  specification: str, quantity: float, unit_price: float, 
-                 source: str = 'manual', photo_path: str = None) -> Tuple[bool, str]:
-        """添加账单"""
+                 source: str = 'manual', photo_path: str = None,
+                 ocr_text: str = None) -> Tuple[bool, str]:
+        """添加账单（ocr_text 为拍照识别的原文，会被全文索引）"""
         try:
             total_price = quantity * unit_price
             conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute(
-                """INSERT INTO bills (customer_id, customer_name, date, specification, 
-                   quantity, unit_price, total_price, source, photo_path) 
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (customer_id, customer_name, date, specification, quantity, 
-                 unit_price, total_price, source, photo_path)
-            )
-            conn.commit()
-            conn.close()
+            with conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    INSERT_BILL_SQL,
+                    (customer_id, customer_name, date, specification, quantity, 
+                     unit_price, total_price, source, photo_path, ocr_text)
+                )
+            self._record_change(BILLS_ADDED, cursor.lastrowid)
             return True, "账单添加成功"
         except Exception as e:
             return False, f"添加失败: {str(e)}"
     
-    def get_all_bills(self) -> List[Dict]:
-        """获取所有账单"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            """SELECT id, customer_id, customer_name, date, specification, 
-               quantity, unit_price, total_price, source, photo_path, created_at 
-               FROM bills ORDER BY date DESC, created_at DESC"""
-        )
-        bills = [
-            {
-                "id": row[0],
-                "customer_id": row[1],
-                "customer_name": row[2],
-                "date": row[3],
-                "specification": row[4],
-                "quantity": row[5],
-                "unit_price": row[6],
-                "total_price": row[7],
-                "source": row[8],
-                "photo_path": row[9],
-                "created_at": row[10]
-            }
-            for row in cursor.fetchall()
-        ]
-        conn.close()
-        return bills
+    @write_operation
+    def add_bills(self, bills: Iterable[Dict], chunk_size: int = 1000,
+                  create_customers: bool = False,
+                  create_products: bool = False,
+                  before_commit: Optional[Callable] = None) -> List[Tuple[bool, str]]:
+        """批量添加账单（单个事务，按 chunk_size 分批 executemany）
+        
+        bills 中每项为包含 add_bill 同名字段的字典，source / photo_path 可省略。
+        create_customers 为 True 时，没有 customer_id 的行按 customer_name 解析客户，
+        名称到 id 的映射只查询一次，缺失的客户在同一事务中创建。
+        create_products 为 True 时，客户尚未登记的规格按账单单价批量补建产品。
+        返回与输入一一对应的 (成功, 消息) 列表；校验失败的行被跳过，
+        数据库出错时整个事务回滚，所有已通过校验的行都标记为失败。
+        bills 迭代过程中抛出的异常（如导入被取消）会回滚事务并继续向外抛出。
+        before_commit(cursor, outcomes) 在全部账单写入后、同一事务提交前调用。
+        """
+        outcomes = []
+        inserted = 0
+        new_customers = {}
+        known_products = set()
+        product_customers = set()
+        
+        def flush(cursor, chunk):
+            nonlocal inserted
+            if self.search_index_enabled:
+                cursor.execute(CREATE_BILL_STAGING_SQL)
+                cursor.executemany(STAGE_BILL_SQL, chunk)
+                cursor.execute(COPY_STAGED_BILLS_SQL)
+                cursor.execute("DELETE FROM temp.bill_staging")
+            else:
+                cursor.executemany(INSERT_BILL_SQL, chunk)
+            inserted += len(chunk)
+            if not create_products:
+                return
+            new_products = {}
+            for params in chunk:
+                key = (params[0], params[3])
+                if key not in known_products:
+                    known_products.add(key)
+                    new_products[key] = params[5]
+            # 不同的 (客户, 规格) 很少，逐条插入以便只为真正新增了规格的客户记录变更
+            for (cid, spec), price in new_products.items():
+                cursor.execute(
+                    """INSERT INTO products (customer_id, specification, unit_price)
+                       SELECT ?, ?, ? WHERE NOT EXISTS (
+                           SELECT 1 FROM products WHERE customer_id = ? AND specification = ?)""",
+                    (cid, spec, price, cid, spec)
+                )
+                if cursor.rowcount > 0:
+                    product_customers.add(cid)
+        
+        try:
+            conn = self.get_connection()
+            with conn:
+                cursor = conn.cursor()
+                customer_ids = None
+                chunk = []
+                for bill in bills:
+                    # 先用占位 id 校验，只为通过校验的行解析或创建客户
+                    resolve_customer = create_customers and bill.get("customer_id") is None
+                    if resolve_customer:
+                        bill = dict(bill, customer_id=0)
+                    
+                    params, error = self._bill_params(bill)
+                    if error:
+                        outcomes.append((False, error))
+                        continue
+                    
+                    if resolve_customer:
+                        name = params[1]
+                        if customer_ids is None:
+                            cursor.execute("SELECT name, id FROM customers")
+                            customer_ids = dict(cursor.fetchall())
+                        customer_id = customer_ids.get(name)
+                        if customer_id is None:
+                            customer_id, created = self._resolve_customer_id(cursor, name)
+                            customer_ids[name] = customer_id
+                            if created:
+                                new_customers[name] = customer_id
+                        params = (customer_id,) + params[1:]
+                    chunk.append(params)
+                    outcomes.append(BILL_ADDED)
+                    if len(chunk) >= chunk_size:
+                        flush(cursor, chunk)
+                        chunk = []
+                if chunk:
+                    flush(cursor, chunk)
+                if before_commit is not None:
+                    before_commit(cursor, outcomes)
+                # 事务持有写锁，本批账单的 id 是连续的，以 AUTOINCREMENT 序列的当前值结尾
+                last_id = None
+                if inserted:
+                    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'bills'")
+                    last_id = cursor.fetchone()[0]
+            # 先记录客户和产品的变更，监听者处理 BILLS_ADDED 时已能查到新客户和新规格
+            if new_customers:
+                self._update_customer_index(
+                    added=[(customer_id, name) for name, customer_id in new_customers.items()]
+                )
+                self._invalidate_customers()
+            for customer_id in product_customers:
+                self._invalidate_products(customer_id)
+            if last_id is not None:
+                self._record_change(BILLS_ADDED, last_id - inserted + 1, last_id)
+        except sqlite3.Error as e:
+            failure = (False, f"添加失败: {str(e)}")
+            outcomes = [failure if ok else (ok, message) for ok, message in outcomes]
+        return outcomes
     
-    def filter_bills(self, customer_name: Optional[str] = None, 
-                    start_date: Optional[str] = None, 
-                    end_date: Optional[str] = None) -> List[Dict]:
-        """筛选账单"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    @staticmethod
+    def _bill_params(bill: Dict) -> Tuple[Optional[Tuple], Optional[str]]:
+        """校验批量导入的账单并计算总价，返回 (INSERT 参数, 错误消息)"""
+        try:
+            customer_id = bill.get("customer_id")
+            customer_name = (bill.get("customer_name") or "").strip()
+            specification = (bill.get("specification") or "").strip()
+            date = bill.get("date") or ""
+            if customer_id is None or not customer_name:
+                return None, "缺少客户"
+            if not specification:
+                return None, "缺少规格"
+            if len(date) != 10 or date[4] != "-" or date[7] != "-":
+                raise ValueError(date)
+            datetime.fromisoformat(date)
+        except (AttributeError, TypeError, ValueError):
+            return None, "日期格式错误，应为 YYYY-MM-DD"
+        
+        try:
+            quantity = float(bill.get("quantity"))
+            unit_price = float(bill.get("unit_price"))
+        except (TypeError, ValueError):
+            return None, "数量或单价无效"
+        # float() 接受 "nan"、"inf"，NaN 会被 SQLite 存为 NULL 并使整个事务失败
+        if not (math.isfinite(quantity) and math.isfinite(unit_price)):
+            return None, "数量或单价无效"
+        if quantity <= 0:
+            return None, "数量必须大于0"
+        if unit_price < 0:
+            return None, "单价不能为负数"
         
-        query = """SELECT id, customer_id, customer_name, date, specification, 
-                   quantity, unit_price, total_price, source, photo_path, created_at 
-                   FROM bills WHERE 1=1"""
+        return (customer_id, customer_name, date, specification, quantity, unit_price,
+                quantity * unit_price, bill.get("source") or "manual", bill.get("photo_path"),
+                bill.get("ocr_text")), None
+    
+    @staticmethod
+    def _build_bill_filter(customer_name: Optional[str] = None,
+                           start_date: Optional[str] = None,
+                           end_date: Optional[str] = None) -> Tuple[str, List]:
+        """生成账单筛选条件（WHERE 子句和参数）"""
+        where = "WHERE 1=1"
         params = []
         
         if customer_name:
-            query += " AND customer_name = ?"
+            where += " AND customer_name = ?"
             params.append(customer_name)
         
         if start_date:
-            query += " AND date >= ?"
+            where += " AND date >= ?"
             params.append(start_date)
         
         if end_date:
-            query += " AND date <= ?"
+            where += " AND date <= ?"
             params.append(end_date)
         
-        query += " ORDER BY date DESC, created_at DESC"
+        return where, params
+    
+    def get_all_bills(self) -> List[Bill]:
+        """获取所有账单"""
+        return self.filter_bills()
+    
+    def filter_bills(self, customer_name: Optional[str] = None, 
+                    start_date: Optional[str] = None, 
+                    end_date: Optional[str] = None) -> List[Bill]:
+        """筛选账单"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        where, params = self._build_bill_filter(customer_name, start_date, end_date)
+        query = f"SELECT {BILL_COLUMNS} FROM bills {where} ORDER BY {BILL_ORDER}"
         
         cursor.execute(query, params)
-        bills = [
-            {
-                "id": row[0],
-                "customer_id": row[1],
-                "customer_name": row[2],
-                "date": row[3],
-                "specification": row[4],
-                "quantity": row[5],
-                "unit_price": row[6],
-                "total_price": row[7],
-                "source": row[8],
-                "photo_path": row[9],
-                "created_at": row[10]
-            }
-            for row in cursor.fetchall()
-        ]
-        conn.close()
-        return bills
+        return list(map(Bill._make, cursor.fetchall()))
+    
+    def iter_bills(self, customer_name: Optional[str] = None,
+                   start_date: Optional[str] = None,
+                   end_date: Optional[str] = None,
+                   chunk_size: int = 1000,
+                   order_by: str = BILL_ORDER) -> Iterator[Bill]:
+        """按筛选条件逐条产出账单（fetchmany 分块读取，不一次性加载全部结果）
+        
+        order_by 默认与账单列表一致，生成对账单时传 STATEMENT_ORDER。
+        """
+        cursor = self.get_connection().cursor()
+        
+        where, params = self._build_bill_filter(customer_name, start_date, end_date)
+        cursor.execute(f"SELECT {BILL_COLUMNS} FROM bills {where} ORDER BY {order_by}", params)
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from map(Bill._make, rows)
+        finally:
+            cursor.close()
     
+    def filter_bills_page(self, customer_name: Optional[str] = None,
+                          start_date: Optional[str] = None,
+                          end_date: Optional[str] = None,
+                          after: Optional[Tuple[str, str, int]] = None,
+                          limit: int = 50) -> Tuple[List[Bill], Optional[Tuple[str, str, int]]]:
+        """分页筛选账单（按 (date, created_at, id) 键集分页）
+        
+        after 为上一页返回的游标，首页传 None。返回 (账单列表, 下一页游标)，
+        没有更多数据时下一页游标为 None。
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        where, params = self._build_bill_filter(customer_name, start_date, end_date)
+        if after is not None:
+            where += " AND (date, created_at, id) < (?, ?, ?)"
+            params.extend(after)
+        query = f"SELECT {BILL_COLUMNS} FROM bills {where} ORDER BY {BILL_ORDER} LIMIT ?"
+        params.append(limit + 1)
+        
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        bills = list(map(Bill._make, rows[:limit]))
+        
+        next_after = None
+        if len(rows) > limit:
+            last = bills[-1]
+            next_after = (last.date, last.created_at, last.id)
+        return bills, next_after
+    
+    def search_bills(self, query: str, limit: int = 50) -> List[Bill]:
+        """按关键词搜索账单（客户名称、规格、OCR原文），最新的在前
+        
+        多个关键词以空格分隔，须全部匹配。不少于 3 个字符的关键词走 FTS5 全文索引，
+        更短的关键词（以及不支持 FTS5 时）在候选行上用 LIKE 过滤；
+        全部关键词都很短时按 id 倒序扫描，找到 limit 条即停止。
+        """
+        terms = query.split()
+        if not terms:
+            return []
+        
+        if self.search_index_enabled:
+            indexed = [term for term in terms if len(term) >= SEARCH_MIN_TERM_LENGTH]
+        else:
+            indexed = []
+        conditions = []
+        params = []
+        for term in terms:
+            if term in indexed:
+                continue
+            pattern = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            conditions.append(
+                "(b.customer_name LIKE ? ESCAPE '\\' OR b.specification LIKE ? ESCAPE '\\'"
+                " OR b.ocr_text LIKE ? ESCAPE '\\')"
+            )
+            params.extend((pattern, pattern, pattern))
+        
+        if indexed:
+            match = " ".join('"' + term.replace('"', '""') + '"' for term in indexed)
+            where = " AND ".join(["bills_fts MATCH ?"] + conditions)
+            query_sql = f"""SELECT {SEARCH_COLUMNS} FROM bills_fts
+                            JOIN bills b ON b.id = bills_fts.rowid
+                            WHERE {where} ORDER BY bills_fts.rowid DESC LIMIT ?"""
+            params.insert(0, match)
+        else:
+            query_sql = f"""SELECT {SEARCH_COLUMNS} FROM bills b
+                            WHERE {" AND ".join(conditions)} ORDER BY b.id DESC LIMIT ?"""
+        params.append(limit)
+        
+        cursor = self.get_connection().cursor()
+        cursor.execute(query_sql, params)
+        return list(map(Bill._make, cursor.fetchall()))
+    
+    def get_bills_in_id_range(self, first_id: int, last_id: int,
+                              customer_name: Optional[str] = None,
+                              start_date: Optional[str] = None,
+                              end_date: Optional[str] = None) -> List[Bill]:
+        """获取 id 在 [first_id, last_id] 内且符合筛选条件的账单（用于增量刷新列表）"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        where, params = self._build_bill_filter(customer_name, start_date, end_date)
+        where += " AND id BETWEEN ? AND ?"
+        params.extend((first_id, last_id))
+        cursor.execute(f"SELECT {BILL_COLUMNS} FROM bills {where} ORDER BY {BILL_ORDER}", params)
+        return list(map(Bill._make, cursor.fetchall()))
+    
+    def get_bill(self, bill_id: int) -> Optional[Bill]:
+        """按 id 获取单条账单，不存在时返回 None"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {BILL_COLUMNS} FROM bills WHERE id = ?", (bill_id,))
+        row = cursor.fetchone()
+        return Bill._make(row) if row else None
+    
+    @write_operation
     def delete_bill(self, bill_id: int) -> Tuple[bool, str]:
         """删除账单"""
         try:
             conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM bills WHERE id = ?", (bill_id,))
-            conn.commit()
-            conn.close()
+            with conn:
+                cursor = conn.cursor()
+                cursor.execute("DELETE FROM bills WHERE id = ?", (bill_id,))
+                deleted = cursor.rowcount > 0
+            if deleted:
+                self._record_change(BILL_DELETED, bill_id)
             return True, "账单删除成功"
         except Exception as e:
             return False, f"删除失败: {str(e)}"
     
+    def get_customer_bill_counts(self, start_date: Optional[str] = None,
+                                 end_date: Optional[str] = None) -> List[Tuple[str, int]]:
+        """日期范围内有账单的客户及其账单数，按账单数从多到少排列"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        where, params = self._build_bill_filter(None, start_date, end_date)
+        cursor.execute(
+            f"""SELECT customer_name, COUNT(*) FROM bills {where}
+                GROUP BY customer_name
+                ORDER BY COUNT(*) DESC, customer_name""",
+            params
+        )
+        return cursor.fetchall()
+    
+    def get_customer_subtotals(self, start_date: Optional[str] = None,
+                               end_date: Optional[str] = None,
+                               customer_name: Optional[str] = None) -> List[Tuple]:
+        """按客户和规格汇总账单（一次 GROUP BY）
+        
+        返回按客户名称、规格排序的 (客户名称, 规格, 笔数, 数量合计, 金额合计) 列表。
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        where, params = self._build_bill_filter(customer_name, start_date, end_date)
+        cursor.execute(
+            f"""SELECT customer_name, specification, COUNT(*), SUM(quantity), SUM(total_price)
+                FROM bills {where}
+                GROUP BY customer_name, specification
+                ORDER BY customer_name, specification""",
+            params
+        )
+        return cursor.fetchall()
+    
     def get_bill_statistics(self, customer_name: Optional[str] = None,
                            start_date: Optional[str] = None,
                            end_date: Optional[str] = None) -> Dict:
-        """获取账单统计信息"""
-        bills = self.filter_bills(customer_name, start_date, end_date)
+        """获取账单统计信息（在 SQL 中汇总，不加载账单明细）
         
-        total_amount = sum(bill['total_price'] for bill in bills)
-        total_count = len(bills)
+        返回总笔数、总金额、最早/最晚日期，以及按来源（manual/photo）的笔数和金额。
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
         
-        return {
-            "total_amount": total_amount,
-            "total_count": total_count,
-            "bills": bills
+        where, params = self._build_bill_filter(customer_name, start_date, end_date)
+        cursor.execute(
+            f"""SELECT source, COUNT(*), COALESCE(SUM(total_price), 0), MIN(date), MAX(date)
+                FROM bills {where} GROUP BY source""",
+            params
+        )
+        
+        stats = {
+            "total_amount": 0,
+            "total_count": 0,
+            "min_date": None,
+            "max_date": None,
+            "by_source": {}
         }
+        for source, count, amount, min_date, max_date in cursor.fetchall():
+            stats["total_count"] += count
+            stats["total_amount"] += amount
+            if stats["min_date"] is None or min_date < stats["min_date"]:
+                stats["min_date"] = min_date
+            if stats["max_date"] is None or max_date > stats["max_date"]:
+                stats["max_date"] = max_date
+            stats["by_source"][source] = {"count": count, "amount": amount}
+        
+        return stats
+    
+    # ==================== 待确认账单 ====================
+    
+    @write_operation
+    def add_bill_drafts(self, drafts: Iterable[Dict]) -> int:
+        """批量保存识别生成的待确认账单（单个事务），返回新增条数
+        
+        每项为包含 DRAFT_FIELDS 中同名字段的字典（id、created_at 除外），
+        同一照片已在队列中时跳过。
+        """
+        rows = [tuple(draft.get(field) for field in DRAFT_FIELDS[1:-1]) for draft in drafts]
+        if not rows:
+            return 0
+        conn = self.get_connection()
+        with conn:
+            before = conn.total_changes
+            conn.executemany(
+                f"""INSERT OR IGNORE INTO bill_drafts ({", ".join(DRAFT_FIELDS[1:-1])})
+                    VALUES ({", ".join("?" * (len(DRAFT_FIELDS) - 2))})""",
+                rows
+            )
+            return conn.total_changes - before
+    
+    def get_processed_photo_paths(self) -> set:
+        """已处理过的照片路径：在待确认队列中、已丢弃或已入账的（批量识别时跳过）"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            """SELECT photo_path FROM bill_drafts
+               UNION SELECT photo_path FROM bills WHERE photo_path IS NOT NULL"""
+        )
+        return {row[0] for row in cursor.fetchall()}
+    
+    def get_bill_drafts(self, limit: Optional[int] = None) -> List[Dict]:
+        """获取待确认账单，可信度低的在前（最需要人工核对）"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""SELECT {DRAFT_COLUMNS} FROM bill_drafts WHERE status = ?
+                ORDER BY confidence, id LIMIT ?""",
+            (DRAFT_PENDING, -1 if limit is None else limit)
+        )
+        return [dict(zip(DRAFT_FIELDS, row)) for row in cursor.fetchall()]
+    
+    def count_bill_drafts(self) -> int:
+        """待确认账单数量"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM bill_drafts WHERE status = ?", (DRAFT_PENDING,))
+        return cursor.fetchone()[0]
+    
+    @write_operation
+    def update_bill_draft(self, draft_id: int, fields: Dict) -> Tuple[bool, str]:
+        """保存对待确认账单的修改（只更新 DRAFT_EDITABLE_FIELDS 中的字段）"""
+        updates = [field for field in DRAFT_EDITABLE_FIELDS if field in fields]
+        if not updates:
+            return True, "没有需要保存的修改"
+        try:
+            conn = self.get_connection()
+            with conn:
+                conn.execute(
+                    f"UPDATE bill_drafts SET {', '.join(f + ' = ?' for f in updates)} WHERE id = ?",
+                    [fields[field] for field in updates] + [draft_id]
+                )
+            return True, "修改已保存"
+        except Exception as e:
+            return False, f"保存失败: {str(e)}"
+    
+    @write_operation
+    def discard_bill_draft(self, draft_id: int) -> Tuple[bool, str]:
+        """丢弃一条待确认账单（保留记录，重新扫描目录时不再入队）"""
+        try:
+            conn = self.get_connection()
+            with conn:
+                conn.execute("UPDATE bill_drafts SET status = ? WHERE id = ?",
+                             (DRAFT_DISCARDED, draft_id))
+            return True, "已丢弃"
+        except Exception as e:
+            return False, f"丢弃失败: {str(e)}"
+    
+    @write_operation
+    def commit_drafts(self, drafts: Optional[Iterable[Dict]] = None,
+                      create_products: bool = False) -> List[Tuple[bool, str]]:
+        """把确认的待确认账单写入 bills，并在同一事务中从队列中移除
+        
+        drafts 中每项为待确认账单字典（可带有审核时修改的字段），为 None 时确认
+        队列中的全部账单；按客户名称解析或创建客户。返回与输入一一对应的
+        (成功, 消息) 列表；校验失败的草稿保留在队列中，数据库出错时整个事务回滚，队列不变。
+        """
+        drafts = self.get_bill_drafts() if drafts is None else list(drafts)
+        
+        def remove_accepted(cursor, outcomes):
+            cursor.executemany(
+                "DELETE FROM bill_drafts WHERE id = ?",
+                [(draft["id"],) for draft, (ok, _) in zip(drafts, outcomes) if ok]
+            )
+        
+        return self.add_bills(
+            (dict(draft, customer_id=None, source='photo') for draft in drafts),
+            create_customers=True,
+            create_products=create_products,
+            before_commit=remove_accepted
+        )
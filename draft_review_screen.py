@@ -0,0 +1,368 @@
+"""
+待确认账单界面 - 批量识别照片，核对修改后确认入账
+"""
+from kivymd.uix.screen import MDScreen
+from kivymd.uix.boxlayout import MDBoxLayout
+from kivymd.uix.toolbar import MDTopAppBar
+from kivymd.uix.textfield import MDTextField
+from kivymd.uix.button import MDRaisedButton, MDFlatButton, MDIconButton
+from kivymd.uix.dialog import MDDialog
+from kivymd.uix.list import MDList, ThreeLineListItem
+from kivymd.uix.label import MDLabel
+from kivymd.uix.scrollview import MDScrollView
+from kivy.metrics import dp
+from kivy.clock import Clock
+
+from batch_ocr import ingest_photos
+from customer_picker import CustomerPicker
+from jobs import BackgroundJob, BackgroundTaskMixin
+from loading_bar import JobPanel, LoadingBar
+
+try:
+    from plyer import filechooser
+    FILECHOOSER_AVAILABLE = True
+except ImportError:
+    FILECHOOSER_AVAILABLE = False
+
+# 列表中最多显示的待确认账单数（可信度低的在前）
+DRAFT_LIST_LIMIT = 200
+
+
+def format_number(value):
+    """数量、单价的显示文字（未识别出时为空）"""
+    if value is None or value == "":
+        return ""
+    try:
+        return f"{float(value):g}"
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def draft_row_text(draft):
+    """待确认账单列表项的三行文字"""
+    if draft["error"]:
+        status = f"识别失败: {draft['error']}"
+    else:
+        status = f"可信度 {draft['confidence']:.0%}"
+    return (
+        f"{draft['customer_name'] or '未填客户'}  {draft['specification'] or '未填规格'}",
+        f"{draft['date'] or '未识别日期'}  数量 {format_number(draft['quantity']) or '?'}"
+        f"  单价 {format_number(draft['unit_price']) or '?'}",
+        status,
+    )
+
+
+class DraftReviewScreen(BackgroundTaskMixin, MDScreen):
+    """待确认账单界面"""
+    
+    def __init__(self, database, **kwargs):
+        super().__init__(**kwargs)
+        self.database = database
+        self.dialog = None
+        # 当前的批量识别任务
+        self.job = None
+        self.build_ui()
+    
+    def build_ui(self):
+        """构建待确认账单界面UI"""
+        layout = MDBoxLayout(orientation='vertical')
+        
+        # 标题栏
+        toolbar = MDTopAppBar(
+            title="待确认账单",
+            elevation=2,
+            left_action_items=[["arrow-left", lambda x: self.go_back()]],
+            right_action_items=[
+                ["folder-image", lambda x: self.choose_photo_directory()],
+                ["check-all", lambda x: self.confirm_commit_all()]
+            ],
+            md_bg_color=(0.3, 0.7, 0.4, 1)
+        )
+        layout.add_widget(toolbar)
+        
+        # 后台操作进行中时显示
+        self.loading_bar = LoadingBar()
+        layout.add_widget(self.loading_bar)
+        
+        self.summary_label = MDLabel(
+            text="",
+            size_hint_y=None,
+            height=dp(40),
+            padding=[dp(10), 0]
+        )
+        layout.add_widget(self.summary_label)
+        
+        # 批量识别进度
+        self.job_panel = JobPanel(on_cancel=self.cancel_job, progress_text="已识别")
+        layout.add_widget(self.job_panel)
+        
+        scroll = MDScrollView()
+        self.draft_list = MDList()
+        scroll.add_widget(self.draft_list)
+        layout.add_widget(scroll)
+        
+        self.add_widget(layout)
+    
+    def on_enter(self):
+        """进入界面时加载待确认账单"""
+        self.load_drafts()
+    
+    def go_back(self):
+        """返回主界面（批量识别在后台继续）"""
+        self.manager.current = 'main'
+    
+    def load_drafts(self):
+        """在后台加载待确认账单"""
+        self.run_in_background(
+            lambda: (self.database.count_bill_drafts(),
+                     self.database.get_bill_drafts(DRAFT_LIST_LIMIT)),
+            callback=self.on_drafts_loaded,
+            write=False
+        )
+    
+    def on_drafts_loaded(self, result):
+        """显示待确认账单"""
+        count, drafts = result
+        self.draft_list.clear_widgets()
+        if not drafts:
+            self.summary_label.text = "暂无待确认账单，点击右上角选择照片目录批量识别"
+            return
+        
+        self.summary_label.text = f"共 {count} 条待确认，可信度低的在前"
+        if count > len(drafts):
+            self.summary_label.text += f"（显示前 {len(drafts)} 条）"
+        for draft in drafts:
+            text, secondary_text, tertiary_text = draft_row_text(draft)
+            self.draft_list.add_widget(ThreeLineListItem(
+                text=text,
+                secondary_text=secondary_text,
+                tertiary_text=tertiary_text,
+                on_release=lambda x, d=draft: self.show_draft_dialog(d)
+            ))
+    
+    # ==================== 核对修改 ====================
+    
+    def show_draft_dialog(self, draft):
+        """核对、修改一条待确认账单"""
+        content = MDBoxLayout(
+            orientation='vertical',
+            spacing=dp(10),
+            size_hint_y=None,
+            height=dp(320),
+            padding=dp(10)
+        )
+        
+        customer_layout = MDBoxLayout(
+            orientation='horizontal',
+            spacing=dp(5),
+            size_hint_y=None,
+            height=dp(48)
+        )
+        customer_field = MDTextField(
+            hint_text="客户名称",
+            text=draft["customer_name"] or "",
+            size_hint_x=0.85
+        )
+        customer_layout.add_widget(customer_field)
+        customer_layout.add_widget(MDIconButton(
+            icon="menu-down",
+            size_hint_x=0.15,
+            on_release=lambda x: CustomerPicker(
+                self.database,
+                on_select=lambda customer_id, customer_name:
+                    setattr(customer_field, "text", customer_name)
+            ).open()
+        ))
+        content.add_widget(customer_layout)
+        
+        fields = {"customer_name": customer_field}
+        for name, hint, value in (
+            ("date", "日期（YYYY-MM-DD）", draft["date"] or ""),
+            ("specification", "规格", draft["specification"] or ""),
+            ("quantity", "数量", format_number(draft["quantity"])),
+            ("unit_price", "单价", format_number(draft["unit_price"])),
+        ):
+            fields[name] = MDTextField(hint_text=hint, text=value)
+            content.add_widget(fields[name])
+        
+        def edited():
+            return {name: field.text.strip() or None for name, field in fields.items()}
+        
+        self.dialog = MDDialog(
+            title="核对账单",
+            text=f"照片: {draft['photo_path']}",
+            type="custom",
+            content_cls=content,
+            buttons=[
+                MDFlatButton(
+                    text="丢弃",
+                    on_release=lambda x: self.discard_draft(draft["id"])
+                ),
+                MDFlatButton(
+                    text="保存",
+                    on_release=lambda x: self.save_draft(draft["id"], edited())
+                ),
+                MDRaisedButton(
+                    text="确认入账",
+                    on_release=lambda x: self.commit_draft(draft, edited())
+                ),
+            ],
+        )
+        self.dialog.open()
+    
+    def close_dialog(self):
+        """关闭编辑对话框"""
+        if self.dialog:
+            self.dialog.dismiss()
+            self.dialog = None
+    
+    def save_draft(self, draft_id, fields):
+        """保存修改，稍后再确认"""
+        self.close_dialog()
+        self.run_in_background(
+            self.database.update_bill_draft, draft_id, fields,
+            callback=self.on_draft_changed
+        )
+    
+    def discard_draft(self, draft_id):
+        """丢弃一条待确认账单"""
+        self.close_dialog()
+        self.run_in_background(
+            self.database.discard_bill_draft, draft_id,
+            callback=self.on_draft_changed
+        )
+    
+    def on_draft_changed(self, result):
+        """保存或丢弃完成：失败时提示，然后刷新列表"""
+        success, message = result
+        if not success:
+            self.show_message("错误", message)
+        self.load_drafts()
+    
+    def commit_draft(self, draft, fields):
+        """保存修改并确认入账；信息不完整时修改保留在队列中"""
+        self.close_dialog()
+        # 写操作在同一个写线程上按提交顺序执行
+        self.database.submit(self.database.update_bill_draft, draft["id"], fields)
+        self.run_in_background(
+            self.database.commit_drafts, [dict(draft, **fields)],
+            callback=self.on_drafts_committed
+        )
+    
+    def confirm_commit_all(self):
+        """确认全部待确认账单"""
+        confirm_dialog = MDDialog(
+            title="全部确认",
+            text="将所有信息完整的待确认账单一次性入账，不完整的保留待修改。确定吗？",
+            buttons=[
+                MDFlatButton(
+                    text="取消",
+                    on_release=lambda x: confirm_dialog.dismiss()
+                ),
+                MDRaisedButton(
+                    text="确认",
+                    on_release=lambda x: self.commit_all(confirm_dialog)
+                ),
+            ],
+        )
+        confirm_dialog.open()
+    
+    def commit_all(self, confirm_dialog):
+        """确认后把全部待确认账单一次性入账"""
+        confirm_dialog.dismiss()
+        self.run_in_background(self.database.commit_drafts, callback=self.on_drafts_committed)
+    
+    def on_drafts_committed(self, outcomes):
+        """入账完成"""
+        accepted = sum(1 for ok, _ in outcomes if ok)
+        rejected = [message for ok, message in outcomes if not ok]
+        if len(outcomes) == 1 and rejected:
+            self.show_message("无法入账", f"{rejected[0]}，修改已保存")
+        elif rejected:
+            self.show_message("完成", f"已入账 {accepted} 条，{len(rejected)} 条信息不完整，请修改后再确认")
+        elif accepted:
+            self.show_message("成功", f"已入账 {accepted} 条")
+        self.load_drafts()
+    
+    # ==================== 批量识别 ====================
+    
+    def choose_photo_directory(self):
+        """选择照片目录后开始批量识别"""
+        if self.job and self.job.running:
+            self.show_message("提示", "正在识别，请稍候")
+            return
+        if not FILECHOOSER_AVAILABLE:
+            self.show_message("错误", "当前环境不支持选择目录")
+            return
+        
+        try:
+            filechooser.choose_dir(
+                on_selection=lambda selection: Clock.schedule_once(
+                    lambda dt: self.on_directory_selected(selection)
+                )
+            )
+        except NotImplementedError:
+            self.show_message("错误", "当前环境不支持选择目录")
+    
+    def on_directory_selected(self, selection):
+        """开始识别所选目录中的照片"""
+        if not selection:
+            return
+        
+        self.job = BackgroundJob(
+            ingest_photos,
+            self.database,
+            selection[0],
+            database=self.database,
+            on_progress=self.job_panel.update,
+            on_done=self.on_ingest_done,
+            on_error=self.on_job_error,
+            on_cancelled=self.on_job_cancelled
+        )
+        self.job_panel.show(True, "准备识别...")
+        self.job.start()
+    
+    def cancel_job(self):
+        """取消批量识别（已识别的照片保留在队列中）"""
+        if self.job:
+            self.job.cancel()
+            self.job_panel.cancelling()
+    
+    def on_ingest_done(self, result):
+        """批量识别完成"""
+        self.job_panel.show(False)
+        text = f"识别 {result['photos']} 张照片，新增 {result['drafts']} 条待确认账单"
+        if result['skipped']:
+            text += f"，跳过已处理的 {result['skipped']} 张"
+        if result['failed']:
+            text += f"\n{result['failed']} 张识别失败，需要手动补录"
+        self.show_message("识别完成", text)
+        self.load_drafts()
+    
+    def on_job_error(self, error):
+        """批量识别失败"""
+        self.job_panel.show(False)
+        self.show_message("错误", f"识别失败: {str(error)}")
+        self.load_drafts()
+    
+    def on_job_cancelled(self):
+        """批量识别已取消"""
+        self.job_panel.show(False)
+        self.show_message("提示", "已取消，已识别的照片保留在队列中")
+        self.load_drafts()
+    
+    # ==================== 工具方法 ====================
+    
+    def show_message(self, title, text):
+        """显示消息对话框"""
+        msg_dialog = MDDialog(
+            title=title,
+            text=text,
+            buttons=[
+                MDFlatButton(
+                    text="确定",
+                    on_release=lambda x: msg_dialog.dismiss()
+                ),
+            ],
+        )
+        msg_dialog.open()
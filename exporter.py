@@ -0,0 +1,263 @@
+"""
+导出模块 - 把账单流式写出为Excel或CSV/TSV文件，生成月度对账单
+"""
+import csv
+import os
+import re
+from contextlib import contextmanager
+from itertools import islice
+
+from database import STATEMENT_ORDER
+
+from jobs import JobCancelled
+
+try:
+    from openpyxl import Workbook
+    EXCEL_AVAILABLE = True
+except ImportError:
+    EXCEL_AVAILABLE = False
+
+# 导出文件的表头，导入历史账单时也按此列顺序读取
+EXPORT_HEADERS = ["客户名称", "日期", "规格", "数量", "单价", "总价", "来源"]
+
+SOURCE_LABELS = {"manual": "手动录入", "photo": "拍照识别"}
+
+# 每写出多少行检查一次取消并报告进度
+CHECKPOINT_ROWS = 1000
+
+# CSV 文件写缓冲区大小
+CSV_BUFFER_SIZE = 1024 * 1024
+
+# 导出格式：格式名 -> (扩展名, 分隔符)
+CSV_FORMATS = {"csv": (".csv", ","), "tsv": (".tsv", "\t")}
+
+
+def bill_export_row(bill):
+    """把账单转换为导出行"""
+    return [
+        bill.customer_name,
+        bill.date,
+        bill.specification,
+        bill.quantity,
+        bill.unit_price,
+        bill.total_price,
+        SOURCE_LABELS.get(bill.source, "拍照识别")
+    ]
+
+
+@contextmanager
+def atomic_output(filepath):
+    """先写入临时文件，成功后再替换为目标文件；失败或取消时删除临时文件"""
+    temp_path = filepath + ".part"
+    try:
+        yield temp_path
+        os.replace(temp_path, filepath)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def discard_worksheet(ws):
+    """关闭未保存的只写工作表并删除 openpyxl 为它创建的临时文件"""
+    if ws.closed:
+        return
+    ws.close()
+    if ws._writer is not None:
+        ws._writer.cleanup()
+
+
+def checkpoint(count, total=None, progress=None, cancel_event=None):
+    """每 CHECKPOINT_ROWS 行检查一次取消请求并报告进度"""
+    if count % CHECKPOINT_ROWS:
+        return
+    if cancel_event is not None and cancel_event.is_set():
+        raise JobCancelled()
+    if progress is not None:
+        progress(count, total)
+
+
+def write_bills_xlsx(bills, filepath, sheet_title="账单明细", total=None,
+                     progress=None, cancel_event=None):
+    """把账单逐行写入只写模式的工作簿，返回写入条数
+    
+    bills 可以是任意可迭代对象（如 Database.iter_bills），
+    只写模式下已写出的行不会保留在内存中。
+    """
+    with atomic_output(filepath) as temp_path:
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(sheet_title)
+        ws.append(EXPORT_HEADERS)
+        
+        count = 0
+        try:
+            for bill in bills:
+                ws.append(bill_export_row(bill))
+                count += 1
+                checkpoint(count, total, progress, cancel_event)
+        except BaseException:
+            discard_worksheet(ws)
+            raise
+        
+        wb.save(temp_path)
+    return count
+
+
+def export_bills_xlsx(database, filepath, customer_name=None, start_date=None, end_date=None,
+                      progress=None, cancel_event=None):
+    """按筛选条件把账单从数据库游标流式导出到Excel，返回导出条数
+    
+    没有符合条件的账单时不生成文件。
+    """
+    total = database.get_bill_statistics(customer_name, start_date, end_date)["total_count"]
+    if total == 0:
+        return 0
+    
+    bills = database.iter_bills(customer_name=customer_name, start_date=start_date, end_date=end_date)
+    count = write_bills_xlsx(bills, filepath, total=total, progress=progress, cancel_event=cancel_event)
+    if progress is not None:
+        progress(count, total)
+    return count
+
+
+def write_bills_csv(bills, filepath, delimiter=",", total=None, progress=None, cancel_event=None):
+    """把账单按 CHECKPOINT_ROWS 行一批写入CSV/TSV文件，返回写入条数
+    
+    文件使用带 BOM 的 UTF-8 编码，Excel 可以直接打开。
+    """
+    bills = iter(bills)
+    count = 0
+    with atomic_output(filepath) as temp_path:
+        with open(temp_path, "w", newline="", encoding="utf-8-sig", buffering=CSV_BUFFER_SIZE) as f:
+            writer = csv.writer(f, delimiter=delimiter)
+            writer.writerow(EXPORT_HEADERS)
+            while True:
+                batch = [bill_export_row(bill) for bill in islice(bills, CHECKPOINT_ROWS)]
+                if not batch:
+                    break
+                writer.writerows(batch)
+                count += len(batch)
+                checkpoint(count, total, progress, cancel_event)
+    return count
+
+
+def export_bills_csv(database, filepath, customer_name=None, start_date=None, end_date=None,
+                     delimiter=",", progress=None, cancel_event=None):
+    """按筛选条件把账单从数据库游标流式导出到CSV/TSV，返回导出条数
+    
+    没有符合条件的账单时不生成文件。
+    """
+    total = database.get_bill_statistics(customer_name, start_date, end_date)["total_count"]
+    if total == 0:
+        return 0
+    
+    bills = database.iter_bills(customer_name=customer_name, start_date=start_date, end_date=end_date)
+    count = write_bills_csv(bills, filepath, delimiter=delimiter, total=total,
+                            progress=progress, cancel_event=cancel_event)
+    if progress is not None:
+        progress(count, total)
+    return count
+
+
+# 对账单汇总表的表头
+SUMMARY_HEADERS = ["客户名称", "规格", "笔数", "数量", "金额"]
+
+# Excel 工作表名称最长 31 个字符，且不能包含以下字符
+SHEET_NAME_INVALID = re.compile(r"[\\/*?:\[\]]")
+SHEET_NAME_MAX_LENGTH = 31
+
+
+def unique_sheet_name(name, used):
+    """生成合法且不重复的工作表名称"""
+    base = SHEET_NAME_INVALID.sub("_", str(name)).strip("'") or "客户"
+    base = base[:SHEET_NAME_MAX_LENGTH]
+    candidate = base
+    suffix = 2
+    while candidate.lower() in used:
+        tail = f"({suffix})"
+        candidate = base[:SHEET_NAME_MAX_LENGTH - len(tail)] + tail
+        suffix += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+def write_statement_summary(ws, subtotals):
+    """写入汇总表：每个客户按规格列出小计，最后一行为总计；返回 {客户: (笔数, 数量, 金额)}"""
+    ws.append(SUMMARY_HEADERS)
+    customer_totals = {}
+    grand_count, grand_amount = 0, 0
+    current = None
+    
+    def close_customer(name):
+        count, quantity, amount = customer_totals[name]
+        ws.append([name, "小计", count, quantity, amount])
+    
+    for customer_name, specification, count, quantity, amount in subtotals:
+        if customer_name != current:
+            if current is not None:
+                close_customer(current)
+            current = customer_name
+            customer_totals[customer_name] = (0, 0, 0)
+        ws.append([customer_name, specification, count, quantity, amount])
+        c, q, a = customer_totals[customer_name]
+        customer_totals[customer_name] = (c + count, q + quantity, a + amount)
+        grand_count += count
+        grand_amount += amount
+    if current is not None:
+        close_customer(current)
+    
+    ws.append(["合计", "", grand_count, None, grand_amount])
+    return customer_totals
+
+
+def export_monthly_statement(database, filepath, start_date=None, end_date=None,
+                             customer_name=None, progress=None, cancel_event=None):
+    """生成对账单工作簿：汇总表 + 每个客户一张明细表，返回明细行数
+    
+    汇总来自一次按客户、规格的 GROUP BY；明细从一个按客户排序的游标中流式读取，
+    遇到客户变化时切换到新的工作表，整个导出只扫描一遍账单表。
+    指定 customer_name 时只包含该客户（批量生成单客户对账单时使用）。
+    没有账单时不生成文件。
+    """
+    subtotals = database.get_customer_subtotals(start_date, end_date, customer_name)
+    if not subtotals:
+        return 0
+    total = sum(row[2] for row in subtotals)
+    
+    with atomic_output(filepath) as temp_path:
+        wb = Workbook(write_only=True)
+        used_names = set()
+        customer_totals = write_statement_summary(
+            wb.create_sheet(unique_sheet_name("汇总", used_names)), subtotals
+        )
+        
+        bills = database.iter_bills(customer_name, start_date, end_date,
+                                    order_by=STATEMENT_ORDER)
+        ws = None
+        current = None
+        count = 0
+        
+        def close_sheet():
+            sheet_count, sheet_quantity, sheet_amount = customer_totals[current]
+            ws.append(["合计", "", "", sheet_quantity, "", sheet_amount, f"{sheet_count} 笔"])
+        
+        try:
+            for bill in bills:
+                if bill.customer_name != current:
+                    if ws is not None:
+                        close_sheet()
+                    current = bill.customer_name
+                    ws = wb.create_sheet(unique_sheet_name(current, used_names))
+                    ws.append(EXPORT_HEADERS)
+                ws.append(bill_export_row(bill))
+                count += 1
+                checkpoint(count, total, progress, cancel_event)
+            if ws is not None:
+                close_sheet()
+        except BaseException:
+            for sheet in wb.worksheets:
+                discard_worksheet(sheet)
+            raise
+        
+        wb.save(temp_path)
+    return count
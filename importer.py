@@ -0,0 +1,317 @@
+"""
+导入模块 - 从CSV/TSV或Excel文件批量导入历史账单
+"""
+import csv
+import os
+from datetime import date, datetime
+from itertools import islice
+
+from exporter import EXPORT_HEADERS, SOURCE_LABELS, checkpoint
+from jobs import JobCancelled
+
+try:
+    from openpyxl import load_workbook
+    EXCEL_AVAILABLE = True
+except ImportError:
+    EXCEL_AVAILABLE = False
+
+try:
+    # openpyxl 的内部接口，用于不经过 load_workbook 逐行解析工作表（见 SheetRows）
+    from openpyxl.reader.excel import ExcelReader
+    from openpyxl.styles.stylesheet import apply_stylesheet
+    from openpyxl.utils.cell import range_boundaries
+    from openpyxl.worksheet._reader import ROW_TAG, WorkSheetParser
+    from openpyxl.xml.functions import iterparse
+    ROW_PARSER_AVAILABLE = True
+except ImportError:
+    ROW_PARSER_AVAILABLE = False
+
+# 导入时按表头名称取列，与导出文件的列顺序无关
+IMPORT_FIELDS = {
+    "客户名称": "customer_name",
+    "日期": "date",
+    "规格": "specification",
+    "数量": "quantity",
+    "单价": "unit_price",
+    "来源": "source",
+}
+
+SOURCE_CODES = {label: code for code, label in SOURCE_LABELS.items()}
+
+# 导入结果中最多保留的失败明细条数
+MAX_REJECT_DETAILS = 100
+
+# 导入 Excel 时优先读取的工作表（导出文件的账单明细）
+BILL_SHEET_TITLE = "账单明细"
+
+# 文本字段（Excel 中可能被存成数字）
+TEXT_FIELDS = ("customer_name", "specification", "source")
+
+
+def normalize_cell(field, value):
+    """把单元格的值转换为 add_bills 期望的类型"""
+    if value is None:
+        return None
+    if isinstance(value, (datetime, date)):
+        return value.strftime("%Y-%m-%d")
+    if field in TEXT_FIELDS or field == "date":
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return str(value).strip()
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def row_to_bill(header_index, row):
+    """按表头位置把一行数据转换为 add_bills 使用的账单字典"""
+    bill = {}
+    for field, index in header_index.items():
+        value = row[index] if index < len(row) else None
+        bill[field] = normalize_cell(field, value)
+    source = bill.get("source")
+    bill["source"] = SOURCE_CODES.get(source, source if source in SOURCE_LABELS else "manual")
+    return bill
+
+
+def build_header_index(header):
+    """根据表头行定位各字段所在列，缺少必需列时抛出 ValueError"""
+    positions = {str(name).strip(): i for i, name in enumerate(header) if name is not None}
+    missing = [name for name in IMPORT_FIELDS if name != "来源" and name not in positions]
+    if missing:
+        raise ValueError(f"缺少列: {', '.join(missing)}（表头应为 {', '.join(EXPORT_HEADERS)}）")
+    return {field: positions[name] for name, field in IMPORT_FIELDS.items() if name in positions}
+
+
+def summarize_outcomes(outcomes, first_row=2):
+    """把 add_bills 的结果汇总为 {imported, rejected, errors}，errors 为 (行号, 原因)"""
+    imported = 0
+    rejected = 0
+    errors = []
+    for offset, (ok, message) in enumerate(outcomes):
+        if ok:
+            imported += 1
+            continue
+        rejected += 1
+        if len(errors) < MAX_REJECT_DETAILS:
+            errors.append((first_row + offset, message))
+    return {"imported": imported, "rejected": rejected, "errors": errors}
+
+
+def sniff_delimiter(filepath, header_line):
+    """根据表头行判断分隔符（逗号或制表符），无法判断时按扩展名（.tsv 为制表符，其余为逗号）
+    
+    另存为 .csv 的制表符分隔文件（或反过来）也能正确导入。
+    """
+    try:
+        return csv.Sniffer().sniff(header_line, delimiters=",\t").delimiter
+    except csv.Error:
+        return "\t" if os.path.splitext(filepath)[1].lower() == ".tsv" else ","
+
+
+def import_bills_csv(database, filepath, delimiter=None, chunk_size=5000,
+                     progress=None, cancel_event=None):
+    """从CSV/TSV文件分块解析账单，并在单个事务中批量写入
+    
+    表头与导出文件一致（客户名称、日期、规格、数量、单价，可选总价、来源），
+    总价按数量和单价重新计算，不存在的客户自动创建。
+    delimiter 为 None 时根据表头行判断（见 sniff_delimiter）。
+    导入被取消时整个事务回滚，不会留下部分数据。
+    """
+    with open(filepath, newline="", encoding="utf-8-sig") as f:
+        if delimiter is None:
+            delimiter = sniff_delimiter(filepath, f.readline())
+            f.seek(0)
+        reader = csv.reader(f, delimiter=delimiter)
+        header = next(reader, None)
+        if header is None:
+            return {"imported": 0, "rejected": 0, "errors": []}
+        header_index = build_header_index(header)
+        
+        def parsed_rows():
+            for count, row in enumerate(reader, 1):
+                yield row_to_bill(header_index, row)
+                checkpoint(count, None, progress, cancel_event)
+        
+        outcomes = database.add_bills(parsed_rows(), chunk_size=chunk_size, create_customers=True)
+    
+    return summarize_outcomes(outcomes)
+
+
+class RejectReport:
+    """导入失败行的报告（CSV），出现第一条失败时才创建文件"""
+    
+    def __init__(self, path, header):
+        self.path = path
+        self.header = ["行号", "原因"] + [str(name) for name in header]
+        self.count = 0
+        self._file = None
+        self._writer = None
+    
+    def add(self, row_number, reason, row):
+        """记录一条失败行"""
+        if self._file is None:
+            self._file = open(self.path, "w", newline="", encoding="utf-8-sig")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(self.header)
+        self._writer.writerow([row_number, reason] + ["" if v is None else v for v in row])
+        self.count += 1
+    
+    def close(self):
+        """关闭报告文件，没有失败行时返回 None"""
+        if self._file is None:
+            return None
+        self._file.close()
+        return self.path
+
+
+if ROW_PARSER_AVAILABLE:
+    class StreamingSheetParser(WorkSheetParser):
+        """只解析单元格行，每行解析后从 sheetData 中移除
+        
+        openpyxl 的只读模式解析完一行后只清空该行的内容，空的 <row> 元素仍留在
+        sheetData 下，内存随行数增长（每行约 80 字节）；这里解析后直接移除。
+        遇到 <dimension> 时记下 max_row（文件中没有时为 None）。
+        """
+        
+        max_row = None
+        
+        def parse(self):
+            parents = []
+            for event, element in iterparse(self.source, events=("start", "end")):
+                if event == "start":
+                    parents.append(element)
+                    continue
+                parents.pop()
+                if element.tag == ROW_TAG:
+                    row = self.parse_row(element)
+                    parents[-1].remove(element)
+                    yield row
+                elif element.tag.endswith("}dimension"):
+                    try:
+                        self.max_row = range_boundaries(element.get("ref"))[3]
+                    except (TypeError, ValueError):
+                        pass
+
+
+class SheetRows:
+    """逐行读取 Excel 文件中的账单工作表，迭代得到 (行号, 单元格值元组)
+    
+    优先读取 BILL_SHEET_TITLE 工作表，没有时读取活动工作表；跳过文件中不存在的空行。
+    openpyxl 只读模式打开没有 <dimension> 的工作表（如 openpyxl 只写模式导出的文件）
+    时会先把整张表解析成一棵树来确定大小，内存与行数成正比；这里直接用 openpyxl
+    的工作表解析器逐行解析，不经过 load_workbook。openpyxl 内部接口不可用时退回只读模式。
+    max_row 为文件声明的总行数（读到之前或未声明时为 None）。
+    """
+    
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.max_row = None
+    
+    def __iter__(self):
+        if not ROW_PARSER_AVAILABLE:
+            yield from self._iter_workbook()
+            return
+        
+        reader = ExcelReader(self.filepath, read_only=True, data_only=True)
+        try:
+            reader.read_manifest()
+            reader.read_strings()
+            reader.read_workbook()
+            apply_stylesheet(reader.archive, reader.wb)
+            sheets = [(sheet.name, rel.target) for sheet, rel in reader.parser.find_sheets()
+                      if rel.target in reader.valid_files and "chartsheet" not in rel.Type]
+            if not sheets:
+                return
+            targets = dict(sheets)
+            active = min(reader.wb._active_sheet_index or 0, len(sheets) - 1)
+            target = targets.get(BILL_SHEET_TITLE, sheets[active][1])
+            
+            with reader.archive.open(target) as source:
+                parser = StreamingSheetParser(
+                    source, reader.shared_strings, data_only=True,
+                    epoch=reader.wb.epoch, date_formats=reader.wb._date_formats
+                )
+                for row_number, cells in parser.parse():
+                    self.max_row = parser.max_row
+                    if not cells:
+                        continue
+                    values = [None] * cells[-1]["column"]
+                    for cell in cells:
+                        values[cell["column"] - 1] = cell["value"]
+                    yield row_number, tuple(values)
+        finally:
+            reader.archive.close()
+    
+    def _iter_workbook(self):
+        wb = load_workbook(self.filepath, read_only=True, data_only=True)
+        try:
+            ws = wb[BILL_SHEET_TITLE] if BILL_SHEET_TITLE in wb.sheetnames else wb.active
+            self.max_row = ws.max_row
+            yield from enumerate(ws.iter_rows(values_only=True), 1)
+        finally:
+            wb.close()
+
+
+def import_bills_xlsx(database, filepath, chunk_size=5000, report_path=None,
+                      progress=None, cancel_event=None):
+    """逐行读取Excel中的历史账单（见 SheetRows），分块提交到数据库
+    
+    列布局与导出文件一致（客户名称、日期、规格、数量、单价、总价、来源），
+    不存在的客户和产品规格按块自动创建，每 chunk_size 行一个事务，
+    内存占用只与 chunk_size 有关，与文件行数无关。
+    失败的行写入 report_path（默认为源文件旁的 *_导入失败.csv）。
+    导入被取消时已提交的块会保留。
+    返回 {imported, rejected, errors, report_path}。
+    """
+    if report_path is None:
+        report_path = os.path.splitext(filepath)[0] + "_导入失败.csv"
+    
+    sheet = SheetRows(filepath)
+    rows = iter(sheet)
+    try:
+        first = next(rows, None)
+        if first is None:
+            return {"imported": 0, "rejected": 0, "errors": [], "report_path": None}
+        header_index = build_header_index(first[1])
+        
+        # 只保留计数和前 MAX_REJECT_DETAILS 条失败明细，失败行直接写入报告文件
+        report = RejectReport(report_path, first[1])
+        imported = 0
+        errors = []
+        row_number = first[0]
+        try:
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                # 跳过完全空白的行
+                numbered = [(line, row) for line, row in chunk
+                            if any(value is not None for value in row)]
+                row_number = chunk[-1][0]
+                
+                outcomes = database.add_bills(
+                    (row_to_bill(header_index, row) for _, row in numbered),
+                    chunk_size=chunk_size,
+                    create_customers=True,
+                    create_products=True
+                )
+                for (line, row), (ok, message) in zip(numbered, outcomes):
+                    if ok:
+                        imported += 1
+                        continue
+                    report.add(line, message, row)
+                    if len(errors) < MAX_REJECT_DETAILS:
+                        errors.append((line, message))
+                
+                if cancel_event is not None and cancel_event.is_set():
+                    raise JobCancelled()
+                if progress is not None:
+                    progress(row_number - 1, sheet.max_row - 1 if sheet.max_row else None)
+        finally:
+            report_path = report.close()
+    finally:
+        rows.close()
+    
+    return {"imported": imported, "rejected": report.count, "errors": errors,
+            "report_path": report_path}
@@ -0,0 +1,48 @@
+"""
+发票文字解析模块 - 从OCR识别的文字中提取账单字段
+"""
+import re
+from datetime import date
+from typing import Dict, Optional
+
+# 日期（格式：YYYY-MM-DD 或 YYYY/MM/DD）
+DATE_PATTERN = re.compile(r'(\d{4})[-/](\d{1,2})[-/](\d{1,2})')
+# 数字（可能是数量或金额）
+NUMBER_PATTERN = re.compile(r'(\d+\.?\d*)')
+
+
+def normalize_date(match) -> Optional[str]:
+    """把日期匹配转换为 YYYY-MM-DD，不是有效日期时返回 None"""
+    try:
+        return date(*(int(part) for part in match.groups())).isoformat()
+    except ValueError:
+        return None
+
+
+def parse_invoice_text(text: str) -> Dict[str, str]:
+    """解析OCR识别的文字，返回找到的字段 {"date", "quantity", "unit_price"}
+    
+    这是一个简单的解析示例，实际应用中需要根据具体的发票格式进行优化。
+    没有识别出的字段不出现在结果中。数量和单价取日期以外的前两个数字。
+    """
+    fields = {}
+    lines = text.split('\n')
+    
+    for line in lines:
+        for date_match in DATE_PATTERN.finditer(line):
+            value = normalize_date(date_match)
+            if value:
+                fields["date"] = value
+                break
+        if "date" in fields:
+            break
+    
+    numbers = []
+    for line in lines:
+        # 去掉日期，避免把年月日当成数量和单价
+        numbers.extend(NUMBER_PATTERN.findall(DATE_PATTERN.sub(' ', line)))
+    
+    if len(numbers) >= 2:
+        fields["quantity"] = numbers[0]
+        fields["unit_price"] = numbers[1]
+    return fields
@@ -0,0 +1,135 @@
+"""
+后台任务模块 - 在后台线程或子进程中运行数据库操作和导出、导入等长任务，支持进度和取消
+"""
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from kivy.clock import Clock
+    CLOCK_AVAILABLE = True
+except ImportError:
+    CLOCK_AVAILABLE = False
+
+
+class JobCancelled(Exception):
+    """任务被用户取消"""
+
+
+# 平台不支持多进程（如 Android）时创建进程可能抛出的异常
+PROCESS_ERRORS = (ImportError, NotImplementedError, OSError, ValueError)
+
+
+def spawn_context():
+    """创建子进程使用的多进程上下文
+    
+    使用 spawn 而不是 fork，避免子进程继承界面线程和已打开的数据库连接。
+    """
+    return multiprocessing.get_context("spawn")
+
+
+def create_process_pool(workers, initializer, initargs=()):
+    """创建进程池，每个子进程启动时调用 initializer(*initargs)；不支持多进程时返回 None"""
+    try:
+        return ProcessPoolExecutor(max_workers=workers, mp_context=spawn_context(),
+                                   initializer=initializer, initargs=initargs)
+    except PROCESS_ERRORS:
+        return None
+
+
+class BackgroundJob:
+    """在独立线程中运行的长任务
+    
+    target 以 target(*args, progress=..., cancel_event=..., **kwargs) 的形式调用，
+    应定期调用 progress(done, total) 报告进度，并在 cancel_event 被设置时抛出 JobCancelled。
+    on_progress(done, total)、on_done(result)、on_error(exception)、on_cancelled()
+    都在主线程中回调。传入 database 时，线程结束前会关闭该线程的数据库连接。
+    """
+    
+    def __init__(self, target, *args, on_progress=None, on_done=None, on_error=None,
+                 on_cancelled=None, database=None, progress_interval=0.2, **kwargs):
+        self.target = target
+        self.args = args
+        self.kwargs = kwargs
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_cancelled = on_cancelled
+        self.database = database
+        self.progress_interval = progress_interval
+        self.cancel_event = threading.Event()
+        self._last_progress = 0
+        self._thread = None
+    
+    @property
+    def running(self):
+        """任务是否仍在运行"""
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self):
+        """启动任务线程"""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+    
+    def cancel(self):
+        """请求取消任务（任务在下一个检查点停止）"""
+        self.cancel_event.set()
+    
+    def report_progress(self, done, total=None):
+        """报告进度（按 progress_interval 节流后转发到主线程）"""
+        now = time.monotonic()
+        if self.on_progress is None or now - self._last_progress < self.progress_interval:
+            return
+        self._last_progress = now
+        self._dispatch(self.on_progress, done, total)
+    
+    def _run(self):
+        try:
+            result = self.target(*self.args, progress=self.report_progress,
+                                 cancel_event=self.cancel_event, **self.kwargs)
+        except JobCancelled:
+            self._dispatch(self.on_cancelled)
+        except Exception as e:
+            self._dispatch(self.on_error, e)
+        else:
+            self._dispatch(self.on_done, result)
+        finally:
+            if self.database is not None:
+                self.database.close_thread_connection()
+    
+    @staticmethod
+    def _dispatch(callback, *args):
+        """在主线程中调用回调"""
+        if callback is None:
+            return
+        if CLOCK_AVAILABLE:
+            Clock.schedule_once(lambda dt: callback(*args))
+        else:
+            callback(*args)
+
+
+class BackgroundTaskMixin:
+    """界面通用的后台数据库操作：期间显示加载指示，出错时弹出提示
+    
+    使用的界面需要有 database、loading_bar 属性和 show_message(title, text) 方法。
+    """
+    
+    def run_in_background(self, fn, *args, callback=None, error_callback=None, **kwargs):
+        """在后台线程执行数据库操作（参数同 Database.submit），期间显示加载指示"""
+        self.loading_bar.begin()
+        
+        def on_done(result):
+            self.loading_bar.end()
+            if callback:
+                callback(result)
+        
+        def on_error(error):
+            self.loading_bar.end()
+            if error_callback:
+                error_callback(error)
+            else:
+                self.show_message("错误", f"操作失败: {str(error)}")
+        
+        self.database.submit(fn, *args, callback=on_done, error_callback=on_error, **kwargs)
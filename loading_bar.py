@@ -0,0 +1,70 @@
+"""
+加载指示器 - 后台数据库操作进行中时显示的细进度条，以及长任务的进度面板
+"""
+from kivymd.uix.boxlayout import MDBoxLayout
+from kivymd.uix.button import MDFlatButton
+from kivymd.uix.label import MDLabel
+from kivymd.uix.progressbar import MDProgressBar
+from kivy.metrics import dp
+
+
+class LoadingBar(MDProgressBar):
+    """不定进度条：begin/end 成对调用，所有操作结束后自动隐藏"""
+    
+    def __init__(self, **kwargs):
+        kwargs.setdefault("type", "indeterminate")
+        kwargs.setdefault("size_hint_y", None)
+        kwargs.setdefault("height", dp(4))
+        super().__init__(**kwargs)
+        self.pending = 0
+        self.opacity = 0
+    
+    def begin(self):
+        """开始一个后台操作"""
+        self.pending += 1
+        if self.pending == 1:
+            self.opacity = 1
+            self.start()
+    
+    def end(self):
+        """结束一个后台操作"""
+        self.pending = max(0, self.pending - 1)
+        if self.pending == 0:
+            self.stop()
+            self.opacity = 0
+
+
+class JobPanel(MDBoxLayout):
+    """后台任务（导出、导入、批量识别）的进度条、进度文字和取消按钮，空闲时隐藏"""
+    
+    def __init__(self, on_cancel, progress_text="已处理", **kwargs):
+        kwargs.setdefault("orientation", "horizontal")
+        kwargs.setdefault("spacing", dp(10))
+        kwargs.setdefault("padding", [dp(10), 0])
+        kwargs.setdefault("size_hint_y", None)
+        super().__init__(**kwargs)
+        # 进度文字的前缀，如“已识别 3 / 10”
+        self.progress_text = progress_text
+        self.progress_bar = MDProgressBar(type="determinate", max=100, value=0)
+        self.label = MDLabel(text="", size_hint_x=None, width=dp(120))
+        self.add_widget(self.progress_bar)
+        self.add_widget(self.label)
+        self.add_widget(MDFlatButton(text="取消", on_release=lambda x: on_cancel()))
+        self.show(False)
+    
+    def show(self, visible, text=""):
+        """显示或隐藏进度"""
+        self.height = dp(48) if visible else 0
+        self.opacity = 1 if visible else 0
+        self.progress_bar.value = 0
+        self.label.text = text
+    
+    def update(self, done, total):
+        """更新进度（BackgroundJob 的 on_progress 回调）"""
+        if total:
+            self.progress_bar.value = done * 100 / total
+        self.label.text = f"{self.progress_text} {done} / {total or '?'}"
+    
+    def cancelling(self):
+        """已请求取消，等待任务停下"""
+        self.label.text = "正在取消..."
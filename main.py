@@ -13,9 +13,12 @@ from kivy.metrics import dp
 import os
 
 from database import Database
+from ocr_cache import OCRCache
+from ocr_service import OCRService
 from settings_screen import SettingsScreen
 from manual_entry_screen import ManualEntryScreen
 from photo_entry_screen import PhotoEntryScreen
+from draft_review_screen import DraftReviewScreen
 from billing_screen import BillingScreen
 
 # 注册中文字体 - 只注册文本字体，不影响图标
@@ -82,6 +85,16 @@ class MainScreen(MDScreen):
         )
         button_layout.add_widget(btn_photo)
         
+        # 批量识别/待确认账单按钮
+        btn_drafts = MDRaisedButton(
+            text="批量识别",
+            size_hint=(1, None),
+            height=dp(60),
+            md_bg_color=(0.3, 0.7, 0.4, 1),
+            on_release=self.go_to_draft_review
+        )
+        button_layout.add_widget(btn_drafts)
+        
         # 账单管理按钮
         btn_billing = MDRaisedButton(
             text="账单管理",
@@ -117,6 +130,10 @@ class MainScreen(MDScreen):
         """跳转到拍照记账界面"""
         self.manager.current = 'photo_entry'
     
+    def go_to_draft_review(self, instance):
+        """跳转到待确认账单界面"""
+        self.manager.current = 'draft_review'
+    
     def go_to_billing(self, instance):
         """跳转到账单管理界面"""
         self.manager.current = 'billing'
@@ -132,6 +149,7 @@ class AccountingApp(MDApp):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.database = Database()
+        self.ocr_service = OCRService(cache=OCRCache())
         self.theme_cls.primary_palette = "Blue"
         self.theme_cls.theme_style = "Light"
         # 设置字体
@@ -163,10 +181,17 @@ class AccountingApp(MDApp):
         sm.add_widget(MainScreen())
         sm.add_widget(SettingsScreen(database=self.database, name='settings'))
         sm.add_widget(ManualEntryScreen(database=self.database, name='manual_entry'))
-        sm.add_widget(PhotoEntryScreen(database=self.database, name='photo_entry'))
+        sm.add_widget(PhotoEntryScreen(database=self.database, ocr_service=self.ocr_service,
+                                       name='photo_entry'))
+        sm.add_widget(DraftReviewScreen(database=self.database, name='draft_review'))
         sm.add_widget(BillingScreen(database=self.database, name='billing'))
         
         return sm
+    
+    def on_stop(self):
+        """退出时结束OCR识别进程并关闭数据库连接"""
+        self.ocr_service.close()
+        self.database.close()
 
 
 if __name__ == '__main__':
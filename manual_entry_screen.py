@@ -14,8 +14,12 @@ from kivymd.uix.menu import MDDropdownMenu
 from kivy.metrics import dp
 from datetime import datetime
 
+from customer_picker import CustomerPicker
+from jobs import BackgroundTaskMixin
+from loading_bar import LoadingBar
 
-class ManualEntryScreen(MDScreen):
+
+class ManualEntryScreen(BackgroundTaskMixin, MDScreen):
     """手动记账界面"""
     
     def __init__(self, database, **kwargs):
@@ -24,7 +28,6 @@ class ManualEntryScreen(MDScreen):
         self.selected_customer_id = None
         self.selected_customer_name = None
         self.dialog = None
-        self.customer_menu = None
         self.spec_menu = None
         self.build_ui()
     
@@ -41,6 +44,10 @@ class ManualEntryScreen(MDScreen):
         )
         layout.add_widget(toolbar)
         
+        # 后台查询进行中时显示
+        self.loading_bar = LoadingBar()
+        layout.add_widget(self.loading_bar)
+        
         # 表单内容
         form_layout = MDBoxLayout(
             orientation='vertical',
@@ -164,31 +171,8 @@ class ManualEntryScreen(MDScreen):
         self.total_price_field.text = ""
     
     def show_customer_dropdown(self, instance):
-        """显示客户下拉菜单"""
-        customers = self.database.get_all_customers()
-        
-        if not customers:
-            self.show_message("提示", "暂无客户，请先在'客户信息'中添加客户")
-            self.show_message("提示", "请先在设置中添加客户")
-            return
-        
-        # 创建菜单项
-        menu_items = []
-        for customer in customers:
-            menu_items.append({
-                "text": customer['name'],
-                "viewclass": "OneLineListItem",
-                "on_release": lambda cid=customer['id'], cname=customer['name']: 
-                    self.select_customer(cid, cname)
-            })
-        
-        # 创建下拉菜单
-        self.customer_menu = MDDropdownMenu(
-            caller=instance,
-            items=menu_items,
-            width_mult=4,
-        )
-        self.customer_menu.open()
+        """打开可搜索的客户选择器"""
+        CustomerPicker(self.database, on_select=self.select_customer).open()
     
     def select_customer(self, customer_id, customer_name):
         """选择客户"""
@@ -200,10 +184,6 @@ class ManualEntryScreen(MDScreen):
         self.specification_field.text = "点击选择规格"
         self.unit_price_field.text = ""
         self.total_price_field.text = ""
-        
-        # 关闭下拉菜单
-        if self.customer_menu:
-            self.customer_menu.dismiss()
     
     def show_date_picker(self, instance, value):
         """显示日期选择器"""
@@ -224,8 +204,13 @@ class ManualEntryScreen(MDScreen):
             self.show_message("提示", "请先选择客户")
             return
         
-        products = self.database.get_products_by_customer(self.selected_customer_id)
-        
+        self.run_in_background(
+            self.database.get_products_by_customer, self.selected_customer_id,
+            callback=lambda products: self.open_specification_dropdown(instance, products)
+        )
+    
+    def open_specification_dropdown(self, instance, products):
+        """规格列表加载完成后打开下拉菜单"""
         if not products:
             self.show_message("提示", f"请先在'客户信息'中为【{self.selected_customer_name}】添加产品规格")
             return
@@ -300,16 +285,21 @@ class ManualEntryScreen(MDScreen):
             return
         
         # 保存到数据库
-        success, message = self.database.add_bill(
+        self.run_in_background(
+            self.database.add_bill,
             customer_id=self.selected_customer_id,
             customer_name=self.selected_customer_name,
             date=self.date_field.text,
             specification=self.specification_field.text,
             quantity=quantity,
             unit_price=unit_price,
-            source='manual'
+            source='manual',
+            callback=self.on_bill_saved
         )
-        
+    
+    def on_bill_saved(self, result):
+        """保存账单完成"""
+        success, message = result
         if success:
             self.show_message("成功", "账单保存成功", callback=self.reset_form)
         else:
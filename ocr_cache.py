@@ -0,0 +1,137 @@
+"""
+OCR缓存模块 - 按图片内容和识别参数缓存识别结果，按容量淘汰最久未用的条目
+"""
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+# 读取图片计算哈希时每次读取的字节数
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# 本进程每写入 max_bytes 的这一比例，就重新统计一次目录的实际大小
+RESCAN_RATIO = 0.1
+
+
+class OCRCache:
+    """磁盘上的OCR结果缓存
+    
+    键为 sha256(图片文件内容 + 识别参数JSON)，同一张照片换了文件名或重新导入
+    也能命中，识别参数（引擎、语言、预处理参数）变化时自动失效。
+    每个结果存为 directory 下的一个 JSON 文件，文件修改时间即最近使用时间；
+    总大小超过 max_bytes 时删除最久未用的文件，直到降到 max_bytes 的 90%。
+    多个进程共用同一目录时（如批量识别的子进程），每个实例只知道自己写入了多少，
+    因此每写入 max_bytes × RESCAN_RATIO 就重新统计目录大小，超出的部分不超过
+    进程数 × max_bytes × RESCAN_RATIO；写入结束后可调用 trim 按实际大小淘汰。
+    """
+    
+    def __init__(self, directory: str = "ocr_cache", max_bytes: int = 20 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # 缓存目录当前总大小，首次写入时扫描目录得到
+        self._size = None
+        # 上次统计目录大小之后本实例写入的字节数
+        self._unscanned_bytes = 0
+    
+    def key(self, image_path: str, config: Dict) -> str:
+        """计算缓存键"""
+        digest = hashlib.sha256()
+        with open(image_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        digest.update(json.dumps(config, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+        return digest.hexdigest()
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """读取缓存的结果，没有时返回 None；命中时刷新该条目的使用时间"""
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                result = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        result["boxes"] = [tuple(box) for box in result.get("boxes", [])]
+        return result
+    
+    def put(self, key: str, result: Dict):
+        """写入识别结果（只保存 text、boxes、confidence），必要时淘汰旧条目"""
+        data = json.dumps({
+            "text": result["text"],
+            "boxes": result.get("boxes", []),
+            "confidence": result.get("confidence", 0.0),
+        }, ensure_ascii=False).encode('utf-8')
+        path = self._path(key)
+        with self._lock:
+            if self._size is None or self._unscanned_bytes >= self.max_bytes * RESCAN_RATIO:
+                self._size = self._scan_size()
+                self._unscanned_bytes = 0
+            try:
+                old_size = os.path.getsize(path)
+            except OSError:
+                old_size = 0
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                # 先写临时文件再替换，避免读到写了一半的结果
+                temp_path = f"{path}.{os.getpid()}.tmp"
+                with open(temp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(temp_path, path)
+            except OSError:
+                return
+            self._size += len(data) - old_size
+            self._unscanned_bytes += len(data)
+            if self._size > self.max_bytes:
+                self._evict(self.max_bytes * 9 // 10)
+    
+    def trim(self):
+        """按目录的实际大小淘汰：超过 max_bytes 时删除最久未用的条目，降到 90%"""
+        with self._lock:
+            self._size = self._scan_size()
+            self._unscanned_bytes = 0
+            if self._size > self.max_bytes:
+                self._evict(self.max_bytes * 9 // 10)
+    
+    def clear(self):
+        """删除所有缓存条目"""
+        with self._lock:
+            self._evict(0)
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".json")
+    
+    def _entries(self):
+        """缓存目录中的 [(修改时间, 大小, 路径)]"""
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(".json"):
+                        try:
+                            stat = entry.stat()
+                        except OSError:
+                            continue
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            pass
+        return entries
+    
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+    
+    def _evict(self, target_bytes: int):
+        """按最近使用时间从旧到新删除，直到总大小不超过 target_bytes"""
+        entries = sorted(self._entries())
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, path in entries:
+            if size <= target_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= entry_size
+        self._size = size
+        self._unscanned_bytes = 0
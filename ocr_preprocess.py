@@ -0,0 +1,156 @@
+"""
+OCR预处理模块 - 识别前校正方向、缩小、灰度化、二值化和纠偏（Pillow实现）
+"""
+import math
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+try:
+    from PIL import Image, ImageChops, ImageFilter, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+MM_PER_INCH = 25.4
+# 纠偏角度的投影得分至少要比不旋转高出的比例，否则视为没有倾斜
+SKEW_MIN_GAIN = 0.01
+
+
+class PreprocessOptions(NamedTuple):
+    """预处理参数，某项设为 False / None 即跳过对应步骤"""
+    # 按照片 EXIF 中的方向信息旋转
+    exif_transpose: bool = True
+    # 把图片缩小到相当于纸张宽度 page_width_mm 在 target_dpi 下的像素数（只缩小不放大）
+    target_dpi: Optional[int] = 300
+    page_width_mm: float = 210
+    grayscale: bool = True
+    # 自适应二值化：比周围 threshold_radius 像素范围的平均亮度暗 threshold_offset 以上的记为黑色
+    binarize: bool = True
+    threshold_radius: int = 15
+    threshold_offset: int = 10
+    # 纠偏：在 ±max_skew 度内按行投影方差找最佳角度
+    deskew: bool = True
+    max_skew: float = 5.0
+    skew_step: float = 0.5
+    # 纠偏时在缩小到此宽度的图上估计角度
+    deskew_width: int = 800
+
+
+DEFAULT_OPTIONS = PreprocessOptions()
+
+
+def target_width(options: PreprocessOptions) -> int:
+    """目标 DPI 下纸张宽度对应的像素数"""
+    return round(options.page_width_mm / MM_PER_INCH * options.target_dpi)
+
+
+def downscale(image, options: PreprocessOptions):
+    """把较长的照片缩小到目标宽度（按图片短边计算，兼容横拍）"""
+    width = target_width(options)
+    short_side = min(image.size)
+    if short_side <= width:
+        return image
+    scale = width / short_side
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    # Pillow 缩小时按缩放比例扩大双线性滤波的采样范围，效果接近 LANCZOS 但快 3 倍左右
+    return image.resize(size, Image.Resampling.BILINEAR)
+
+
+def adaptive_threshold(gray, radius: int, offset: int):
+    """局部均值自适应二值化，输出黑字白底的 L 模式图片
+    
+    均值用 BoxBlur 计算，比较用 ImageChops，全程在 C 代码中完成。
+    """
+    local_mean = gray.filter(ImageFilter.BoxBlur(radius))
+    # 比局部均值暗的程度（亮于均值的像素为 0）
+    darkness = ImageChops.subtract(local_mean, gray)
+    return darkness.point(lambda value: 0 if value > offset else 255)
+
+
+def projection_score(binary, angle: float) -> float:
+    """旋转 angle 度后各行黑色像素占比的方差：文字行水平时方差最大"""
+    rotated = binary.rotate(angle, resample=Image.Resampling.NEAREST, fillcolor=255)
+    # 缩成一列，每个像素是该行的平均亮度
+    rows = rotated.resize((1, rotated.height), Image.Resampling.BOX).tobytes()
+    mean = sum(rows) / len(rows)
+    return sum((value - mean) ** 2 for value in rows) / len(rows)
+
+
+def estimate_skew(binary, options: PreprocessOptions) -> float:
+    """估计文字倾斜角度（度），先粗扫再在最佳角度附近细扫，结果不超出 ±max_skew
+    
+    得分相同时取绝对值较小的角度；没有角度比不旋转的得分高出 SKEW_MIN_GAIN
+    （空白或文字很少的图片）时返回 0，不做旋转。
+    """
+    if binary.width > options.deskew_width:
+        height = max(1, round(binary.height * options.deskew_width / binary.width))
+        sample = binary.resize((options.deskew_width, height), Image.Resampling.BOX)
+    else:
+        sample = binary
+    
+    def best_angle(center, span, step):
+        count = int(round(span / step))
+        angles = [center + step * i for i in range(-count, count + 1)]
+        angles = [angle for angle in angles if abs(angle) <= options.max_skew + 1e-9]
+        scored = [(projection_score(sample, angle), -abs(angle), angle) for angle in angles]
+        score, _, angle = max(scored)
+        return angle, score
+    
+    unrotated = projection_score(sample, 0.0)
+    coarse, _ = best_angle(0.0, options.max_skew, options.skew_step)
+    angle, score = best_angle(coarse, options.skew_step, options.skew_step / 5)
+    if score <= unrotated * (1 + SKEW_MIN_GAIN):
+        return 0.0
+    return angle
+
+
+def preprocess_image(image, options: PreprocessOptions = DEFAULT_OPTIONS
+                     ) -> Tuple["Image.Image", Dict[str, float]]:
+    """按 options 依次执行预处理步骤，返回 (处理后的图片, {步骤: 耗时秒数})"""
+    timings = {}
+    
+    def timed(stage, fn, *args):
+        started = time.perf_counter()
+        result = fn(*args)
+        timings[stage] = time.perf_counter() - started
+        return result
+    
+    # 先缩小再按 EXIF 旋转，旋转的像素更少（缩小按短边计算，与方向无关）
+    if options.target_dpi:
+        image = timed("downscale", downscale, image, options)
+    if options.exif_transpose:
+        image = timed("exif_transpose", ImageOps.exif_transpose, image)
+    if options.grayscale or options.binarize or options.deskew:
+        image = timed("grayscale", ImageOps.grayscale, image)
+    if options.binarize:
+        image = timed("binarize", adaptive_threshold, image,
+                      options.threshold_radius, options.threshold_offset)
+    if options.deskew:
+        angle = timed("estimate_skew", estimate_skew, image, options)
+        if angle:
+            image = timed("deskew", lambda: image.rotate(
+                angle, resample=Image.Resampling.BILINEAR, expand=True, fillcolor=255))
+    return image, timings
+
+
+def load_and_preprocess(path: str, options: Optional[PreprocessOptions] = DEFAULT_OPTIONS
+                        ) -> Tuple["Image.Image", Dict[str, float]]:
+    """读取照片并预处理；options 为 None 时只读取不处理（用于对比）
+    
+    需要缩小时对 JPEG 使用 draft 模式：由解码器直接按 1/2、1/4、1/8 缩小解码
+    （需要灰度时同时直接解码为灰度），不先解出完整的 12MP 彩色图片。
+    """
+    started = time.perf_counter()
+    image = Image.open(path)
+    if options is not None and options.target_dpi:
+        scale = target_width(options) / min(image.size)
+        if scale < 1:
+            mode = "L" if (options.grayscale or options.binarize or options.deskew) else image.mode
+            image.draft(mode, (math.ceil(image.width * scale), math.ceil(image.height * scale)))
+    image.load()
+    timings = {"load": time.perf_counter() - started}
+    if options is None:
+        return image, timings
+    image, stage_timings = preprocess_image(image, options)
+    timings.update(stage_timings)
+    return image, timings
@@ -0,0 +1,381 @@
+"""
+OCR服务模块 - 常驻的识别进程和可替换的识别引擎
+"""
+import functools
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict
+
+from jobs import PROCESS_ERRORS, JobCancelled, spawn_context
+from ocr_preprocess import DEFAULT_OPTIONS, load_and_preprocess
+
+try:
+    import pytesseract
+    TESSERACT_AVAILABLE = True
+except ImportError:
+    TESSERACT_AVAILABLE = False
+
+try:
+    import tesserocr
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
+DEFAULT_LANG = 'chi_sim+eng'
+
+# recognize 的进度阶段：progress(阶段, STAGE_COUNT)
+STAGE_PREPROCESS = 0
+STAGE_RECOGNIZE = 1
+STAGE_COUNT = 2
+
+# 等待识别进程回复时检查取消的间隔（秒）
+POLL_INTERVAL = 0.05
+
+
+class OCREngine(ABC):
+    """识别引擎接口
+    
+    recognize(image) 接收预处理后的 PIL 图片，返回
+    {"text": 全文, "boxes": [(文字, 左, 上, 宽, 高, 置信度), ...], "confidence": 平均置信度(0-100)}。
+    引擎在识别进程中创建一次并反复使用。
+    """
+    
+    @abstractmethod
+    def recognize(self, image) -> Dict:
+        """识别一张图片"""
+    
+    def close(self):
+        """释放引擎占用的资源"""
+
+
+class TesseractEngine(OCREngine):
+    """pytesseract 引擎：每次识别仍会启动 tesseract 程序"""
+    
+    def __init__(self, lang=DEFAULT_LANG):
+        if not TESSERACT_AVAILABLE:
+            raise RuntimeError("未安装 pytesseract")
+        self.lang = lang
+    
+    def recognize(self, image) -> Dict:
+        data = pytesseract.image_to_data(image, lang=self.lang,
+                                         output_type=pytesseract.Output.DICT)
+        lines = {}
+        boxes = []
+        for i, word in enumerate(data['text']):
+            confidence = float(data['conf'][i])
+            # conf 为 -1 的是版面元素（块、段落、行），不是文字
+            if confidence < 0 or not word.strip():
+                continue
+            line_key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+            lines.setdefault(line_key, []).append(word)
+            boxes.append((word, data['left'][i], data['top'][i],
+                          data['width'][i], data['height'][i], confidence))
+        return {
+            "text": "\n".join(" ".join(words) for words in lines.values()),
+            "boxes": boxes,
+            "confidence": _mean_confidence(boxes),
+        }
+
+
+class TesserocrEngine(OCREngine):
+    """tesserocr 引擎：直接调用 libtesseract，语言数据只在创建时加载一次"""
+    
+    def __init__(self, lang=DEFAULT_LANG):
+        if not TESSEROCR_AVAILABLE:
+            raise RuntimeError("未安装 tesserocr")
+        self.api = tesserocr.PyTessBaseAPI(lang=lang)
+    
+    def recognize(self, image) -> Dict:
+        self.api.SetImage(image)
+        self.api.Recognize()
+        boxes = []
+        level = tesserocr.RIL.WORD
+        iterator = self.api.GetIterator()
+        for word in tesserocr.iterate_level(iterator, level):
+            text = word.GetUTF8Text(level)
+            box = word.BoundingBox(level)
+            if not text or not text.strip() or box is None:
+                continue
+            left, top, right, bottom = box
+            boxes.append((text, left, top, right - left, bottom - top, word.Confidence(level)))
+        return {
+            "text": self.api.GetUTF8Text(),
+            "boxes": boxes,
+            "confidence": _mean_confidence(boxes),
+        }
+    
+    def close(self):
+        self.api.End()
+
+
+class FakeOCREngine(OCREngine):
+    """返回固定结果的引擎，用于测试；delay 秒数模拟识别耗时"""
+    
+    def __init__(self, text="", confidence=100.0, delay=0.0, lang=DEFAULT_LANG):
+        self.text = text
+        self.lang = lang
+        self.confidence = confidence
+        self.delay = delay
+    
+    def recognize(self, image) -> Dict:
+        if self.delay:
+            time.sleep(self.delay)
+        return {"text": self.text, "boxes": [], "confidence": self.confidence}
+
+
+def _mean_confidence(boxes) -> float:
+    """各个词置信度的平均值"""
+    return sum(box[5] for box in boxes) / len(boxes) if boxes else 0.0
+
+
+def create_engine(lang=DEFAULT_LANG) -> OCREngine:
+    """创建可用的最快引擎：优先 tesserocr，否则 pytesseract"""
+    if TESSEROCR_AVAILABLE:
+        return TesserocrEngine(lang)
+    return TesseractEngine(lang)
+
+
+def default_engine_name() -> str:
+    """create_engine 使用的引擎名称
+    
+    没有安装 tesserocr 时为 "tesseract"：每张图片都要启动一次 tesseract 进程
+    并重新加载语言数据，比 "tesserocr" 慢得多。
+    """
+    return "tesserocr" if TESSEROCR_AVAILABLE else "tesseract"
+
+
+def describe_engine(engine_factory) -> str:
+    """引擎及其参数的稳定描述，作为缓存键的一部分"""
+    if isinstance(engine_factory, functools.partial):
+        return (describe_engine(engine_factory.func) + repr(engine_factory.args)
+                + repr(sorted(engine_factory.keywords.items())))
+    if engine_factory is create_engine:
+        return default_engine_name()
+    return f"{engine_factory.__module__}.{engine_factory.__qualname__}"
+
+
+def recognize_file(engine, path, options=DEFAULT_OPTIONS, progress=None, cancel_event=None):
+    """读取、预处理并识别一张照片，结果中增加 "timings"（各步骤耗时，秒）"""
+    if progress:
+        progress(STAGE_PREPROCESS, STAGE_COUNT)
+    image, timings = load_and_preprocess(path, options)
+    if cancel_event is not None and cancel_event.is_set():
+        raise JobCancelled()
+    
+    if progress:
+        progress(STAGE_RECOGNIZE, STAGE_COUNT)
+    started = time.perf_counter()
+    result = engine.recognize(image)
+    timings["ocr"] = time.perf_counter() - started
+    if cancel_event is not None and cancel_event.is_set():
+        raise JobCancelled()
+    result["timings"] = timings
+    return result
+
+
+def worker_main(conn, engine_factory, lang=DEFAULT_LANG):
+    """识别进程主循环
+    
+    启动时创建一次引擎并回复 ("ready", None)；之后每收到 (路径, 预处理参数)
+    依次回复 ("progress", 阶段) 和 ("done", 结果) 或 ("error", 异常)，收到 None 时退出。
+    """
+    try:
+        engine = engine_factory(lang=lang)
+    except Exception as e:
+        conn.send(("failed", _picklable_error(e)))
+        return
+    conn.send(("ready", None))
+    
+    def progress(stage, total):
+        conn.send(("progress", stage))
+    
+    try:
+        while True:
+            try:
+                request = conn.recv()
+            except EOFError:
+                break
+            if request is None:
+                break
+            path, options = request
+            try:
+                result = recognize_file(engine, path, options, progress)
+            except Exception as e:
+                conn.send(("error", _picklable_error(e)))
+            else:
+                conn.send(("done", result))
+    finally:
+        engine.close()
+        conn.close()
+
+
+def _picklable_error(error):
+    """异常可能无法跨进程传递，统一转成 RuntimeError"""
+    return RuntimeError(f"{type(error).__name__}: {error}")
+
+
+class OCRService:
+    """常驻的OCR识别服务
+    
+    在独立进程中保持一个已创建的引擎（tesserocr 时语言数据只加载一次），
+    通过管道逐个提交识别请求；平台不支持多进程（如 Android）或识别进程
+    无法启动时，改为在调用线程中用同一个引擎识别。
+    recognize 会阻塞到识别完成，应在 BackgroundJob 的工作线程中调用；
+    取消时直接结束识别进程，下次识别时重新启动。
+    引擎由 engine_factory(lang=lang) 创建，engine_factory 必须可以被 pickle
+    （模块级函数、类或 functools.partial）。
+    传入 cache（OCRCache）时，同一张图片在相同引擎和预处理参数下只识别一次。
+    """
+    
+    def __init__(self, engine_factory=create_engine, use_process=True, cache=None,
+                 lang=DEFAULT_LANG):
+        self.engine_factory = engine_factory
+        self.lang = lang
+        self.use_process = use_process
+        self.cache = cache
+        self._lock = threading.Lock()
+        self._process = None
+        self._conn = None
+        self._ready = False
+        # 线程模式下使用的引擎
+        self._engine = None
+    
+    def start(self):
+        """提前启动识别进程（不等待就绪），可在进入拍照界面时调用
+        
+        正在识别时直接返回，不阻塞界面线程。
+        """
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if self.use_process and self._process is None:
+                self._start_worker()
+        finally:
+            self._lock.release()
+    
+    def recognize(self, path, options=DEFAULT_OPTIONS, progress=None, cancel_event=None):
+        """识别一张照片，返回 {"text", "boxes", "confidence", "timings", "cached"}
+        
+        progress(阶段, STAGE_COUNT) 报告当前阶段，cancel_event 被设置时抛出 JobCancelled。
+        缓存命中时不等待识别进程，timings 只有 "cache"（计算哈希和读取的耗时）。
+        """
+        if self.cache is None:
+            result = self._recognize(path, options, progress, cancel_event)
+            result["cached"] = False
+            return result
+        
+        started = time.perf_counter()
+        key = self.cache.key(path, self.cache_config(options))
+        result = self.cache.get(key)
+        if result is not None:
+            result["timings"] = {"cache": time.perf_counter() - started}
+            result["cached"] = True
+            return result
+        
+        result = self._recognize(path, options, progress, cancel_event)
+        self.cache.put(key, result)
+        result["cached"] = False
+        return result
+    
+    def cache_config(self, options):
+        """影响识别结果的参数，作为缓存键的一部分"""
+        return {
+            "engine": describe_engine(self.engine_factory),
+            "lang": self.lang,
+            "options": options._asdict() if options is not None else None,
+        }
+    
+    def _recognize(self, path, options, progress, cancel_event):
+        with self._lock:
+            if self.use_process and self._process is None:
+                self._start_worker()
+            if self.use_process and not self._ready:
+                self._wait_ready(cancel_event)
+            if not self.use_process:
+                if self._engine is None:
+                    self._engine = self.engine_factory(lang=self.lang)
+                return recognize_file(self._engine, path, options, progress, cancel_event)
+            
+            self._conn.send((path, options))
+            while True:
+                kind, payload = self._receive(cancel_event)
+                if kind == "progress":
+                    if progress:
+                        progress(payload, STAGE_COUNT)
+                elif kind == "done":
+                    return payload
+                else:
+                    raise payload
+    
+    def close(self):
+        """结束识别进程并释放引擎"""
+        with self._lock:
+            self._stop_worker(terminate=False)
+            if self._engine is not None:
+                self._engine.close()
+                self._engine = None
+    
+    def _start_worker(self):
+        try:
+            context = spawn_context()
+            self._conn, child_conn = context.Pipe()
+            self._process = context.Process(target=worker_main,
+                                            args=(child_conn, self.engine_factory, self.lang),
+                                            daemon=True)
+            self._process.start()
+        except PROCESS_ERRORS:
+            self._process = None
+            self._conn = None
+            self.use_process = False
+            return
+        child_conn.close()
+        self._ready = False
+    
+    def _wait_ready(self, cancel_event):
+        """等待识别进程创建好引擎；进程起不来时改为线程模式"""
+        try:
+            kind, payload = self._receive(cancel_event)
+        except RuntimeError:
+            self.use_process = False
+            return
+        if kind == "failed":
+            self._stop_worker(terminate=True)
+            raise payload
+        self._ready = True
+    
+    def _receive(self, cancel_event):
+        """等待识别进程的下一条消息，期间检查取消"""
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                self._stop_worker(terminate=True)
+                raise JobCancelled()
+            try:
+                if self._conn.poll(POLL_INTERVAL):
+                    return self._conn.recv()
+            except (EOFError, OSError):
+                pass
+            else:
+                if self._process.is_alive():
+                    continue
+            self._stop_worker(terminate=True)
+            raise RuntimeError("OCR识别进程意外退出")
+    
+    def _stop_worker(self, terminate):
+        if self._process is None:
+            return
+        try:
+            if terminate:
+                self._process.terminate()
+            else:
+                self._conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self._process.join(timeout=2)
+        if self._process.is_alive():
+            self._process.kill()
+            self._process.join()
+        self._conn.close()
+        self._process = None
+        self._conn = None
+        self._ready = False
@@ -9,27 +9,50 @@ from kivymd.uix.button import MDRaisedButton, MDFlatButton
 from kivymd.uix.dialog import MDDialog
 from kivymd.uix.label import MDLabel
 from kivymd.uix.scrollview import MDScrollView
+from kivymd.uix.spinner import MDSpinner
 from kivy.metrics import dp
 from kivy.uix.image import Image
 from datetime import datetime
 import os
 
+from invoice_parser import parse_invoice_text
+from jobs import BackgroundJob, BackgroundTaskMixin
+from loading_bar import LoadingBar
+from ocr_preprocess import DEFAULT_OPTIONS
+from ocr_service import TESSERACT_AVAILABLE, TESSEROCR_AVAILABLE, OCRService
+
 try:
     from plyer import camera
-    from PIL import Image as PILImage
-    import pytesseract
     CAMERA_AVAILABLE = True
 except ImportError:
     CAMERA_AVAILABLE = False
 
+# 任意一种识别引擎可用即可识别（见 ocr_service.create_engine）
+OCR_AVAILABLE = TESSERACT_AVAILABLE or TESSEROCR_AVAILABLE
+
+# OCR 各阶段在界面上显示的文字（progress(stage, total) 中 stage 为 ocr_service 的阶段序号）
+OCR_STAGES = ["正在处理图片...", "正在识别文字..."]
+
 
-class PhotoEntryScreen(MDScreen):
+class PhotoEntryScreen(BackgroundTaskMixin, MDScreen):
     """拍照记账界面"""
     
-    def __init__(self, database, **kwargs):
+    def __init__(self, database, ocr_service=None, **kwargs):
         super().__init__(**kwargs)
         self.database = database
+        # 常驻的OCR识别服务（由应用在退出时关闭）
+        self.ocr_service = ocr_service or OCRService()
         self.photo_path = None
+        # 最近一次OCR识别的原文，随账单保存以便全文搜索
+        self.ocr_text = None
+        # 正在进行的OCR任务；ocr_token 在每次开始或取消时递增，过期任务的结果被丢弃
+        self.ocr_job = None
+        self.ocr_token = 0
+        # 识别前的图片预处理参数，以及最近一次识别各步骤的耗时（秒）
+        self.preprocess_options = DEFAULT_OPTIONS
+        self.ocr_timings = {}
+        # 开始识别时各字段的内容；识别完成时只填写此后没有被修改过的字段
+        self.ocr_field_snapshot = {}
         self.build_ui()
     
     def build_ui(self):
@@ -45,6 +68,10 @@ class PhotoEntryScreen(MDScreen):
         )
         layout.add_widget(toolbar)
         
+        # 后台操作进行中时显示
+        self.loading_bar = LoadingBar()
+        layout.add_widget(self.loading_bar)
+        
         # 内容区域
         content = MDBoxLayout(
             orientation='vertical',
@@ -55,7 +82,7 @@ class PhotoEntryScreen(MDScreen):
         content.bind(minimum_height=content.setter('height'))
         
         # 相机功能提示
-        if not CAMERA_AVAILABLE:
+        if not (CAMERA_AVAILABLE and OCR_AVAILABLE):
             warning_label = MDLabel(
                 text="注意：相机和OCR功能仅在Android设备上可用\n当前为测试环境，可手动填写数据",
                 theme_text_color="Error",
@@ -95,6 +122,30 @@ class PhotoEntryScreen(MDScreen):
         )
         content.add_widget(ocr_btn)
         
+        # OCR进度（识别进行中时显示，期间可以继续编辑下面的字段）
+        self.ocr_panel = MDBoxLayout(
+            orientation='horizontal',
+            spacing=dp(10),
+            size_hint=(1, None),
+            height=0,
+            opacity=0
+        )
+        self.ocr_spinner = MDSpinner(
+            size_hint=(None, None),
+            size=(dp(24), dp(24)),
+            pos_hint={'center_y': 0.5},
+            active=False
+        )
+        self.ocr_label = MDLabel(text="")
+        self.ocr_panel.add_widget(self.ocr_spinner)
+        self.ocr_panel.add_widget(self.ocr_label)
+        self.ocr_panel.add_widget(MDFlatButton(
+            text="取消",
+            pos_hint={'center_y': 0.5},
+            on_release=lambda x: self.cancel_ocr()
+        ))
+        content.add_widget(self.ocr_panel)
+        
         # 客户名称
         self.customer_field = MDTextField(
             hint_text="客户名称",
@@ -167,16 +218,21 @@ class PhotoEntryScreen(MDScreen):
         self.add_widget(layout)
     
     def on_enter(self):
-        """进入界面时重置表单"""
+        """进入界面时重置表单，并提前启动识别进程"""
         self.reset_form()
+        if OCR_AVAILABLE:
+            self.ocr_service.start()
     
     def go_back(self):
-        """返回主界面"""
+        """返回主界面（放弃正在进行的识别）"""
+        self.cancel_ocr()
         self.manager.current = 'main'
     
     def reset_form(self):
         """重置表单"""
+        self.cancel_ocr()
         self.photo_path = None
+        self.ocr_text = None
         self.image_widget.source = ""
         self.customer_field.text = ""
         self.date_field.text = datetime.now().strftime("%Y-%m-%d")
@@ -207,7 +263,9 @@ class PhotoEntryScreen(MDScreen):
     def on_photo_complete(self, filename):
         """照片拍摄完成回调"""
         if filename:
+            self.cancel_ocr()
             self.photo_path = filename
+            self.ocr_text = None
             self.image_widget.source = filename
             self.image_widget.reload()
             self.show_message("成功", "照片拍摄成功，请点击识别文字")
@@ -220,50 +278,99 @@ class PhotoEntryScreen(MDScreen):
             self.show_message("提示", "请先拍摄照片")
             return
         
-        if not CAMERA_AVAILABLE:
+        if not OCR_AVAILABLE:
             self.show_message("提示", "OCR功能仅在Android设备上可用\n您可以手动填写以下信息")
             return
         
-        try:
-            # 使用 pytesseract 进行OCR识别
-            image = PILImage.open(self.photo_path)
-            text = pytesseract.image_to_string(image, lang='chi_sim+eng')
-            
-            # 解析识别的文字（这里是简单示例，实际需要根据发票格式优化）
-            self.parse_ocr_text(text)
-            
-            self.show_message("成功", "文字识别完成，请检查并补全信息")
-        except Exception as e:
-            self.show_message("错误", f"识别失败: {str(e)}\n请手动填写信息")
-    
-    def parse_ocr_text(self, text):
-        """解析OCR识别的文字"""
-        # 这是一个简单的解析示例
-        # 实际应用中需要根据具体的发票格式进行优化
+        if self.ocr_job and self.ocr_job.running:
+            self.show_message("提示", "正在识别，请稍候")
+            return
         
-        lines = text.split('\n')
+        # 在工作线程中识别，结果通过 Clock.schedule_once 回到主线程；
+        # 识别期间可以继续编辑，记下此时的字段内容，完成时不覆盖用户的修改
+        self.ocr_field_snapshot = {
+            name: field.text for name, field in self.ocr_fields().items()
+        }
+        self.ocr_token += 1
+        token = self.ocr_token
+        self.ocr_job = BackgroundJob(
+            self.ocr_service.recognize,
+            self.photo_path,
+            self.preprocess_options,
+            on_progress=lambda done, total: self.on_ocr_progress(token, done),
+            on_done=lambda result: self.on_ocr_done(token, result),
+            on_error=lambda error: self.on_ocr_error(token, error),
+            progress_interval=0
+        )
+        self.show_ocr_panel(True, OCR_STAGES[0])
+        self.ocr_job.start()
+    
+    def cancel_ocr(self):
+        """取消识别：立即恢复界面，稍后到达的结果被丢弃"""
+        if self.ocr_job is None:
+            return
+        self.ocr_job.cancel()
+        self.ocr_job = None
+        self.ocr_token += 1
+        self.show_ocr_panel(False)
+    
+    def show_ocr_panel(self, visible, text=""):
+        """显示或隐藏识别进度"""
+        self.ocr_panel.height = dp(48) if visible else 0
+        self.ocr_panel.opacity = 1 if visible else 0
+        self.ocr_spinner.active = visible
+        self.ocr_label.text = text
+    
+    def on_ocr_progress(self, token, stage):
+        """识别进入下一阶段"""
+        if token == self.ocr_token and stage < len(OCR_STAGES):
+            self.ocr_label.text = OCR_STAGES[stage]
+    
+    def on_ocr_done(self, token, result):
+        """识别完成，解析结果填入表单"""
+        if token != self.ocr_token:
+            return
+        self.ocr_job = None
+        self.show_ocr_panel(False)
+        self.ocr_text = result["text"]
+        self.ocr_timings = result["timings"]
         
-        # 尝试提取日期（格式：YYYY-MM-DD 或 YYYY/MM/DD）
-        import re
-        date_pattern = r'(\d{4}[-/]\d{1,2}[-/]\d{1,2})'
-        for line in lines:
-            date_match = re.search(date_pattern, line)
-            if date_match:
-                date_str = date_match.group(1).replace('/', '-')
-                self.date_field.text = date_str
-                break
+        # 解析识别的文字（这里是简单示例，实际需要根据发票格式优化）
+        self.parse_ocr_text(self.ocr_text)
         
-        # 尝试提取数字（可能是数量或金额）
-        number_pattern = r'(\d+\.?\d*)'
-        numbers = []
-        for line in lines:
-            matches = re.findall(number_pattern, line)
-            numbers.extend(matches)
+        if result.get("cached"):
+            note = "已使用这张照片之前的识别结果"
+        else:
+            note = f"用时 {sum(self.ocr_timings.values()):.1f} 秒"
+        self.show_message("成功", f"文字识别完成（{note}），请检查并补全信息")
+    
+    def on_ocr_error(self, token, error):
+        """识别失败"""
+        if token != self.ocr_token:
+            return
+        self.ocr_job = None
+        self.show_ocr_panel(False)
+        self.show_message("错误", f"识别失败: {str(error)}\n请手动填写信息")
+    
+    def ocr_fields(self):
+        """识别结果可以填写的字段"""
+        return {
+            "date": self.date_field,
+            "quantity": self.quantity_field,
+            "unit_price": self.unit_price_field,
+        }
+    
+    def parse_ocr_text(self, text):
+        """解析OCR识别的文字并填入表单
         
-        # 如果找到数字，尝试填充字段
-        if len(numbers) >= 2:
-            self.quantity_field.text = numbers[0]
-            self.unit_price_field.text = numbers[1]
+        只填写为空或自开始识别以来没有被修改过的字段，识别期间用户输入的内容保留。
+        """
+        values = parse_invoice_text(text)
+        for name, field in self.ocr_fields().items():
+            if name not in values:
+                continue
+            if not field.text or field.text == self.ocr_field_snapshot.get(name, field.text):
+                field.text = values[name]
     
     def calculate_total(self, *args):
         """计算总价"""
@@ -307,39 +414,35 @@ class PhotoEntryScreen(MDScreen):
             self.show_message("错误", "请输入有效的单价")
             return
         
-        # 查找或创建客户
-        customers = self.database.get_all_customers()
-        customer_id = None
-        for customer in customers:
-            if customer['name'] == customer_name:
-                customer_id = customer['id']
-                break
-        
-        # 如果客户不存在，创建新客户
+        self.run_in_background(
+            self.store_bill, customer_name, self.date_field.text, specification,
+            quantity, unit_price, self.photo_path, self.ocr_text,
+            callback=self.on_bill_saved,
+            write=True
+        )
+    
+    def store_bill(self, customer_name, date, specification, quantity, unit_price, photo_path,
+                   ocr_text=None):
+        """查找或创建客户并保存账单（在数据库写线程中执行）"""
+        customer_id = self.database.get_or_create_customer(customer_name)
         if customer_id is None:
-            success, message = self.database.add_customer(customer_name)
-            if success:
-                customers = self.database.get_all_customers()
-                for customer in customers:
-                    if customer['name'] == customer_name:
-                        customer_id = customer['id']
-                        break
-            else:
-                self.show_message("错误", f"创建客户失败: {message}")
-                return
+            return False, "创建客户失败"
         
-        # 保存到数据库
-        success, message = self.database.add_bill(
+        return self.database.add_bill(
             customer_id=customer_id,
             customer_name=customer_name,
-            date=self.date_field.text,
+            date=date,
             specification=specification,
             quantity=quantity,
             unit_price=unit_price,
             source='photo',
-            photo_path=self.photo_path
+            photo_path=photo_path,
+            ocr_text=ocr_text
         )
-        
+    
+    def on_bill_saved(self, result):
+        """保存账单完成"""
+        success, message = result
         if success:
             self.show_message("成功", "账单保存成功", callback=self.reset_form)
         else:
@@ -12,8 +12,12 @@ from kivymd.uix.textfield import MDTextField
 from kivymd.uix.label import MDLabel
 from kivy.metrics import dp
 
+from database import CUSTOMERS_CHANGED
+from jobs import BackgroundTaskMixin
+from loading_bar import LoadingBar
 
-class SettingsScreen(MDScreen):
+
+class SettingsScreen(BackgroundTaskMixin, MDScreen):
     """设置界面 - 管理客户和产品"""
     
     def __init__(self, database, **kwargs):
@@ -22,6 +26,8 @@ class SettingsScreen(MDScreen):
         self.current_customer_id = None
         self.dialog = None
         self.edit_dialog = None
+        # 客户列表已同步到的数据版本号，None 表示尚未加载
+        self.data_version = None
         self.build_ui()
     
     def build_ui(self):
@@ -37,6 +43,10 @@ class SettingsScreen(MDScreen):
         )
         layout.add_widget(toolbar)
         
+        # 后台查询进行中时显示
+        self.loading_bar = LoadingBar()
+        layout.add_widget(self.loading_bar)
+        
         # 主内容区域
         content = MDBoxLayout(orientation='vertical', spacing=dp(10), padding=dp(10))
         
@@ -67,7 +77,14 @@ class SettingsScreen(MDScreen):
         self.add_widget(layout)
     
     def on_enter(self):
-        """进入界面时刷新客户列表"""
+        """进入界面时，仅在客户有增删时刷新客户列表"""
+        if self.data_version is not None:
+            changes = self.database.changes_since(self.data_version)
+            if changes is not None and not any(
+                    event.kind == CUSTOMERS_CHANGED for event in changes):
+                if changes:
+                    self.data_version = changes[-1].version
+                return
         self.refresh_customer_list()
     
     def go_back(self):
@@ -76,8 +93,12 @@ class SettingsScreen(MDScreen):
     
     def refresh_customer_list(self):
         """刷新客户列表"""
+        self.data_version = self.database.data_version
+        self.run_in_background(self.database.get_all_customers, callback=self.on_customers_loaded)
+    
+    def on_customers_loaded(self, customers):
+        """客户列表加载完成"""
         self.customer_list.clear_widgets()
-        customers = self.database.get_all_customers()
         
         for customer in customers:
             item = TwoLineListItem(
@@ -125,8 +146,12 @@ class SettingsScreen(MDScreen):
             self.show_message("错误", "客户名称不能为空")
             return
         
-        success, message = self.database.add_customer(customer_name)
-        
+        self.run_in_background(self.database.add_customer, customer_name,
+                               callback=self.on_customer_added)
+    
+    def on_customer_added(self, result):
+        """添加客户完成"""
+        success, message = result
         if success:
             self.dialog.dismiss()
             self.refresh_customer_list()
@@ -136,12 +161,17 @@ class SettingsScreen(MDScreen):
     
     def show_products(self, customer_id, customer_name):
         """显示客户的产品列表"""
+        self.run_in_background(
+            self.database.get_products_by_customer, customer_id,
+            callback=lambda products: self.open_products_dialog(customer_id, customer_name, products)
+        )
+    
+    def open_products_dialog(self, customer_id, customer_name, products):
+        """产品列表加载完成后打开对话框"""
         # 先关闭可能存在的对话框
         if hasattr(self, 'product_dialog') and self.product_dialog:
             self.product_dialog.dismiss()
         
-        products = self.database.get_products_by_customer(customer_id)
-        
         # 创建内容容器 - 使用Kivy原生BoxLayout
         from kivy.uix.boxlayout import BoxLayout
         from kivy.uix.label import Label
@@ -284,12 +314,18 @@ class SettingsScreen(MDScreen):
             self.show_message("错误", "单价必须是有效数字")
             return
         
-        success, message = self.database.add_product(customer_id, specification, price)
-        
+        self.run_in_background(
+            self.database.add_product, customer_id, specification, price,
+            callback=lambda result: self.on_product_saved(result, dialog, customer_id, customer_name)
+        )
+    
+    def on_product_saved(self, result, dialog, customer_id, customer_name):
+        """添加或更新产品完成"""
+        success, message = result
         if success:
             dialog.dismiss()
             self.show_message("成功", message)
-            # 重新打开产品列表以显示新添加的产品
+            # 重新打开产品列表以显示最新的产品
             self.show_products(customer_id, customer_name)
         else:
             self.show_message("错误", message)
@@ -349,15 +385,10 @@ class SettingsScreen(MDScreen):
             self.show_message("错误", "单价必须是有效数字")
             return
         
-        success, message = self.database.update_product(product_id, specification, price)
-        
-        if success:
-            dialog.dismiss()
-            self.show_message("成功", message)
-            # 重新打开产品列表以显示更新
-            self.show_products(customer_id, customer_name)
-        else:
-            self.show_message("错误", message)
+        self.run_in_background(
+            self.database.update_product, product_id, specification, price,
+            callback=lambda result: self.on_product_saved(result, dialog, customer_id, customer_name)
+        )
     
     def confirm_delete_product(self, product_id, customer_id, customer_name):
         """确认删除产品"""
@@ -382,10 +413,16 @@ class SettingsScreen(MDScreen):
     
     def delete_product(self, product_id, confirm_dialog, customer_id, customer_name):
         """删除产品"""
-        success, message = self.database.delete_product(product_id)
-        
         confirm_dialog.dismiss()
         
+        self.run_in_background(
+            self.database.delete_product, product_id,
+            callback=lambda result: self.on_product_deleted(result, customer_id, customer_name)
+        )
+    
+    def on_product_deleted(self, result, customer_id, customer_name):
+        """删除产品完成"""
+        success, message = result
         if success:
             self.show_message("成功", message)
             # 重新打开产品列表以显示删除结果
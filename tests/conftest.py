@@ -0,0 +1,19 @@
+"""
+测试公共配置 - 让测试可以直接导入仓库根目录下的模块
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database  # noqa: E402
+
+
+@pytest.fixture
+def database(tmp_path):
+    """临时目录中的新数据库（每个测试独立）"""
+    db = Database(str(tmp_path / "accounting.db"))
+    yield db
+    db.close()
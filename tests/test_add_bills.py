@@ -0,0 +1,19 @@
+"""
+批量添加账单测试 - 逐行校验，坏行不影响同一批的其他行
+"""
+import pytest
+
+
+def bill(quantity="1", unit_price="2.5", day=1):
+    return {"customer_name": "张三五金", "date": f"2024-03-{day:02d}",
+            "specification": "螺丝", "quantity": quantity, "unit_price": unit_price}
+
+
+@pytest.mark.parametrize("field", ["quantity", "unit_price"])
+@pytest.mark.parametrize("value", ["nan", "inf", "-inf", float("nan")])
+def test_non_finite_numbers_are_rejected_per_row(database, field, value):
+    rows = [bill(day=1), bill(day=2, **{field: value}), bill(day=3)]
+    outcomes = database.add_bills(rows, create_customers=True)
+    assert [ok for ok, _ in outcomes] == [True, False, True]
+    assert outcomes[1][1] == "数量或单价无效"
+    assert database.get_bill_statistics()["total_count"] == 2
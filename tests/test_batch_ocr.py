@@ -0,0 +1,89 @@
+"""
+批量识别测试 - 使用 FakeOCREngine 在当前进程中识别，重新扫描时不重复入队
+"""
+import functools
+import os
+
+import pytest
+from PIL import Image
+
+from batch_ocr import build_draft, ingest_photos
+from ocr_cache import OCRCache
+from ocr_service import FakeOCREngine
+
+INVOICE_TEXT = "送货单\n2024-03-05\n数量 12 单价 3.5"
+
+
+@pytest.fixture
+def photo_dir(tmp_path):
+    directory = tmp_path / "photos"
+    directory.mkdir()
+    for i in range(3):
+        # 内容各不相同，避免不同照片共用缓存结果
+        Image.new("RGB", (400, 300), (255, 255, i)).save(directory / f"invoice_{i}.jpg")
+    return directory
+
+
+def ingest(database, directory):
+    return ingest_photos(database, str(directory), workers=1, cache_dir=None,
+                         engine_factory=functools.partial(FakeOCREngine, INVOICE_TEXT, 90.0))
+
+
+def test_ingest_queues_each_photo_once(database, photo_dir):
+    result = ingest(database, photo_dir)
+    assert (result["photos"], result["drafts"], result["skipped"]) == (3, 3, 0)
+    result = ingest(database, photo_dir)
+    assert (result["photos"], result["drafts"], result["skipped"]) == (0, 0, 3)
+    assert database.count_bill_drafts() == 3
+
+
+def test_rescan_skips_committed_photos(database, photo_dir):
+    ingest(database, photo_dir)
+    drafts = [dict(draft, customer_name="张三", specification="A4") for draft in database.get_bill_drafts()]
+    outcomes = database.commit_drafts(drafts)
+    assert all(ok for ok, _ in outcomes)
+    assert database.count_bill_drafts() == 0
+    
+    result = ingest(database, photo_dir)
+    assert (result["photos"], result["skipped"]) == (0, 3)
+    assert database.count_bill_drafts() == 0
+
+
+def test_rescan_skips_discarded_photos(database, photo_dir):
+    ingest(database, photo_dir)
+    discarded = database.get_bill_drafts()[0]
+    assert database.discard_bill_draft(discarded["id"])[0]
+    assert database.count_bill_drafts() == 2
+    assert discarded["id"] not in {draft["id"] for draft in database.get_bill_drafts()}
+    
+    result = ingest(database, photo_dir)
+    assert (result["photos"], result["skipped"]) == (0, 3)
+    assert database.count_bill_drafts() == 2
+
+
+def test_relative_and_absolute_directories_dedupe(database, photo_dir, monkeypatch):
+    ingest(database, photo_dir)
+    monkeypatch.chdir(photo_dir.parent)
+    result = ingest(database, os.path.join(".", photo_dir.name))
+    assert (result["photos"], result["skipped"]) == (0, 3)
+
+
+@pytest.mark.parametrize("text, confidence", [
+    ("2024-03-01\n10 2.5", 0.9),
+    ("2024-03-01\n0 2.5", 0.6),
+    ("2024-03-01", 0.3),
+    ("送货单", 0.0),
+])
+def test_build_draft_scores_plausible_fields(text, confidence):
+    draft = build_draft("invoice.jpg", {"text": text, "confidence": 90.0})
+    assert draft["confidence"] == pytest.approx(confidence)
+
+
+def test_process_pool_ingest_trims_the_shared_cache(database, photo_dir, tmp_path, monkeypatch):
+    trimmed = []
+    monkeypatch.setattr(OCRCache, "trim", lambda cache: trimmed.append(cache.directory))
+    cache_dir = str(tmp_path / "cache")
+    result = ingest_photos(database, str(photo_dir), workers=2, cache_dir=cache_dir,
+                           engine_factory=functools.partial(FakeOCREngine, INVOICE_TEXT, 90.0))
+    assert (result["workers"], result["drafts"]) == (2, 3)
+    assert trimmed == [cache_dir]
@@ -0,0 +1,97 @@
+"""
+变更通知测试 - data_version、变更事件的顺序和账单列表的增量同步
+"""
+from operator import attrgetter
+
+from database import (BILL_DELETED, BILLS_ADDED, CHANGE_LOG_SIZE, CUSTOMERS_CHANGED,
+                      PRODUCTS_CHANGED, bill_changes)
+
+
+def bill(customer_name, day, specification="A4", quantity=1, unit_price=2.5):
+    return {"customer_name": customer_name, "date": f"2024-03-{day:02d}",
+            "specification": specification, "quantity": quantity, "unit_price": unit_price}
+
+
+def newest_first(bills):
+    """按账单列表的排序（BILL_ORDER）排列"""
+    return sorted(bills, key=attrgetter("date", "created_at", "id"), reverse=True)
+
+
+def test_add_bills_records_customer_and_product_changes_before_bills(database):
+    database.add_customer("张三")
+    assert [customer["name"] for customer in database.get_all_customers()] == ["张三"]
+    version = database.data_version
+    
+    database.add_bills([bill("张三", 1), bill("李四", 2), bill("李四", 3, "A3")],
+                       create_customers=True, create_products=True)
+    changes = database.changes_since(version)
+    assert [event.kind for event in changes] == [
+        CUSTOMERS_CHANGED, PRODUCTS_CHANGED, PRODUCTS_CHANGED, BILLS_ADDED
+    ]
+    assert [event.version for event in changes] == list(range(version + 1, version + 5))
+    assert database.data_version == changes[-1].version
+    
+    # 看到新账单时，客户和产品的缓存已经失效
+    added = changes[-1]
+    bills = database.get_bills_in_id_range(added.first_id, added.last_id)
+    assert len(bills) == 3
+    customers = {customer["name"]: customer["id"] for customer in database.get_all_customers()}
+    assert set(customers) == {"张三", "李四"}
+    specifications = {product["specification"]
+                      for product in database.get_products_by_customer(customers["李四"])}
+    assert specifications == {"A4", "A3"}
+
+
+def test_rejected_or_existing_rows_record_only_bill_changes(database):
+    database.add_bills([bill("张三", 1)], create_customers=True, create_products=True)
+    version = database.data_version
+    
+    database.add_bills([bill("张三", 2), bill("张三", 3, quantity="abc")],
+                       create_customers=True, create_products=True)
+    assert [event.kind for event in database.changes_since(version)] == [BILLS_ADDED]
+    
+    version = database.data_version
+    database.add_bills([bill("王五", 3, quantity="abc")], create_customers=True)
+    assert database.changes_since(version) == []
+    assert database.data_version == version
+
+
+def test_incremental_sync_matches_full_reload(database):
+    database.add_bills([bill(name, day) for day in range(1, 11) for name in ("张三", "李四")],
+                       create_customers=True)
+    shown = database.filter_bills(customer_name="张三")
+    version = database.data_version
+    
+    database.delete_bill(shown[0].id)
+    database.add_bills([bill("张三", 5, "A3"), bill("李四", 6), bill("张三", 20)],
+                       create_customers=True)
+    database.delete_bill(shown[-1].id)
+    database.add_bill(shown[1].customer_id, "张三", "2024-03-15", "B5", 2, 1.0)
+    
+    changes = database.changes_since(version)
+    deleted, added = bill_changes(changes)
+    assert deleted == {shown[0].id, shown[-1].id}
+    assert [last_id - first_id + 1 for first_id, last_id in added] == [3, 1]
+    
+    # 与 BillingScreen.sync_bill_list 相同：移除已删除的，只查询新增 id 中符合筛选条件的
+    synced = [row for row in shown if row.id not in deleted]
+    for first_id, last_id in added:
+        synced.extend(database.get_bills_in_id_range(first_id, last_id, customer_name="张三"))
+    assert newest_first(synced) == database.filter_bills(customer_name="张三")
+    
+    assert database.changes_since(changes[-1].version) == []
+
+
+def test_changes_since_requires_full_refresh_after_log_overflow(database):
+    database.add_customer("张三")
+    customer_id = database.get_all_customers()[0]["id"]
+    version = database.data_version
+    
+    for day in range(CHANGE_LOG_SIZE + 1):
+        database.add_bill(customer_id, "张三", "2024-03-01", "A4", day, 1.0)
+    assert database.changes_since(version) is None
+    assert len(database.changes_since(version + 1)) == CHANGE_LOG_SIZE
+    
+    database.delete_bill(1)
+    event, = database.changes_since(database.data_version - 1)
+    assert (event.kind, event.first_id) == (BILL_DELETED, 1)
@@ -0,0 +1,30 @@
+"""
+客户索引测试 - 名称前缀和拼音首字母查找
+"""
+import pytest
+
+import customer_index
+from customer_index import CustomerIndex, pinyin_initials
+
+NAMES = ["ABC五金", "张三五金", "五金 2号", "zhang建材"]
+
+
+@pytest.mark.parametrize("pinyin_available", [True, False])
+def test_non_chinese_segments_are_kept_whole(monkeypatch, pinyin_available):
+    if pinyin_available and not customer_index.PINYIN_AVAILABLE:
+        pytest.skip("未安装 pypinyin")
+    monkeypatch.setattr(customer_index, "PINYIN_AVAILABLE", pinyin_available)
+    assert pinyin_initials("ABC五金") == "abcwj"
+    assert pinyin_initials("张三五金") == "zswj"
+    assert pinyin_initials("五金 2号") == "wj 2h"
+    assert pinyin_initials("zhang建材") == "zhangjc"
+
+
+def test_search_by_name_prefix_and_initials():
+    index = CustomerIndex({"id": i, "name": name} for i, name in enumerate(NAMES, 1))
+    assert [c["name"] for c in index.search("abc")] == ["ABC五金"]
+    assert [c["name"] for c in index.search("zswj")] == ["张三五金"]
+    assert [c["name"] for c in index.search("zha")] == ["zhang建材"]
+    index.remove(1)
+    index.add(5, "ABD建材")
+    assert [c["name"] for c in index.search("ab")] == ["ABD建材"]
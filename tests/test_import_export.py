@@ -0,0 +1,159 @@
+"""
+导入导出测试 - Excel、CSV/TSV 的导出、导入和失败行报告
+"""
+import csv
+import threading
+from datetime import datetime
+
+import pytest
+from openpyxl import Workbook
+
+import importer
+from database import Bill, Database
+from exporter import (CHECKPOINT_ROWS, EXPORT_HEADERS, export_bills_csv, export_bills_xlsx,
+                      write_bills_csv, write_bills_xlsx)
+from importer import SheetRows, import_bills_csv, import_bills_xlsx
+from jobs import JobCancelled
+
+SEED_BILLS = [
+    {"customer_name": "张三", "date": "2024-03-01", "specification": "A4",
+     "quantity": 10, "unit_price": 2.5, "source": "manual"},
+    {"customer_name": "张三", "date": "2024-03-02", "specification": "B5, 双面",
+     "quantity": 3, "unit_price": 1.25, "source": "photo"},
+    {"customer_name": "李四", "date": "2024-03-15", "specification": "A3",
+     "quantity": 1, "unit_price": 100, "source": "manual"},
+]
+
+
+def bill_rows(database):
+    """数据库中账单的可比较内容（不含编号）"""
+    return sorted((bill.customer_name, bill.date, bill.specification, bill.quantity,
+                   bill.unit_price, bill.total_price, bill.source)
+                  for bill in database.filter_bills())
+
+
+@pytest.fixture
+def seeded(database):
+    database.add_bills(SEED_BILLS, create_customers=True, create_products=True)
+    return database
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".tsv", ".xlsx"])
+def test_export_then_import_keeps_every_row(seeded, tmp_path, suffix):
+    path = str(tmp_path / f"bills{suffix}")
+    if suffix == ".xlsx":
+        count = export_bills_xlsx(seeded, path)
+    else:
+        count = export_bills_csv(seeded, path, delimiter="\t" if suffix == ".tsv" else ",")
+    assert count == len(SEED_BILLS)
+    
+    target = Database(str(tmp_path / "target.db"))
+    try:
+        if suffix == ".xlsx":
+            result = import_bills_xlsx(target, path)
+        else:
+            result = import_bills_csv(target, path)
+        assert (result["imported"], result["rejected"]) == (len(SEED_BILLS), 0)
+        assert bill_rows(target) == bill_rows(seeded)
+    finally:
+        target.close()
+
+
+@pytest.mark.parametrize("suffix, delimiter", [
+    (".csv", ","), (".csv", "\t"), (".tsv", "\t"), (".tsv", ","), (".txt", "\t"),
+])
+def test_csv_import_sniffs_the_delimiter(database, tmp_path, suffix, delimiter):
+    path = tmp_path / f"bills{suffix}"
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f, delimiter=delimiter)
+        writer.writerow(EXPORT_HEADERS)
+        writer.writerow(["张三", "2024-03-01", "A4, 双面", 2, 1.5, 3, "手动录入"])
+    
+    result = import_bills_csv(database, str(path))
+    assert result["imported"] == 1
+    bill, = database.filter_bills()
+    assert (bill.customer_name, bill.specification, bill.total_price) == ("张三", "A4, 双面", 3)
+
+
+def test_sniff_delimiter_falls_back_to_the_extension():
+    assert importer.sniff_delimiter("bills.tsv", "客户名称\n") == "\t"
+    assert importer.sniff_delimiter("bills.csv", "客户名称\n") == ","
+
+
+def test_csv_import_reports_rejected_rows(database, tmp_path):
+    path = tmp_path / "bills.csv"
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_HEADERS)
+        writer.writerow(["张三", "2024-03-01", "A4", 1, 1, 1, "手动录入"])
+        writer.writerow(["李四", "2024-3-1", "A4", 1, 1, 1, "手动录入"])
+        writer.writerow(["王五", "2024-03-02", "A4", "abc", 1, 1, "手动录入"])
+    
+    result = import_bills_csv(database, str(path))
+    assert (result["imported"], result["rejected"]) == (1, 2)
+    assert result["errors"] == [(3, "日期格式错误，应为 YYYY-MM-DD"), (4, "数量或单价无效")]
+
+
+def fake_bills(count):
+    for i in range(count):
+        yield Bill(i + 1, 1, "张三", "2024-03-01", "A4", 1, 1.0, 1.0, "manual", None, None)
+
+
+@pytest.mark.parametrize("writer", [write_bills_csv, write_bills_xlsx])
+def test_cancelled_export_leaves_no_partial_file(tmp_path, writer):
+    path = tmp_path / "bills.out"
+    cancel_event = threading.Event()
+    cancel_event.set()
+    with pytest.raises(JobCancelled):
+        writer(fake_bills(CHECKPOINT_ROWS * 2), str(path), cancel_event=cancel_event)
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.fixture
+def workbook_path(tmp_path):
+    """带其他工作表、空行、日期单元格和无效行的工作簿"""
+    wb = Workbook()
+    wb.active.title = "说明"
+    ws = wb.create_sheet("账单明细")
+    ws.append(EXPORT_HEADERS)
+    ws.append(["张三", datetime(2024, 3, 1), 123, 10, 2.5, 25, "手动录入"])
+    ws.append([])
+    ws.append(["李四", "2024-3-1", "A4", 1, 1, 1, "拍照识别"])
+    ws.append(["王五", "2024-03-02", "A4", "abc", 1, 1, None])
+    path = tmp_path / "bills.xlsx"
+    wb.save(path)
+    return str(path)
+
+
+@pytest.mark.parametrize("row_parser", [True, False])
+def test_sheet_rows_skip_blank_rows_and_keep_row_numbers(workbook_path, monkeypatch, row_parser):
+    monkeypatch.setattr(importer, "ROW_PARSER_AVAILABLE", row_parser)
+    sheet = SheetRows(workbook_path)
+    rows = [(number, row[:4]) for number, row in sheet
+            if any(value is not None for value in row)]
+    assert rows == [
+        (1, ("客户名称", "日期", "规格", "数量")),
+        (2, ("张三", datetime(2024, 3, 1), 123, 10)),
+        (4, ("李四", "2024-3-1", "A4", 1)),
+        (5, ("王五", "2024-03-02", "A4", "abc")),
+    ]
+    assert sheet.max_row == 5
+
+
+def test_xlsx_import_streams_rejects_to_report(database, workbook_path):
+    progress = []
+    result = import_bills_xlsx(database, workbook_path, progress=lambda *args: progress.append(args))
+    assert (result["imported"], result["rejected"]) == (1, 2)
+    assert result["errors"] == [(4, "日期格式错误，应为 YYYY-MM-DD"), (5, "数量或单价无效")]
+    assert progress[-1] == (4, 4)
+    
+    bill, = database.filter_bills()
+    assert (bill.customer_name, bill.date, bill.specification) == ("张三", "2024-03-01", "123")
+    
+    with open(result["report_path"], newline="", encoding="utf-8-sig") as f:
+        report = list(csv.reader(f))
+    assert report[0] == ["行号", "原因"] + EXPORT_HEADERS
+    assert [row[:3] for row in report[1:]] == [
+        ["4", "日期格式错误，应为 YYYY-MM-DD", "李四"],
+        ["5", "数量或单价无效", "王五"],
+    ]
@@ -0,0 +1,25 @@
+"""
+发票文字解析测试
+"""
+import pytest
+
+from invoice_parser import parse_invoice_text
+
+
+def test_date_digits_are_not_quantity_or_price():
+    assert parse_invoice_text("2024-03-01\n10 2.5") == {
+        "date": "2024-03-01", "quantity": "10", "unit_price": "2.5",
+    }
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("日期 2024/3/1", "2024-03-01"),
+    ("2024-13-45\n2024-02-29", "2024-02-29"),
+])
+def test_date_is_normalized_and_validated(text, expected):
+    assert parse_invoice_text(text)["date"] == expected
+
+
+def test_missing_fields_are_omitted():
+    assert parse_invoice_text("2024-03-01\n数量 10") == {"date": "2024-03-01"}
+    assert parse_invoice_text("送货单") == {}
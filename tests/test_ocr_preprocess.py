@@ -0,0 +1,37 @@
+"""
+OCR预处理测试 - 纠偏角度估计
+"""
+import pytest
+from PIL import Image, ImageDraw
+
+from ocr_preprocess import DEFAULT_OPTIONS, estimate_skew, preprocess_image
+
+
+def text_lines(width=800, height=1000):
+    """模拟文字行的二值图：白底上等距的黑色横条"""
+    image = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    for top in range(60, height - 60, 40):
+        draw.rectangle((60, top, width - 60, top + 12), fill=0)
+    return image
+
+
+def test_blank_image_is_not_rotated():
+    image = Image.new("RGB", (1240, 1754), "white")
+    assert estimate_skew(image.convert("L"), DEFAULT_OPTIONS) == 0.0
+    processed, timings = preprocess_image(image)
+    assert "deskew" not in timings
+    assert processed.size == image.size
+
+
+@pytest.mark.parametrize("skew", [-3.0, 2.0])
+def test_skewed_lines_are_detected_within_range(skew):
+    rotated = text_lines().rotate(skew, resample=Image.Resampling.BILINEAR,
+                                  expand=True, fillcolor=255)
+    angle = estimate_skew(rotated, DEFAULT_OPTIONS)
+    assert abs(angle + skew) <= DEFAULT_OPTIONS.skew_step / 5 + 1e-9
+    assert abs(angle) <= DEFAULT_OPTIONS.max_skew
+
+
+def test_straight_lines_stay_straight():
+    assert estimate_skew(text_lines(), DEFAULT_OPTIONS) == 0.0
@@ -0,0 +1,117 @@
+"""
+OCR服务测试 - 使用 FakeOCREngine，不需要安装 tesseract
+"""
+import functools
+import threading
+
+import pytest
+from PIL import Image
+
+import ocr_cache
+import ocr_service
+from jobs import JobCancelled
+from ocr_cache import OCRCache
+from ocr_preprocess import DEFAULT_OPTIONS
+from ocr_service import FakeOCREngine, OCRService
+
+INVOICE_TEXT = "送货单\n2024-03-05\n数量 12 单价 3.5"
+
+
+@pytest.fixture
+def photo(tmp_path):
+    path = tmp_path / "invoice.jpg"
+    Image.new("RGB", (400, 300), "white").save(path)
+    return str(path)
+
+
+def fake_engine(text=INVOICE_TEXT, delay=0.0):
+    return functools.partial(FakeOCREngine, text, 90.0, delay)
+
+
+def test_thread_mode_recognizes_with_fake_engine(photo):
+    service = OCRService(fake_engine(), use_process=False)
+    stages = []
+    result = service.recognize(photo, progress=lambda stage, total: stages.append(stage))
+    service.close()
+    assert result["text"] == INVOICE_TEXT
+    assert result["confidence"] == 90.0
+    assert result["cached"] is False
+    assert "ocr" in result["timings"]
+    assert stages == [0, 1]
+
+
+def test_worker_process_is_reused_and_cancel_restarts_it(photo):
+    service = OCRService(fake_engine(delay=5.0))
+    cancel_event = threading.Event()
+    threading.Timer(0.5, cancel_event.set).start()
+    with pytest.raises(JobCancelled):
+        service.recognize(photo, cancel_event=cancel_event)
+    
+    service.engine_factory = fake_engine()
+    assert service.recognize(photo)["text"] == INVOICE_TEXT
+    first_process = service._process
+    assert service.recognize(photo)["text"] == INVOICE_TEXT
+    assert service._process is first_process
+    service.close()
+
+
+def test_repeat_recognition_hits_cache(photo, tmp_path):
+    cache = OCRCache(str(tmp_path / "cache"))
+    service = OCRService(fake_engine(), use_process=False, cache=cache)
+    assert service.recognize(photo)["cached"] is False
+    result = service.recognize(photo)
+    assert result["cached"] is True
+    assert result["text"] == INVOICE_TEXT
+    assert list(result["timings"]) == ["cache"]
+
+
+def test_cache_key_covers_language_and_preprocessing(photo, tmp_path):
+    cache = OCRCache(str(tmp_path / "cache"))
+    chinese = OCRService(fake_engine(), use_process=False, cache=cache)
+    english = OCRService(fake_engine(), use_process=False, cache=cache, lang="eng")
+    
+    def key(service, options=DEFAULT_OPTIONS):
+        return cache.key(photo, service.cache_config(options))
+    
+    assert key(chinese) == key(OCRService(fake_engine(), use_process=False, cache=cache))
+    assert key(chinese) != key(english)
+    assert key(chinese) != key(chinese, DEFAULT_OPTIONS._replace(deskew=False))
+    assert key(chinese) != key(chinese, None)
+    
+    chinese.recognize(photo)
+    assert english.recognize(photo)["cached"] is False
+
+
+def test_engine_interface_is_abstract():
+    from ocr_service import OCREngine
+    with pytest.raises(TypeError):
+        OCREngine()
+
+
+@pytest.mark.parametrize("tesserocr_available, name", [(True, "tesserocr"), (False, "tesseract")])
+def test_default_engine_name(monkeypatch, tesserocr_available, name):
+    monkeypatch.setattr(ocr_service, "TESSEROCR_AVAILABLE", tesserocr_available)
+    assert ocr_service.default_engine_name() == name
+    assert ocr_service.describe_engine(ocr_service.create_engine) == name
+
+
+def fill_cache(caches, count, size=500):
+    """轮流用各个缓存实例写入 count 条约 size 字节的结果"""
+    for i in range(count):
+        caches[i % len(caches)].put(f"{i:064x}", {"text": "x" * size})
+
+
+def directory_size(path):
+    return sum(entry.stat().st_size for entry in path.iterdir())
+
+
+def test_cache_shared_by_processes_stays_near_max_bytes(tmp_path):
+    directory = tmp_path / "cache"
+    max_bytes = 10_000
+    # 每个实例相当于一个子进程中的缓存，只知道自己写入的大小
+    caches = [OCRCache(str(directory), max_bytes=max_bytes) for _ in range(4)]
+    fill_cache(caches, 200)
+    assert directory_size(directory) <= max_bytes * (1 + len(caches) * ocr_cache.RESCAN_RATIO)
+    
+    OCRCache(str(directory), max_bytes=max_bytes).trim()
+    assert directory_size(directory) <= max_bytes
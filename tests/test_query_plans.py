@@ -0,0 +1,88 @@
+"""
+查询计划测试 - 常用查询必须走索引，且不需要为 ORDER BY 建临时 B 树
+"""
+import pytest
+
+
+def add_sample_bills(database):
+    database.add_bills(
+        [
+            {"customer_name": name, "date": f"2024-03-{day:02d}", "specification": "螺丝",
+             "quantity": 1, "unit_price": 2.5}
+            for name in ("张三五金", "李四建材")
+            for day in range(1, 11)
+        ],
+        create_customers=True
+    )
+
+
+def query_plans(database, fn, *args, **kwargs):
+    """执行 fn 并返回其中每条 SELECT 的查询计划（每条为计划步骤说明的列表）"""
+    conn = database.get_connection()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        fn(*args, **kwargs)
+    finally:
+        conn.set_trace_callback(None)
+    return [
+        [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+        for sql in statements if sql.lstrip().upper().startswith("SELECT")
+    ]
+
+
+def assert_indexed(plans, expected):
+    """每条查询都有 expected 开头的 SEARCH 步骤，且没有为 ORDER BY 建临时 B 树"""
+    assert plans, "没有执行任何查询"
+    for steps in plans:
+        assert any(step.startswith(expected) for step in steps), steps
+        assert not any("USE TEMP B-TREE FOR ORDER BY" in step for step in steps), steps
+
+
+@pytest.fixture
+def bills_database(database):
+    add_sample_bills(database)
+    return database
+
+
+def test_filter_bills_by_customer(bills_database):
+    plans = query_plans(bills_database, bills_database.filter_bills, customer_name="张三五金")
+    assert_indexed(plans, "SEARCH bills USING INDEX idx_bills_customer_date")
+
+
+def test_filter_bills_by_date_without_customer(bills_database):
+    plans = query_plans(bills_database, bills_database.filter_bills,
+                        start_date="2024-03-02", end_date="2024-03-08")
+    assert_indexed(plans, "SEARCH bills USING INDEX idx_bills_date")
+
+
+@pytest.mark.parametrize("customer_name, index", [
+    ("张三五金", "idx_bills_customer_date"),
+    (None, "idx_bills_date"),
+])
+def test_filter_bills_page_after_cursor(bills_database, customer_name, index):
+    first_page, after = bills_database.filter_bills_page(customer_name=customer_name, limit=3)
+    assert after is not None
+    plans = query_plans(bills_database, bills_database.filter_bills_page,
+                        customer_name=customer_name, after=after, limit=3)
+    assert_indexed(plans, f"SEARCH bills USING INDEX {index}")
+
+
+def test_get_products_by_customer(bills_database):
+    customer_id = bills_database.get_or_create_customer("张三五金")
+    plans = query_plans(bills_database, bills_database.get_products_by_customer, customer_id)
+    assert_indexed(plans, "SEARCH products USING INDEX idx_products_customer_spec")
+
+
+def test_get_bill(bills_database):
+    plans = query_plans(bills_database, bills_database.get_bill, 3)
+    assert_indexed(plans, "SEARCH bills USING INTEGER PRIMARY KEY")
+
+
+@pytest.mark.parametrize("filters, index", [
+    ({"customer_name": "张三五金", "start_date": "2024-03-02"}, "idx_bills_customer_date"),
+    ({"start_date": "2024-03-02", "end_date": "2024-03-08"}, "idx_bills_date"),
+])
+def test_filtered_bill_statistics(bills_database, filters, index):
+    plans = query_plans(bills_database, bills_database.get_bill_statistics, **filters)
+    assert_indexed(plans, f"SEARCH bills USING INDEX {index}")
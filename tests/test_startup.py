@@ -0,0 +1,34 @@
+"""
+启动测试 - 已是最新版本的数据库在打开时不执行任何 DDL
+"""
+import sqlite3
+
+from database import Database
+
+DDL_PREFIXES = ("CREATE", "DROP", "ALTER", "INSERT", "PRAGMA USER_VERSION =")
+
+
+def test_reopening_current_database_runs_no_ddl(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "accounting.db")
+    database = Database(db_path)
+    assert database.add_bill(1, "张三五金", "2024-03-01", "不锈钢螺丝", 1, 2.5)[0]
+    database.close()
+
+    statements = []
+    connect = sqlite3.connect
+
+    def traced_connect(*args, **kwargs):
+        conn = connect(*args, **kwargs)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    monkeypatch.setattr(sqlite3, "connect", traced_connect)
+    database = Database(db_path)
+    try:
+        assert statements
+        executed = [sql.strip().upper() for sql in statements]
+        assert not [sql for sql in executed if sql.startswith(DDL_PREFIXES)], executed
+        assert database.search_index_enabled
+        assert [bill.specification for bill in database.search_bills("不锈钢")] == ["不锈钢螺丝"]
+    finally:
+        database.close()
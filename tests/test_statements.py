@@ -0,0 +1,115 @@
+"""
+对账单测试 - 月度对账单的汇总表、每个客户的明细表和工作表名称
+"""
+import os
+
+import pytest
+from openpyxl import load_workbook
+
+from batch_statements import generate_statements
+from exporter import (SHEET_NAME_MAX_LENGTH, SUMMARY_HEADERS, export_monthly_statement,
+                      unique_sheet_name)
+
+LONG_NAME = "某某市某某区某某街道某某印刷包装材料有限责任公司第一分公司销售部华东区"
+
+CUSTOMERS = ["张三", "A/B", "A?B", "汇总", LONG_NAME, LONG_NAME + "二部"]
+
+
+@pytest.fixture
+def statement_database(database):
+    bills = []
+    for i, name in enumerate(CUSTOMERS):
+        for day, (specification, quantity, price) in enumerate(
+                [("A4", 10 + i, 2.5), ("A3", 1, 4.0), ("A4", 2, 2.5)][:i % 3 + 1], 1):
+            bills.append({"customer_name": name, "date": f"2024-03-{day:02d}",
+                          "specification": specification, "quantity": quantity,
+                          "unit_price": price})
+    # 日期范围之外的账单不计入
+    bills.append({"customer_name": "张三", "date": "2024-04-01", "specification": "A4",
+                  "quantity": 100, "unit_price": 1})
+    database.add_bills(bills, create_customers=True, create_products=True)
+    return database
+
+
+def test_unique_sheet_name_replaces_truncates_and_numbers():
+    used = set()
+    assert unique_sheet_name("A/B", used) == "A_B"
+    assert unique_sheet_name("a?b", used) == "a_b(2)"
+    assert unique_sheet_name("A:B", used) == "A_B(3)"
+    assert unique_sheet_name("", used) == "客户"
+    
+    long_name = "x" * 40
+    assert unique_sheet_name(long_name, used) == "x" * SHEET_NAME_MAX_LENGTH
+    second = unique_sheet_name(long_name + "y", used)
+    assert second == "x" * (SHEET_NAME_MAX_LENGTH - 3) + "(2)"
+    assert len(second) == SHEET_NAME_MAX_LENGTH
+
+
+def test_statement_summary_matches_customer_subtotals(statement_database, tmp_path):
+    path = str(tmp_path / "statement.xlsx")
+    count = export_monthly_statement(statement_database, path, "2024-03-01", "2024-03-31")
+    subtotals = statement_database.get_customer_subtotals("2024-03-01", "2024-03-31")
+    assert count == sum(row[2] for row in subtotals)
+    
+    wb = load_workbook(path)
+    summary = list(wb["汇总"].iter_rows(values_only=True))
+    assert list(summary[0]) == SUMMARY_HEADERS
+    detail_rows = [tuple(row) for row in summary[1:-1] if row[1] != "小计"]
+    assert detail_rows == [tuple(row) for row in subtotals]
+    
+    for name in CUSTOMERS:
+        rows = [row for row in subtotals if row[0] == name]
+        subtotal, = [row for row in summary if row[0] == name and row[1] == "小计"]
+        assert subtotal[2:] == (sum(r[2] for r in rows), sum(r[3] for r in rows),
+                                pytest.approx(sum(r[4] for r in rows)))
+    assert summary[-1][0] == "合计"
+    assert summary[-1][2] == count
+    assert summary[-1][4] == pytest.approx(sum(row[4] for row in subtotals))
+
+
+def test_statement_has_one_sheet_per_customer(statement_database, tmp_path):
+    path = str(tmp_path / "statement.xlsx")
+    export_monthly_statement(statement_database, path, "2024-03-01", "2024-03-31")
+    
+    wb = load_workbook(path)
+    assert wb.sheetnames[0] == "汇总"
+    sheets = wb.sheetnames[1:]
+    assert len(sheets) == len(CUSTOMERS)
+    assert len({name.lower() for name in wb.sheetnames}) == len(wb.sheetnames)
+    assert all(len(name) <= SHEET_NAME_MAX_LENGTH for name in sheets)
+    assert {"A_B", "A_B(2)", "汇总(2)", "张三"} <= set(sheets)
+    assert LONG_NAME[:SHEET_NAME_MAX_LENGTH] in sheets
+    assert LONG_NAME[:SHEET_NAME_MAX_LENGTH - 3] + "(2)" in sheets
+    
+    # 每张明细表的账单都属于同一个客户，最后一行为该客户的合计
+    subtotals = statement_database.get_customer_subtotals("2024-03-01", "2024-03-31")
+    for sheet in sheets:
+        rows = list(wb[sheet].iter_rows(values_only=True))
+        customers = {row[0] for row in rows[1:-1]}
+        assert len(customers) == 1
+        name, = customers
+        assert rows[-1][0] == "合计"
+        assert rows[-1][6] == f"{sum(r[2] for r in subtotals if r[0] == name)} 笔"
+
+
+def workbook_contents(path):
+    """工作簿中每张表的名称和所有单元格的值"""
+    wb = load_workbook(path, read_only=True)
+    try:
+        return [(ws.title, list(ws.iter_rows(values_only=True))) for ws in wb.worksheets]
+    finally:
+        wb.close()
+
+
+def test_process_pool_statements_match_sequential(statement_database, tmp_path):
+    db_path = statement_database.db_path
+    outputs = {}
+    for workers in (1, 2):
+        output_dir = tmp_path / f"workers_{workers}"
+        result = generate_statements(db_path, str(output_dir), "2024-03-01", "2024-03-31",
+                                     workers=workers)
+        assert (result["workers"], result["customers"]) == (workers, len(CUSTOMERS))
+        outputs[workers] = (result["bills"], {
+            os.path.basename(path): workbook_contents(path) for path in result["files"]
+        })
+    assert outputs[2] == outputs[1]
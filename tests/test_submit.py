@@ -0,0 +1,45 @@
+"""
+后台执行测试 - submit 按 write_operation 标记或显式的 write 选择写线程或读线程池
+"""
+import threading
+
+import pytest
+
+from database import Database
+
+
+def thread_name(*args):
+    return threading.current_thread().name
+
+
+def test_marked_methods_run_on_the_writer_thread(database, monkeypatch):
+    routed = []
+    get_executor = database._get_executor
+    
+    def record(write):
+        routed.append(write)
+        return get_executor(write)
+    
+    monkeypatch.setattr(database, "_get_executor", record)
+    database.submit(database.add_customer, "张三").result(timeout=5)
+    customers = database.submit(database.get_all_customers).result(timeout=5)
+    
+    assert routed == [True, False]
+    assert [customer["name"] for customer in customers] == ["张三"]
+
+
+def test_other_callables_need_an_explicit_write_flag(database):
+    with pytest.raises(ValueError):
+        database.submit(lambda: database.add_customer("李四"))
+    
+    assert database.submit(thread_name, write=True).result(timeout=5).startswith("db-writer")
+    assert not database.submit(thread_name, write=False).result(timeout=5).startswith("db-writer")
+
+
+def test_methods_of_another_database_need_an_explicit_write_flag(database, tmp_path):
+    other = Database(str(tmp_path / "other.db"))
+    try:
+        with pytest.raises(ValueError):
+            database.submit(other.add_customer, "王五")
+    finally:
+        other.close()